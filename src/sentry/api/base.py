@@ -14,7 +14,7 @@ from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from sentry import analytics, tsdb
+from sentry import analytics, options, tsdb
 from sentry.auth import access
 from sentry.models import Environment
 from sentry.utils import json
@@ -198,6 +198,9 @@ class Endpoint(APIView):
         if origin == "null":
             origin = None
 
+        # imported here as serializers may import modules depending on this one
+        from sentry.api.serializers.base import serialize_attrs_cache
+
         try:
             with sentry_sdk.start_span(op="base.dispatch.request", description=type(self).__name__):
                 if origin and request.auth:
@@ -226,6 +229,12 @@ class Endpoint(APIView):
             with sentry_sdk.start_span(
                 op="base.dispatch.execute",
                 description=f"{type(self).__name__}.{handler.__name__}",
+            ), serialize_attrs_cache(
+                name=type(self).__name__,
+                # Only reads are memoized, writes may serialize what they changed.
+                memoize=request.method in ("GET", "HEAD")
+                and options.get("api.serialize.attrs-cache"),
+                debug=options.get("api.serialize.attrs-cache-debug"),
             ):
                 response = handler(request, *args, **kwargs)
 
@@ -1,10 +1,20 @@
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
 import sentry_sdk
 from django.contrib.auth.models import AnonymousUser
-from typing import Any, Iterable, Mapping, Optional, Sequence, Union
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence, Union
+
+from sentry.utils import metrics
 
+logger = logging.getLogger(__name__)
 
 registry = {}
 
+_attrs_cache = threading.local()
+
 
 def register(type: Any):
     """ A wrapper that adds the wrapped Serializer to the Serializer registry (see above) for the key `type`. """
@@ -58,18 +68,144 @@ def serialize(
         span.set_data("Object Count", len(objects))
 
         with sentry_sdk.start_span(op="serialize.get_attrs", description=type(serializer).__name__):
-            attrs = serializer.get_attrs(
-                # avoid passing NoneType's to the serializer as they're allowed and
-                # filtered out of serialize()
-                item_list=[o for o in objects if o is not None],
-                user=user,
-                **kwargs,
-            )
+            # avoid passing NoneType's to the serializer as they're allowed and
+            # filtered out of serialize()
+            item_list = [o for o in objects if o is not None]
+            attrs_cache = getattr(_attrs_cache, "value", None)
+            if attrs_cache is not None:
+                attrs = attrs_cache.get_attrs(serializer, item_list, user, kwargs)
+            else:
+                attrs = serializer.get_attrs(item_list=item_list, user=user, **kwargs)
 
         with sentry_sdk.start_span(op="serialize.iterate", description=type(serializer).__name__):
             return [serializer(o, attrs=attrs.get(o, {}), user=user, **kwargs) for o in objects]
 
 
+@contextmanager
+def serialize_attrs_cache(name: Optional[str] = None, memoize: bool = True, debug: bool = False):
+    """
+    Shares the attrs fetched by `serialize` between all of its calls within the
+    block, so that the nested serializers of e.g. an API request only fetch the
+    attrs of an object once. Attrs are memoized by serializer (its class and
+    configuration), user, serialize kwargs and object primary key.
+
+    With `debug`, the lookups repeated within the block are logged under
+    `name` once the block exits, whether they were memoized or not.
+
+    Nested blocks share the outermost one.
+    """
+    if getattr(_attrs_cache, "value", None) is not None or not (memoize or debug):
+        yield
+        return
+
+    attrs_cache = _AttrsCache(memoize=memoize, debug=debug)
+    _attrs_cache.value = attrs_cache
+    try:
+        yield
+    finally:
+        _attrs_cache.value = None
+        if debug:
+            attrs_cache.report(name)
+
+
+def _make_hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_make_hashable(v) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(_make_hashable(v) for v in value)
+    elif isinstance(value, dict):
+        return tuple(sorted((k, _make_hashable(v)) for k, v in value.items()))
+    return value
+
+
+def _get_serializer_key(serializer, user, kwargs):
+    try:
+        key = (
+            type(serializer),
+            _make_hashable(vars(serializer)),
+            getattr(user, "id", None),
+            _make_hashable(kwargs),
+        )
+        hash(key)
+    except (TypeError, ValueError):
+        # e.g. serializers configured with unsaved model instances, or with
+        # dicts whose keys cannot be sorted
+        return None
+    return key
+
+
+class _AttrsCache:
+    def __init__(self, memoize=True, debug=False):
+        self.memoize = memoize
+        self.values = {}
+        self.lookups = Counter() if debug else None
+
+    def get_attrs(self, serializer, item_list, user, kwargs):
+        serializer_name = type(serializer).__name__
+        if self.lookups is not None:
+            self.lookups.update(
+                (serializer_name, type(item).__name__, getattr(item, "pk", None))
+                for item in item_list
+            )
+
+        serializer_key = _get_serializer_key(serializer, user, kwargs) if self.memoize else None
+        if serializer_key is None:
+            return serializer.get_attrs(item_list=item_list, user=user, **kwargs)
+
+        attrs = {}
+        missing = []
+        for item in item_list:
+            pk = getattr(item, "pk", None)
+            key = (serializer_key, type(item), pk)
+            if pk is not None and key in self.values:
+                value = self.values[key]
+                # serializers sometimes pop from their attrs
+                attrs[item] = dict(value) if isinstance(value, dict) else value
+            else:
+                missing.append(item)
+
+        if attrs:
+            metrics.incr(
+                "serialize.attrs_cache.hit", amount=len(attrs), tags={"serializer": serializer_name}
+            )
+        if missing:
+            metrics.incr(
+                "serialize.attrs_cache.miss",
+                amount=len(missing),
+                tags={"serializer": serializer_name},
+            )
+            missing_attrs = serializer.get_attrs(item_list=missing, user=user, **kwargs)
+            for item in missing:
+                pk = getattr(item, "pk", None)
+                if item not in missing_attrs:
+                    continue
+                value = missing_attrs[item]
+                if pk is not None:
+                    self.values[(serializer_key, type(item), pk)] = (
+                        dict(value) if isinstance(value, dict) else value
+                    )
+                attrs[item] = value
+        return attrs
+
+    def report(self, name):
+        duplicates = Counter()
+        for (serializer_name, _, pk), count in self.lookups.items():
+            if pk is not None and count > 1:
+                duplicates[serializer_name] += count - 1
+        if not duplicates:
+            return
+        for serializer_name, count in duplicates.items():
+            metrics.incr(
+                "serialize.duplicate_lookups",
+                amount=count,
+                tags={"endpoint": name, "serializer": serializer_name},
+            )
+        logger.info(
+            "serialize.duplicate-lookups",
+            extra={"endpoint": name, "duplicates": dict(duplicates.most_common())},
+        )
+
+
 class Serializer:
     """ A Serializer class contains the logic to serialize a specific type of object. """
 
@@ -101,3 +237,110 @@ class Serializer:
         :returns A serialized version of `obj`.
         """
         return {}
+
+
+class AttributeBatch:
+    """
+    Collects the independent data dependencies of a `get_attrs` call so they
+    can be loaded together instead of one after the other.
+
+    Snuba queries are all sent in a single `bulk_raw_query`, which prepares
+    them in the calling thread and runs the HTTP requests concurrently on the
+    snuba query pool. Other loaders are run in the calling thread, because the
+    database connections they use cannot be shared between threads.
+
+    >>> batch = AttributeBatch(referrer="serializers.MySerializer.get_attrs")
+    >>> batch.add_query("stats", query_kwargs, process=process_stats)
+    >>> batch.add("owners", get_owner_details, item_list)
+    >>> loaded = batch.load()
+    >>> loaded["stats"], loaded["owners"]
+    """
+
+    def __init__(self, referrer: Optional[str] = None):
+        self.referrer = referrer
+        self._queries = []
+        self._loaders = []
+
+    def add_query(
+        self,
+        name: str,
+        query: Optional[Mapping[str, Any]],
+        process: Optional[Callable[[Optional[Mapping[str, Any]]], Any]] = None,
+    ) -> None:
+        """
+        Adds a snuba query, given as `SnubaQueryParams` keyword arguments.
+        `process` turns the raw result into the loaded value. It is called with
+        `None` when `query` is `None` or falls outside of the retention window.
+        """
+        self._queries.append((name, query, process))
+
+    def add(self, name: str, loader: Callable[..., Any], *args, **kwargs) -> None:
+        """ Adds a dependency loaded by calling `loader(*args, **kwargs)`. """
+        self._loaders.append((name, loader, args, kwargs))
+
+    def load(self) -> Dict[str, Any]:
+        """ Loads every dependency and returns their values by name. """
+        from sentry.utils import snuba
+        from sentry.utils.snql import should_use_snql
+
+        queries = [(name, query) for name, query, _ in self._queries if query is not None]
+        results = {}
+        if queries:
+            with sentry_sdk.start_span(op="serialize.batch.queries") as span:
+                span.set_data("Query Count", len(queries))
+                bodies = snuba.bulk_raw_query(
+                    [snuba.SnubaQueryParams(**query) for _, query in queries],
+                    referrer=self.referrer,
+                    use_snql=should_use_snql(self.referrer),
+                    return_exceptions=True,
+                )
+            for (name, _), body in zip(queries, bodies):
+                if isinstance(
+                    body, (snuba.QueryOutsideRetentionError, snuba.QueryOutsideGroupActivityError)
+                ):
+                    body = None
+                elif isinstance(body, Exception):
+                    raise body
+                results[name] = body
+
+        loaded = {}
+        for name, _, process in self._queries:
+            body = results.get(name)
+            loaded[name] = process(body) if process is not None else body
+        for name, loader, args, kwargs in self._loaders:
+            with sentry_sdk.start_span(op="serialize.batch.loader", description=name):
+                loaded[name] = loader(*args, **kwargs)
+        return loaded
+
+
+class ColumnarAttrs(Mapping):
+    """
+    The attrs of a `get_attrs` call stored as one array per attribute, aligned
+    with `item_list`, rather than as one dict per item. Per-item dicts are only
+    built when an item's attrs are looked up, on top of the optional `base`
+    mapping of items to attrs.
+    """
+
+    def __init__(self, item_list: Sequence[Any], base: Optional[Mapping[Any, Any]] = None):
+        self._index = {item: i for i, item in enumerate(item_list)}
+        self._size = len(item_list)
+        self._base = base or {}
+        self._columns = {}
+
+    def set_column(self, name: str, values: Sequence[Any]) -> None:
+        """ Sets the values of the attribute `name`, in the order of `item_list`. """
+        assert len(values) == self._size, "column length does not match item_list"
+        self._columns[name] = values
+
+    def __getitem__(self, item):
+        index = self._index[item]
+        attrs = dict(self._base.get(item, {}))
+        for name, values in self._columns.items():
+            attrs[name] = values[index]
+        return attrs
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
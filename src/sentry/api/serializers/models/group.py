@@ -13,6 +13,7 @@ from django.utils import timezone
 from sentry import tagstore, tsdb
 from sentry.api.event_search import convert_search_filter_to_snuba_query
 from sentry.api.serializers import Serializer, register, serialize
+from sentry.api.serializers.base import AttributeBatch, ColumnarAttrs
 from sentry.api.serializers.models.actor import ActorSerializer
 from sentry.app import env
 from sentry.auth.superuser import is_active_superuser
@@ -266,7 +267,7 @@ class GroupSerializerBase(Serializer):
 
         return results
 
-    def get_attrs(self, item_list, user):
+    def get_attrs(self, item_list, user, seen_stats=None):
         from sentry.integrations import IntegrationFeatures
         from sentry.models import PlatformExternalIssue
         from sentry.plugins.base import plugins
@@ -349,7 +350,8 @@ class GroupSerializerBase(Serializer):
 
         result = {}
 
-        seen_stats = self._get_seen_stats(item_list, user)
+        if seen_stats is None:
+            seen_stats = self._get_seen_stats(item_list, user)
 
         annotations_by_group_id = defaultdict(list)
 
@@ -677,7 +679,10 @@ class GroupStatsMixin:
         if self.stats_period:
             # we need to compute stats at 1d (1h resolution), and 14d or a custom given period
             group_ids = [g.id for g in item_list]
+            return self.query_tsdb(group_ids, self._get_stats_query_params(), **kwargs)
 
+    def _get_stats_query_params(self):
+        if self.stats_period:
             if self.stats_period == "auto":
                 total_period = (self.stats_period_end - self.stats_period_start).total_seconds()
                 if total_period < timedelta(hours=24).total_seconds():
@@ -713,8 +718,7 @@ class GroupStatsMixin:
                     "end": now,
                     "rollup": int(interval.total_seconds()),
                 }
-
-            return self.query_tsdb(group_ids, query_params, **kwargs)
+            return query_params
 
 
 class StreamGroupSerializer(GroupSerializer, GroupStatsMixin):
@@ -862,6 +866,25 @@ class GroupSerializerSnuba(GroupSerializerBase):
     def _execute_seen_stats_query(
         self, item_list, start=None, end=None, conditions=None, environment_ids=None
     ):
+        query, process = self._get_seen_stats_query(
+            item_list,
+            start=start,
+            end=end,
+            conditions=conditions,
+            environment_ids=environment_ids,
+        )
+        result = snuba.aliased_query(
+            referrer="serializers.GroupSerializerSnuba._execute_seen_stats_query", **query
+        )
+        return process(result)
+
+    def _get_seen_stats_query(
+        self, item_list, start=None, end=None, conditions=None, environment_ids=None
+    ):
+        """
+        Returns the `aliased_query` keyword arguments of a seen stats query,
+        along with the function turning its result into the seen stats attrs.
+        """
         project_ids = list({item.project_id for item in item_list})
         group_ids = [item.id for item in item_list]
         aggregations = [
@@ -873,7 +896,7 @@ class GroupSerializerSnuba(GroupSerializerBase):
         filters = {"project_id": project_ids, "group_id": group_ids}
         if self.environment_ids:
             filters["environment"] = self.environment_ids
-        result = snuba.aliased_query(
+        query = dict(
             dataset=snuba.Dataset.Events,
             start=start,
             end=end,
@@ -881,13 +904,24 @@ class GroupSerializerSnuba(GroupSerializerBase):
             conditions=conditions,
             filter_keys=filters,
             aggregations=aggregations,
-            referrer="serializers.GroupSerializerSnuba._execute_seen_stats_query",
         )
+        return query, functools.partial(
+            self._process_seen_stats_result,
+            item_list,
+            start=start,
+            end=end,
+            conditions=conditions,
+            environment_ids=environment_ids,
+        )
+
+    def _process_seen_stats_result(
+        self, item_list, result, start=None, end=None, conditions=None, environment_ids=None
+    ):
         seen_data = {
             issue["group_id"]: fix_tag_value_data(
                 dict(filter(lambda key: key[0] != "group_id", issue.items()))
             )
-            for issue in result["data"]
+            for issue in (result["data"] if result is not None else [])
         }
         user_counts = {item_id: value["count"] for item_id, value in seen_data.items()}
         last_seen = {item_id: value["last_seen"] for item_id, value in seen_data.items()}
@@ -965,38 +999,67 @@ class StreamGroupSerializerSnuba(GroupSerializerSnuba, GroupStatsMixin):
         self.matching_event_id = matching_event_id
 
     def _get_seen_stats(self, item_list, user):
-        if not self._collapse("stats"):
-            partial_execute_seen_stats_query = functools.partial(
-                self._execute_seen_stats_query,
-                item_list=item_list,
-                environment_ids=self.environment_ids,
-                start=self.start,
-                end=self.end,
+        batch = AttributeBatch(
+            referrer="serializers.GroupSerializerSnuba._execute_seen_stats_query"
+        )
+        self._add_seen_stats_queries(batch, item_list)
+        return self._merge_seen_stats(item_list, batch.load())
+
+    def _add_seen_stats_queries(self, batch, item_list):
+        if self._collapse("stats"):
+            return
+
+        def add_query(name, **kwargs):
+            query, process = self._get_seen_stats_query(
+                item_list=item_list, environment_ids=self.environment_ids, **kwargs
             )
-            time_range_result = partial_execute_seen_stats_query()
-            filtered_result = (
-                partial_execute_seen_stats_query(conditions=self.conditions)
-                if self.conditions and not self._collapse("filtered")
-                else None
+            batch.add_query(name, snuba.aliased_query_params(**query), process)
+
+        add_query("seen_stats", start=self.start, end=self.end)
+        if self.conditions and not self._collapse("filtered"):
+            add_query(
+                "filtered_seen_stats", start=self.start, end=self.end, conditions=self.conditions
             )
-            if not self._collapse("lifetime"):
-                lifetime_result = (
-                    partial_execute_seen_stats_query(start=None, end=None)
-                    if self.start or self.end
-                    else time_range_result
-                )
-            else:
-                lifetime_result = None
+        if not self._collapse("lifetime") and (self.start or self.end):
+            add_query("lifetime_seen_stats")
 
-            for item in item_list:
-                time_range_result[item].update(
-                    {
-                        "filtered": filtered_result.get(item) if filtered_result else None,
-                        "lifetime": lifetime_result.get(item) if lifetime_result else None,
-                    }
-                )
-            return time_range_result
-        return None
+    def _merge_seen_stats(self, item_list, loaded):
+        if self._collapse("stats"):
+            return None
+
+        time_range_result = loaded["seen_stats"]
+        filtered_result = loaded.get("filtered_seen_stats")
+        if not self._collapse("lifetime"):
+            lifetime_result = loaded.get("lifetime_seen_stats", time_range_result)
+        else:
+            lifetime_result = None
+
+        for item in item_list:
+            time_range_result[item].update(
+                {
+                    "filtered": filtered_result.get(item) if filtered_result else None,
+                    "lifetime": lifetime_result.get(item) if lifetime_result else None,
+                }
+            )
+        return time_range_result
+
+    def _add_stats_queries(self, batch, item_list):
+        if not self.stats_period or self._collapse("stats"):
+            return
+
+        def add_query(name, conditions=None):
+            query, process = snuba_tsdb.get_range_query(
+                model=snuba_tsdb.models.group,
+                keys=[item.id for item in item_list],
+                environment_ids=self.environment_ids,
+                conditions=conditions,
+                **self._get_stats_query_params(),
+            )
+            batch.add_query(name, query, process)
+
+        add_query("stats")
+        if self.conditions and not self._collapse("filtered"):
+            add_query("filtered_stats", conditions=self.conditions)
 
     def query_tsdb(self, group_ids, query_params, conditions=None, environment_ids=None, **kwargs):
         return snuba_tsdb.get_range(
@@ -1008,39 +1071,34 @@ class StreamGroupSerializerSnuba(GroupSerializerSnuba, GroupStatsMixin):
         )
 
     def get_attrs(self, item_list, user):
-        if not self._collapse("base"):
-            attrs = super().get_attrs(item_list, user)
-        else:
-            seen_stats = self._get_seen_stats(item_list, user)
-            if seen_stats:
-                attrs = {item: seen_stats.get(item, {}) for item in item_list}
-            else:
-                attrs = {item: {} for item in item_list}
-
-        if self.stats_period and not self._collapse("stats"):
-            partial_get_stats = functools.partial(
-                self.get_stats, item_list=item_list, user=user, environment_ids=self.environment_ids
-            )
-            stats = partial_get_stats()
-            filtered_stats = (
-                partial_get_stats(conditions=self.conditions)
-                if self.conditions and not self._collapse("filtered")
-                else None
-            )
-            for item in item_list:
-                if filtered_stats:
-                    attrs[item].update({"filtered_stats": filtered_stats[item.id]})
-                attrs[item].update({"stats": stats[item.id]})
-
+        # The seen stats, the stats and the expanded details do not depend on
+        # each other, so they are loaded as a single batch.
+        batch = AttributeBatch(referrer="serializers.StreamGroupSerializerSnuba.get_attrs")
+        self._add_seen_stats_queries(batch, item_list)
+        self._add_stats_queries(batch, item_list)
         if self._expand("inbox"):
-            inbox_stats = get_inbox_details(item_list)
-            for item in item_list:
-                attrs[item].update({"inbox": inbox_stats.get(item.id)})
-
+            batch.add("inbox", get_inbox_details, item_list)
         if self._expand("owners"):
-            owner_details = get_owner_details(item_list)
-            for item in item_list:
-                attrs[item].update({"owners": owner_details.get(item.id)})
+            batch.add("owners", get_owner_details, item_list)
+        loaded = batch.load()
+
+        seen_stats = self._merge_seen_stats(item_list, loaded)
+        if not self._collapse("base"):
+            base_attrs = super().get_attrs(item_list, user, seen_stats=seen_stats)
+        elif seen_stats:
+            base_attrs = {item: seen_stats.get(item, {}) for item in item_list}
+        else:
+            base_attrs = {}
+
+        attrs = ColumnarAttrs(item_list, base=base_attrs)
+        if "filtered_stats" in loaded:
+            attrs.set_column("filtered_stats", [loaded["filtered_stats"][i.id] for i in item_list])
+        if "stats" in loaded:
+            attrs.set_column("stats", [loaded["stats"][item.id] for item in item_list])
+        if "inbox" in loaded:
+            attrs.set_column("inbox", [loaded["inbox"].get(item.id) for item in item_list])
+        if "owners" in loaded:
+            attrs.set_column("owners", [loaded["owners"].get(item.id) for item in item_list])
 
         return attrs
 
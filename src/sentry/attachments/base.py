@@ -100,45 +100,82 @@ class BaseAttachmentCache:
         self.inner = inner
 
     def set(self, key, attachments, timeout=None):
-        for id, attachment in enumerate(attachments):
-            if attachment.chunks is not None:
-                continue
-            # TODO(markus): We need to get away from sequential IDs, they
-            # are risking collision when using Relay.
-            if attachment.id is None:
-                attachment.id = id
-
-            if attachment.key is None:
-                attachment.key = key
-
-            metrics_tags = {"type": attachment.type}
-            self.set_unchunked_data(
-                key=key,
-                id=attachment.id,
-                data=attachment.data,
-                timeout=timeout,
-                metrics_tags=metrics_tags,
-            )
-
+        self.set_many([(key, attachments)], timeout=timeout)
+
+    def set_many(self, items, timeout=None):
+        """
+        Stores the attachments of many events at once. `items` is a sequence
+        of ``(key, attachments)`` tuples.
+
+        Data and meta of all attachments are written with one batched call to
+        the backing cache each.
+        """
+        data = {}
+        meta = {}
+
+        for key, attachments in items:
+            for id, attachment in enumerate(attachments):
+                if attachment.chunks is not None:
+                    continue
+                # TODO(markus): We need to get away from sequential IDs, they
+                # are risking collision when using Relay.
+                if attachment.id is None:
+                    attachment.id = id
+
+                if attachment.key is None:
+                    attachment.key = key
+
+                metrics_tags = {"type": attachment.type}
+                data[
+                    ATTACHMENT_UNCHUNKED_DATA_KEY.format(key=key, id=attachment.id)
+                ] = self._compress_unchunked_data(attachment.data, metrics_tags=metrics_tags)
+
+            meta[ATTACHMENT_META_KEY.format(key=key)] = self._get_meta(attachments)
+
+        if data:
+            self.inner.set_many(data, timeout, raw=True)
+        if meta:
+            self.inner.set_many(meta, timeout, raw=False)
+
+    def _get_meta(self, attachments):
         meta = []
 
         for attachment in attachments:
             attachment._cache = self
             meta.append(attachment.meta())
 
-        self.inner.set(ATTACHMENT_META_KEY.format(key=key), meta, timeout, raw=False)
+        return meta
 
     def set_chunk(self, key, id, chunk_index, chunk_data, timeout=None):
         key = ATTACHMENT_DATA_CHUNK_KEY.format(key=key, id=id, chunk_index=chunk_index)
         self.inner.set(key, zlib.compress(chunk_data), timeout, raw=True)
 
+    def set_chunks(self, chunks, timeout=None):
+        """
+        Like `set_chunk`, but stores many chunks with one batched call to the
+        backing cache. `chunks` is a sequence of ``(key, id, chunk_index,
+        chunk_data)`` tuples.
+        """
+        items = {
+            ATTACHMENT_DATA_CHUNK_KEY.format(
+                key=key, id=id, chunk_index=chunk_index
+            ): zlib.compress(chunk_data)
+            for key, id, chunk_index, chunk_data in chunks
+        }
+        if items:
+            self.inner.set_many(items, timeout, raw=True)
+
     def set_unchunked_data(self, key, id, data, timeout=None, metrics_tags=None):
         key = ATTACHMENT_UNCHUNKED_DATA_KEY.format(key=key, id=id)
+        compressed = self._compress_unchunked_data(data, metrics_tags=metrics_tags)
+        self.inner.set(key, compressed, timeout, raw=True)
+
+    def _compress_unchunked_data(self, data, metrics_tags=None):
         compressed = zlib.compress(data)
         metrics.timing("attachments.blob-size.raw", len(data), tags=metrics_tags)
         metrics.timing("attachments.blob-size.compressed", len(compressed), tags=metrics_tags)
         metrics.incr("attachments.received", tags=metrics_tags, skip_internal=False)
-        self.inner.set(key, compressed, timeout, raw=True)
+        return compressed
 
     def get_from_chunks(self, key, **attachment):
         return CachedAttachment(key=key, cache=self, **attachment)
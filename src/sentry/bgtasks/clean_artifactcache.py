@@ -0,0 +1,7 @@
+from sentry.bgtasks.api import bgtask
+from sentry.models import artifact_cache
+
+
+@bgtask()
+def clean_artifactcache():
+    artifact_cache.evict()
@@ -1,7 +0,0 @@
-from sentry.bgtasks.api import bgtask
-from sentry.models import ReleaseFile
-
-
-@bgtask()
-def clean_releasefilecache():
-    ReleaseFile.cache.clear_old_entries()
@@ -1,11 +1,28 @@
 import logging
+from collections import defaultdict
 
-from django.db.models import F
+from django.core.exceptions import FieldDoesNotExist
+from django.db import OperationalError, connections, router
+from django.db.models import AutoField, BigIntegerField, F, IntegerField, Model
 
 from sentry.signals import buffer_incr_complete
 from sentry.tasks.process_buffer import process_incr
+from sentry.utils import metrics
 from sentry.utils.services import Service
 
+# The maximum number of rows updated by a single statement in `process_batch`.
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def _get_cast_type(field, connection):
+    # Auto fields are typed serial or bigserial, which only exist in column
+    # definitions, so values are cast to the underlying integer type instead.
+    if isinstance(field, AutoField):
+        if field.get_internal_type() in ("BigAutoField", "BigIntegerField"):
+            return BigIntegerField().db_type(connection)
+        return IntegerField().db_type(connection)
+    return field.db_type(connection)
+
 
 class BufferMount(type):
     def __new__(cls, name, bases, attrs):
@@ -82,3 +99,198 @@ class Buffer(Service, metaclass=BufferMount):
             created=created,
             sender=model,
         )
+
+    def process_batch(self, model, incrs):
+        """
+        Applies many increments of the same model at once. ``incrs`` is a
+        list of ``(columns, filters, extra, signal_only)`` tuples, with the
+        same meaning as the arguments of `process`.
+
+        On Postgres, increments that filter by, increment and set the same
+        columns are merged into multi-row ``UPDATE ... FROM (VALUES ...)``
+        statements. Increments that cannot be merged and rows that do not
+        exist yet go through `process` one by one. `buffer_incr_complete` is
+        sent for every increment either way.
+        """
+        using = router.db_for_write(model)
+        if len(incrs) < 2 or connections[using].vendor != "postgresql":
+            for incr in incrs:
+                self._process_one(model, incr)
+            return
+
+        incrs_by_shape = defaultdict(list)
+        seen_filters = set()
+        for incr in incrs:
+            shape = self._get_bulk_update_shape(model, *incr)
+
+            # A row that appears twice in one statement is only updated once,
+            # so repeated filters are applied separately.
+            filters = tuple(
+                (k, v.pk if isinstance(v, Model) else v) for k, v in sorted(incr[1].items())
+            )
+            if shape is None or filters in seen_filters:
+                self._process_one(model, incr)
+            else:
+                seen_filters.add(filters)
+                incrs_by_shape[shape].append(incr)
+
+        for shape, shape_incrs in incrs_by_shape.items():
+            for i in range(0, len(shape_incrs), BULK_UPDATE_BATCH_SIZE):
+                batch = shape_incrs[i : i + BULK_UPDATE_BATCH_SIZE]
+                if len(batch) == 1:
+                    self._process_one(model, batch[0])
+                    continue
+
+                try:
+                    updated = self._bulk_update(model, using, shape, batch)
+                except OperationalError:
+                    # Most likely a deadlock with a concurrent bulk update.
+                    self.logger.warning("buffer.bulk-update.failed", exc_info=True)
+                    updated = set()
+                except Exception:
+                    # Retried one by one, so that a single bad increment only
+                    # fails itself.
+                    self.logger.exception(
+                        "buffer.bulk-update.failed", extra={"model": model.__name__}
+                    )
+                    updated = set()
+
+                for row, (columns, filters, extra, signal_only) in enumerate(batch):
+                    if row in updated:
+                        buffer_incr_complete.send_robust(
+                            model=model,
+                            columns=columns,
+                            filters=filters,
+                            extra=extra,
+                            created=False,
+                            sender=model,
+                        )
+                    else:
+                        self._process_one(model, (columns, filters, extra, signal_only))
+
+    def _process_one(self, model, incr):
+        # The increments of a batch have already been taken off the buffer, so
+        # a failing one must not take the others down with it.
+        try:
+            Buffer.process(self, model, *incr)
+        except Exception:
+            self.logger.exception("buffer.process.failed", extra={"model": model.__name__})
+
+    def _get_bulk_update_shape(self, model, columns, filters, extra=None, signal_only=None):
+        """
+        Returns a hashable description of the statement that applies this
+        increment as part of a multi-row update, or `None` if it cannot be
+        merged with others.
+        """
+        from sentry.models import Group
+
+        if signal_only:
+            return None
+
+        extra_names = set(extra or ())
+
+        # See `process` for how the score of groups is computed.
+        compute_score = model is Group and "last_seen" in extra_names and "times_seen" in columns
+        if compute_score:
+            extra_names.discard("score")
+
+        if extra_names & set(columns):
+            return None
+
+        for name in (*filters, *columns, *extra_names):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+
+        for value in (*filters.values(), *columns.values(), *(extra[n] for n in extra_names)):
+            # Expressions cannot be passed as parameters.
+            if hasattr(value, "resolve_expression"):
+                return None
+
+        return (
+            tuple(sorted(filters)),
+            tuple(sorted(columns)),
+            tuple(sorted(extra_names)),
+            compute_score,
+        )
+
+    def _bulk_update(self, model, using, shape, incrs):
+        """
+        Runs one ``UPDATE ... FROM (VALUES ...)`` statement for increments of
+        the same shape. Returns the indexes of the increments that matched an
+        existing row.
+        """
+        filter_names, column_names, extra_names, compute_score = shape
+        connection = connections[using]
+        qn = connection.ops.quote_name
+
+        names = (*filter_names, *column_names, *extra_names)
+        fields = [model._meta.get_field(name) for name in names]
+        columns = [qn(field.column) for field in fields]
+        values = [f"v._{i}::{_get_cast_type(field, connection)}" for i, field in enumerate(fields)]
+
+        conditions = []
+        assignments = []
+        for i, name in enumerate(names):
+            if i < len(filter_names):
+                conditions.append(f"t.{columns[i]} = {values[i]}")
+            elif i < len(filter_names) + len(column_names):
+                assignments.append(f"{columns[i]} = t.{columns[i]} + {values[i]}")
+            else:
+                assignments.append(f"{columns[i]} = {values[i]}")
+
+        if compute_score:
+            # Equivalent to `ScoreClause.as_sql` with the new values.
+            times_seen = names.index("times_seen")
+            assignments.append(
+                "{} = log(t.{} + {}) * 600 + floor(extract(epoch from {}))".format(
+                    qn(model._meta.get_field("score").column),
+                    columns[times_seen],
+                    values[times_seen],
+                    values[names.index("last_seen")],
+                )
+            )
+
+        rows = []
+        for row, (columns_, filters, extra, _) in enumerate(incrs):
+            row_params = []
+            for field, value in zip(
+                fields,
+                (
+                    *(filters[name] for name in filter_names),
+                    *(columns_[name] for name in column_names),
+                    *(extra[name] for name in extra_names),
+                ),
+            ):
+                if isinstance(value, Model):
+                    value = value.pk
+                row_params.append(field.get_db_prep_save(value, connection))
+            rows.append((row_params[: len(filter_names)], row, row_params))
+
+        # Concurrent flushes lock the rows in the same order, so that they
+        # cannot deadlock on each other.
+        rows.sort(key=lambda r: (tuple((v is None, v) for v in r[0]), r[1]))
+        params = []
+        for _, row, row_params in rows:
+            params.append(row)
+            params.extend(row_params)
+
+        placeholders = "({})".format(", ".join(["%s"] * (len(fields) + 1)))
+        sql = "UPDATE {} AS t SET {} FROM (VALUES {}) AS v(_row, {}) WHERE {} RETURNING v._row".format(
+            qn(model._meta.db_table),
+            ", ".join(assignments),
+            ", ".join([placeholders] * len(incrs)),
+            ", ".join(f"_{i}" for i in range(len(fields))),
+            " AND ".join(conditions),
+        )
+
+        with metrics.timer("buffer.bulk-update", tags={"model": model.__name__}):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                updated = {row for (row,) in cursor.fetchall()}
+
+        metrics.incr("buffer.bulk-update.rows", amount=len(updated), tags={"model": model.__name__})
+        return updated
@@ -1,12 +1,17 @@
+import atexit
+import os
 import pickle
 import threading
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 from time import time
 
+import msgpack
 from django.db import models
 from django.utils import timezone
 from django.utils.encoding import force_bytes, force_text
 
+from sentry import options
 from sentry.buffer import Buffer
 from sentry.exceptions import InvalidConfiguration
 from sentry.tasks.process_buffer import process_incr, process_pending
@@ -19,6 +24,55 @@ from sentry.utils.redis import get_cluster_from_options
 _local_buffers = None
 _local_buffers_lock = threading.Lock()
 
+# Filters and extra values used to be stored as JSON and are now pickled by
+# default. Values in the msgpack encoding are prefixed with this version byte,
+# which neither a JSON document nor a pickle can start with, so that all
+# encodings can be told apart when reading them back.
+MSGPACK_ENCODING_VERSION = b"\x02"
+
+# msgpack extension types used for values that msgpack cannot represent
+# natively.
+EXT_DATETIME = 1
+EXT_MODEL = 2
+EXT_PICKLE = 3
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _msgpack_default(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        delta = value - EPOCH
+        return msgpack.ExtType(
+            EXT_DATETIME, msgpack.packb([delta.days * 86400 + delta.seconds, delta.microseconds])
+        )
+    elif isinstance(value, models.Model) and value.pk is not None:
+        # Models are stored as references and come back as instances that
+        # only have their primary key set, which is all filters and updates
+        # need.
+        model = type(value)
+        return msgpack.ExtType(
+            EXT_MODEL,
+            msgpack.packb(
+                [f"{model.__module__}.{model.__name__}", value.pk], default=_msgpack_default
+            ),
+        )
+
+    # Anything else (e.g. query expressions) falls back to pickle.
+    metrics.incr("buffer.encode.pickle-fallback", tags={"type": type(value).__name__})
+    return msgpack.ExtType(EXT_PICKLE, pickle.dumps(value))
+
+
+def _msgpack_ext_hook(code, data):
+    if code == EXT_DATETIME:
+        seconds, microseconds = msgpack.unpackb(data)
+        return EPOCH + timedelta(seconds=seconds, microseconds=microseconds)
+    elif code == EXT_MODEL:
+        path, pk = msgpack.unpackb(data, ext_hook=_msgpack_ext_hook)
+        return import_string(path)(pk=pk)
+    elif code == EXT_PICKLE:
+        return pickle.loads(data)
+    raise TypeError(f"invalid extension type: {code}")
+
 
 class PendingBuffer:
     def __init__(self, size):
@@ -47,16 +101,75 @@ class PendingBuffer:
         return rv
 
 
+class LocalBuffer:
+    """
+    Sums up increments per buffer key in process memory. The keys are kept in
+    a `PendingBuffer`, so the local buffer is full once it holds `size`
+    distinct keys.
+    """
+
+    def __init__(self, size):
+        self.pid = os.getpid()
+        self.created_at = time()
+        self.keys = PendingBuffer(size)
+        self.incrs = {}
+        self.count = 0
+
+    def add(self, key, model, columns, filters, extra=None, signal_only=None):
+        pending = self.incrs.get(key)
+        if pending is None:
+            self.keys.append(key)
+            self.incrs[key] = [model, dict(columns), filters, dict(extra or ()), signal_only]
+        else:
+            pending_columns, pending_extra = pending[1], pending[3]
+            for column, amount in columns.items():
+                pending_columns[column] = pending_columns.get(column, 0) + amount
+            # Same semantics as in Redis: last write wins for extra values,
+            # and signal_only sticks once set.
+            pending_extra.update(extra or ())
+            if signal_only is True:
+                pending[4] = True
+        self.count += 1
+
+    def flush(self):
+        return [(key, self.incrs.pop(key)) for key in self.keys.flush()]
+
+
 class RedisBuffer(Buffer):
     key_expire = 60 * 60  # 1 hour
     pending_key = "b:p"
 
-    def __init__(self, pending_partitions=1, incr_batch_size=2, **options):
+    def __init__(
+        self,
+        pending_partitions=1,
+        incr_batch_size=2,
+        local_buffer_size=0,
+        local_flush_interval=1.0,
+        **options,
+    ):
         self.cluster, options = get_cluster_from_options("SENTRY_BUFFER_OPTIONS", options)
         self.pending_partitions = pending_partitions
         self.incr_batch_size = incr_batch_size
+        # With a local buffer size, increments are summed up in process memory
+        # and only written to Redis once that many distinct keys are pending
+        # or `local_flush_interval` seconds have passed.
+        self.local_buffer_size = local_buffer_size
+        self.local_flush_interval = local_flush_interval
         assert self.pending_partitions > 0
         assert self.incr_batch_size > 0
+        assert self.local_buffer_size >= 0
+
+    def setup(self):
+        if not self.local_buffer_size:
+            return
+
+        from celery.signals import task_postrun, worker_process_shutdown
+        from django.core.signals import request_finished
+
+        task_postrun.connect(self.maybe_flush_local, weak=False)
+        request_finished.connect(self.maybe_flush_local, weak=False)
+        worker_process_shutdown.connect(self.flush_local, weak=False)
+        atexit.register(self.flush_local)
 
     def validate(self):
         try:
@@ -129,6 +242,29 @@ class RedisBuffer(Buffer):
             result[k] = self._load_value((t, v))
         return result
 
+    def _encode(self, value):
+        """
+        Encodes a filter or extra value for storage in the buffer hash.
+        """
+        if not options.get("buffer.redis.msgpack-encoding"):
+            return pickle.dumps(value)
+        return MSGPACK_ENCODING_VERSION + msgpack.packb(value, default=_msgpack_default)
+
+    def _decode(self, value, json_prefix):
+        """
+        Decodes a value written by `_encode`, or by any previous version of
+        `incr`: JSON documents starting with `json_prefix`, or pickles.
+        """
+        if value.startswith(MSGPACK_ENCODING_VERSION):
+            # Decode straight out of the value without copying the payload.
+            return msgpack.unpackb(memoryview(value)[1:], ext_hook=_msgpack_ext_hook)
+        elif value.startswith(json_prefix):
+            if json_prefix == b"{":
+                return self._load_values(json.loads(value.decode("utf-8")))
+            return self._load_value(json.loads(value.decode("utf-8")))
+        # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
+        return pickle.loads(value)
+
     def _load_value(self, payload):
         (type_, value) = payload
         if type_ == "s":
@@ -151,11 +287,79 @@ class RedisBuffer(Buffer):
             - Perform a set (last write wins) on extra
             - Perform a set on signal_only (only if True)
         - Add hashmap key to pending flushes
+
+        If a local buffer is configured, this is deferred until the local
+        buffer is flushed.
         """
+        key = self._make_key(model, filters)
 
+        metrics.incr(
+            "buffer.incr",
+            skip_internal=True,
+            tags={"module": model.__module__, "model": model.__name__},
+        )
+
+        if self.local_buffer_size:
+            self._incr_local(key, model, columns, filters, extra, signal_only)
+        else:
+            self._incr_redis(key, model, columns, filters, extra, signal_only)
+
+    def _incr_local(self, key, model, columns, filters, extra=None, signal_only=None):
+        global _local_buffers
+
+        with _local_buffers_lock:
+            # Increments buffered before a fork are flushed by the parent.
+            if _local_buffers is None or _local_buffers.pid != os.getpid():
+                _local_buffers = LocalBuffer(self.local_buffer_size)
+            _local_buffers.add(key, model, columns, filters, extra, signal_only)
+
+            # Detach a full buffer while still holding the lock, so that no
+            # other thread adds to it before it is written to Redis.
+            local_buffer = None
+            if (
+                _local_buffers.keys.full()
+                or time() - _local_buffers.created_at >= self.local_flush_interval
+            ):
+                local_buffer = _local_buffers
+                _local_buffers = None
+
+        if local_buffer is not None:
+            self._flush_local_buffer(local_buffer)
+
+    def maybe_flush_local(self, **kwargs):
+        local_buffer = _local_buffers
+        if (
+            local_buffer is not None
+            and time() - local_buffer.created_at >= self.local_flush_interval
+        ):
+            self.flush_local()
+
+    def flush_local(self, **kwargs):
+        """
+        Writes all increments of the local buffer to Redis.
+        """
+        global _local_buffers
+
+        with _local_buffers_lock:
+            local_buffer = _local_buffers
+            if local_buffer is None or local_buffer.pid != os.getpid():
+                return
+            _local_buffers = None
+
+        self._flush_local_buffer(local_buffer)
+
+    def _flush_local_buffer(self, local_buffer):
+        incrs = local_buffer.flush()
+        for key, (model, columns, filters, extra, signal_only) in incrs:
+            self._incr_redis(key, model, columns, filters, extra, signal_only)
+
+        # The difference between both is the Redis traffic saved.
+        metrics.incr("buffer.local.incrs", amount=local_buffer.count, skip_internal=True)
+        metrics.incr("buffer.local.flushed-keys", amount=len(incrs), skip_internal=True)
+
+    def _incr_redis(self, key, model, columns, filters, extra=None, signal_only=None):
         # TODO(dcramer): longer term we'd rather not have to serialize values
         # here (unless it's to JSON)
-        key = self._make_key(model, filters)
         pending_key = self._make_pending_key_from_key(key)
         # We can't use conn.map() due to wanting to support multiple pending
         # keys (one per Redis partition)
@@ -163,10 +367,7 @@ class RedisBuffer(Buffer):
 
         pipe = conn.pipeline()
         pipe.hsetnx(key, "m", f"{model.__module__}.{model.__name__}")
-        # TODO(dcramer): once this goes live in production, we can kill the pickle path
-        # (this is to ensure a zero downtime deploy where we can transition event processing)
-        pipe.hsetnx(key, "f", pickle.dumps(filters))
-        # pipe.hsetnx(key, 'f', json.dumps(self._dump_values(filters)))
+        pipe.hsetnx(key, "f", self._encode(filters))
         for column, amount in columns.items():
             pipe.hincrby(key, "i+" + column, amount)
 
@@ -175,10 +376,7 @@ class RedisBuffer(Buffer):
             # hook here
             # e.g. "update score if last_seen or times_seen is changed"
             for column, value in extra.items():
-                # TODO(dcramer): once this goes live in production, we can kill the pickle path
-                # (this is to ensure a zero downtime deploy where we can transition event processing)
-                pipe.hset(key, "e+" + column, pickle.dumps(value))
-                # pipe.hset(key, 'e+' + column, json.dumps(self._dump_value(value)))
+                pipe.hset(key, "e+" + column, self._encode(value))
 
         if signal_only is True:
             pipe.hset(key, "s", "1")
@@ -187,12 +385,6 @@ class RedisBuffer(Buffer):
         pipe.zadd(pending_key, {key: time()})
         pipe.execute()
 
-        metrics.incr(
-            "buffer.incr",
-            skip_internal=True,
-            tags={"module": model.__module__, "model": model.__name__},
-        )
-
     def process_pending(self, partition=None):
         if partition is None and self.pending_partitions > 1:
             # If we're using partitions, this one task fans out into
@@ -243,65 +435,85 @@ class RedisBuffer(Buffer):
         if key is not None:
             batch_keys = [key]
 
-        for key in batch_keys:
-            self._process_single_incr(key)
-
-    def _process_single_incr(self, key):
         client = self.cluster.get_routing_client()
-        lock_key = self._make_lock_key(key)
         # prevent a stampede due to the way we use celery etas + duplicate
         # tasks
-        if not client.set(lock_key, "1", nx=True, ex=10):
-            metrics.incr("buffer.revoked", tags={"reason": "locked"}, skip_internal=False)
-            self.logger.debug("buffer.revoked.locked", extra={"redis_key": key})
-            return
-
-        pending_key = self._make_pending_key_from_key(key)
+        with self.cluster.map() as conn:
+            locks = [
+                (key, conn.set(self._make_lock_key(key), "1", nx=True, ex=10)) for key in batch_keys
+            ]
+
+        locked_keys = []
+        for key, locked in locks:
+            if locked.value:
+                locked_keys.append(key)
+            else:
+                metrics.incr("buffer.revoked", tags={"reason": "locked"}, skip_internal=False)
+                self.logger.debug("buffer.revoked.locked", extra={"redis_key": key})
 
         try:
-            conn = self.cluster.get_local_client_for_key(key)
-            pipe = conn.pipeline()
-            pipe.hgetall(key)
-            pipe.zrem(pending_key, key)
-            pipe.delete(key)
-            values = pipe.execute()[0]
-
-            # XXX(python3): In python2 this isn't as important since redis will
-            # return string tyes (be it, byte strings), but in py3 we get bytes
-            # back, and really we just want to deal with keys as strings.
-            values = {force_text(k): v for k, v in values.items()}
-
-            if not values:
-                metrics.incr("buffer.revoked", tags={"reason": "empty"}, skip_internal=False)
-                self.logger.debug("buffer.revoked.empty", extra={"redis_key": key})
-                return
+            incrs_by_model = defaultdict(list)
+            for key, values in self._fetch_and_clear(locked_keys):
+                if not values:
+                    metrics.incr("buffer.revoked", tags={"reason": "empty"}, skip_internal=False)
+                    self.logger.debug("buffer.revoked.empty", extra={"redis_key": key})
+                    continue
+
+                model, incr = self._load_incr(values)
+                incrs_by_model[model].append(incr)
+
+            for model, incrs in incrs_by_model.items():
+                # Failures are isolated per increment by `process_batch`.
+                self.process_batch(model, incrs)
+        finally:
+            for key in locked_keys:
+                client.delete(self._make_lock_key(key))
+
+    def _fetch_and_clear(self, keys):
+        """
+        Atomically reads and deletes the hashes of the given keys with one
+        transactional pipeline per Redis host. Yields ``(key, values)``.
+        """
+        router = self.cluster.get_router()
+        keys_by_host = defaultdict(list)
+        for key in keys:
+            keys_by_host[router.get_host_for_key(key)].append(key)
+
+        for host_id, host_keys in keys_by_host.items():
+            pipe = self.cluster.get_local_client(host_id).pipeline()
+            for key in host_keys:
+                pipe.hgetall(key)
+                pipe.zrem(self._make_pending_key_from_key(key), key)
+                pipe.delete(key)
+            results = pipe.execute()
+
+            for key, values in zip(host_keys, results[::3]):
+                # XXX(python3): In python2 this isn't as important since redis will
+                # return string tyes (be it, byte strings), but in py3 we get bytes
+                # back, and really we just want to deal with keys as strings.
+                yield key, {force_text(k): v for k, v in values.items()}
+
+    def _load_incr(self, values):
+        """
+        Loads the model and the ``(columns, filters, extra, signal_only)``
+        arguments of `Buffer.process` from the values of a buffer hash.
+        """
+        # XXX(py3): Note that ``import_string`` explicitly wants a str in
+        # python2, so we'll decode (for python3) and then translate back to
+        # a byte string (in python2) for import_string.
+        model = import_string(str(values.pop("m").decode("utf-8")))  # NOQA
 
-            # XXX(py3): Note that ``import_string`` explicitly wants a str in
-            # python2, so we'll decode (for python3) and then translate back to
-            # a byte string (in python2) for import_string.
-            model = import_string(str(values.pop("m").decode("utf-8")))  # NOQA
+        filters = self._decode(values.pop("f"), json_prefix=b"{")
 
-            if values["f"].startswith(b"{"):
-                filters = self._load_values(json.loads(values.pop("f").decode("utf-8")))
-            else:
-                # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
-                filters = pickle.loads(values.pop("f"))
-
-            incr_values = {}
-            extra_values = {}
-            signal_only = None
-            for k, v in values.items():
-                if k.startswith("i+"):
-                    incr_values[k[2:]] = int(v)
-                elif k.startswith("e+"):
-                    if v.startswith(b"["):
-                        extra_values[k[2:]] = self._load_value(json.loads(v.decode("utf-8")))
-                    else:
-                        # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
-                        extra_values[k[2:]] = pickle.loads(v)
-                elif k == "s":
-                    signal_only = bool(int(v))  # Should be 1 if set
-
-            super().process(model, incr_values, filters, extra_values, signal_only)
-        finally:
-            client.delete(lock_key)
+        incr_values = {}
+        extra_values = {}
+        signal_only = None
+        for k, v in values.items():
+            if k.startswith("i+"):
+                incr_values[k[2:]] = int(v)
+            elif k.startswith("e+"):
+                extra_values[k[2:]] = self._decode(v, json_prefix=b"[")
+            elif k == "s":
+                signal_only = bool(int(v))  # Should be 1 if set
+
+        return model, (incr_values, filters, extra_values, signal_only)
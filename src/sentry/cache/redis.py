@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 from sentry.utils import json
 from sentry.utils.redis import get_cluster_from_options, redis_clusters
 
@@ -17,14 +19,32 @@ class CommonRedisCache(BaseCache):
         BaseCache.__init__(self, **options)
 
     def set(self, key, value, timeout, version=None, raw=False):
+        self._set(self.client, key, value, timeout, version=version, raw=raw)
+
+    def set_many(self, items, timeout, version=None, raw=False):
+        if not items:
+            return
+
+        with self._pipeline() as client:
+            for key, value in items.items():
+                self._set(client, key, value, timeout, version=version, raw=raw)
+
+    def _set(self, client, key, value, timeout, version=None, raw=False):
         key = self.make_key(key, version=version)
         v = json.dumps(value) if not raw else value
         if len(v) > self.max_size:
             raise ValueTooLarge(f"Cache key too large: {key!r} {len(v)!r}")
         if timeout:
-            self.client.setex(key, int(timeout), v)
+            client.setex(key, int(timeout), v)
         else:
-            self.client.set(key, v)
+            client.set(key, v)
+
+    def _pipeline(self):
+        """
+        Returns a context manager yielding a client whose commands are sent
+        in as few round trips as possible when the context exits.
+        """
+        raise NotImplementedError
 
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
@@ -44,6 +64,11 @@ class RbCache(CommonRedisCache):
         client = cluster.get_routing_client()
         CommonRedisCache.__init__(self, client, **options)
 
+    def _pipeline(self):
+        # rb does not support manual pipelines, but commands issued within a
+        # map are automatically batched per host.
+        return self.client.map()
+
 
 # Confusing legacy name for RbCache.  We don't actually have a pure redis cache
 RedisCache = RbCache
@@ -53,3 +78,9 @@ class RedisClusterCache(CommonRedisCache):
     def __init__(self, cluster_id, **options):
         client = redis_clusters.get(cluster_id)
         CommonRedisCache.__init__(self, client=client, **options)
+
+    @contextmanager
+    def _pipeline(self):
+        pipeline = self.client.pipeline(transaction=False)
+        yield pipeline
+        pipeline.execute()
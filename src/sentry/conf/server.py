@@ -730,8 +730,8 @@ CELERYBEAT_SCHEDULE = {
 }
 
 BGTASKS = {
-    "sentry.bgtasks.clean_dsymcache:clean_dsymcache": {"interval": 5 * 60, "roles": ["worker"]},
-    "sentry.bgtasks.clean_releasefilecache:clean_releasefilecache": {
+    # Evicts the release file and debug file caches, which share one size limit.
+    "sentry.bgtasks.clean_artifactcache:clean_artifactcache": {
         "interval": 5 * 60,
         "roles": ["worker"],
     },
@@ -1167,6 +1167,11 @@ SENTRY_ALLOW_ORIGIN = None
 # Enable scraping of javascript context for source code
 SENTRY_SCRAPE_JAVASCRIPT_CONTEXT = True
 
+# Bytes of parsed release artifacts (sourcemaps and minified sources) kept in
+# each process across events, as measured by the size of the raw artifacts.
+# Set to 0 to disable.
+SENTRY_JS_PARSED_ARTIFACT_CACHE_SIZE = 256 * 1024 * 1024
+
 # Buffer backend
 SENTRY_BUFFER = "sentry.buffer.Buffer"
 SENTRY_BUFFER_OPTIONS = {}
@@ -1222,11 +1227,27 @@ SENTRY_DEFAULT_MAX_EVENTS_PER_MINUTE = "90%"
 # Snuba configuration
 SENTRY_SNUBA = os.environ.get("SNUBA", "http://127.0.0.1:1218")
 SENTRY_SNUBA_TIMEOUT = 30
+# Number of connections to snuba kept open by each process
+SENTRY_SNUBA_POOL_SIZE = 10
+# Number of threads of each process running snuba queries concurrently
+SENTRY_SNUBA_QUERY_WORKERS = 10
+# Maximum number of concurrent snuba queries of a process per referrer, unlimited if missing
+SENTRY_SNUBA_REFERRER_CONCURRENCY = {}
 SENTRY_SNUBA_CACHE_TTL_SECONDS = 60
+# Number of cached query results kept in each process in front of the shared cache
+SENTRY_SNUBA_LOCAL_CACHE_SIZE = 1000
+# How long identical cached queries wait for the one that is running before running themselves
+SENTRY_SNUBA_CACHE_COALESCE_TIMEOUT = 5
 
 # Node storage backend
 SENTRY_NODESTORE = "sentry.nodestore.django.DjangoNodeStorage"
 SENTRY_NODESTORE_OPTIONS = {}
+# Zstandard dictionaries for the compressed nodestore encoding, as {id: path}. The id is
+# stored with every value, so dictionaries must not be removed while values using them exist.
+SENTRY_NODESTORE_DICTIONARIES = {}
+# Dictionary ids to compress the events of a project id or a platform with
+SENTRY_NODESTORE_PROJECT_DICTIONARIES = {}
+SENTRY_NODESTORE_PLATFORM_DICTIONARIES = {}
 
 # Tag storage backend
 SENTRY_TAGSTORE = os.environ.get("SENTRY_TAGSTORE", "sentry.tagstore.snuba.SnubaTagStorage")
@@ -2107,6 +2128,10 @@ SYMBOLICATOR_POLL_TIMEOUT = 10
 # max number of second to wait between subsequent attempts.
 SYMBOLICATOR_MAX_RETRY_AFTER = 5
 
+# Number of keep-alive connections each process keeps open to symbolicator, and
+# the number of tasks it polls at the same time.
+SYMBOLICATOR_POOL_SIZE = 16
+
 SENTRY_REQUEST_METRIC_ALLOWED_PATHS = (
     "sentry.web.api",
     "sentry.web.frontend",
@@ -5,11 +5,15 @@ from sentry.api.utils import get_date_range_from_params
 from sentry.models import Environment, Group, Project
 from sentry.snuba import discover
 from sentry.utils.compat import map
+from sentry.utils.iterators import chunked
 
 from ..base import ExportError
 
 logger = logging.getLogger(__name__)
 
+# Number of streamed rows whose issues are looked up at once
+HANDLE_FIELDS_CHUNK_SIZE = 1000
+
 
 class DiscoverProcessor:
     """
@@ -68,7 +72,7 @@ class DiscoverProcessor:
 
     @staticmethod
     def get_data_fn(fields, query, params, sort):
-        def data_fn(offset, limit):
+        def data_fn(offset, limit, stream=False):
             return discover.query(
                 selected_columns=fields,
                 query=query,
@@ -80,6 +84,7 @@ class DiscoverProcessor:
                 auto_fields=True,
                 auto_aggregations=True,
                 use_aggregate_conditions=True,
+                stream=stream,
             )
 
         return data_fn
@@ -102,3 +107,11 @@ class DiscoverProcessor:
                 if "issue.id" in result:
                     result["issue"] = issues.get(result["issue.id"], "unknown")
         return new_result_list
+
+    def iter_handled_fields(self, rows):
+        """
+        Like `handle_fields` for an iterable of rows, which is handled in chunks so that
+        the rows of a streamed query are never all held in memory.
+        """
+        for chunk in chunked(rows, HANDLE_FIELDS_CHUNK_SIZE):
+            yield from self.handle_fields(chunk)
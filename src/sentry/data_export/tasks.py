@@ -127,14 +127,18 @@ def assemble_download(
                     fragment_row_count = min(batch_size, max(export_limit - next_offset, 1))
 
                     rows = process_rows(processor, data_export, fragment_row_count, next_offset)
-                    writer.writerows(rows)
+                    # Discover rows are streamed, so count them while they are written
+                    row_count = 0
+                    for row in rows:
+                        writer.writerow(row)
+                        row_count += 1
 
-                    fragment_offset += len(rows)
+                    fragment_offset += row_count
                     next_offset = offset + fragment_offset
 
                     if (
-                        not rows
-                        or len(rows) < batch_size
+                        not row_count
+                        or row_count < batch_size
                         # the batch may exceed MAX_BATCH_SIZE but immediately stops
                         or tf.tell() - starting_pos >= MAX_BATCH_SIZE
                     ):
@@ -165,8 +169,8 @@ def assemble_download(
                 return data_export.email_failure(message="Internal processing failure")
         else:
             if (
-                rows
-                and len(rows) >= batch_size
+                row_count
+                and row_count >= batch_size
                 and new_bytes_written
                 and next_offset < export_limit
             ):
@@ -214,7 +218,9 @@ def process_rows(processor, data_export, batch_size, offset):
             rows = process_issues_by_tag(processor, batch_size, offset)
         elif data_export.query_type == ExportQueryType.DISCOVER:
             rows = process_discover(processor, batch_size, offset)
-        return rows
+        # Discover rows are generated lazily and raise their errors while
+        # they are consumed, so they are consumed within the handler.
+        yield from rows
     except ExportError as error:
         error_str = str(error)
         metrics.incr("dataexport.error", tags={"error": error_str}, sample_rate=1.0)
@@ -230,8 +236,12 @@ def process_issues_by_tag(processor, limit, offset):
 
 @handle_snuba_errors(logger)
 def process_discover(processor, limit, offset):
-    raw_data_unicode = processor.data_fn(limit=limit, offset=offset)["data"]
-    return processor.handle_fields(raw_data_unicode)
+    raw_data_unicode = processor.data_fn(limit=limit, offset=offset, stream=True)["data"]
+    try:
+        yield from processor.iter_handled_fields(raw_data_unicode)
+    finally:
+        # Releases the connection of rows that were not read to the end.
+        raw_data_unicode.close()
 
 
 @transaction.atomic()
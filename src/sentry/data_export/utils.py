@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from functools import wraps
+from inspect import isgeneratorfunction
 
 from sentry.snuba import discover
 from sentry.utils import metrics, snuba
@@ -7,56 +9,74 @@ from sentry.utils.sdk import capture_exception
 from .base import ExportError
 
 
+@contextmanager
+def convert_snuba_errors(logger):
+    """
+    Converts the snuba errors raised within the block into `ExportError`s.
+    """
+    try:
+        yield
+    except discover.InvalidSearchQuery as error:
+        metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
+        logger.warn("dataexport.error: %s", str(error))
+        capture_exception(error)
+        raise ExportError("Invalid query. Please fix the query and try again.")
+    except snuba.QueryOutsideRetentionError as error:
+        metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
+        logger.warn("dataexport.error: %s", str(error))
+        capture_exception(error)
+        raise ExportError("Invalid date range. Please try a more recent date range.")
+    except snuba.QueryIllegalTypeOfArgument as error:
+        metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
+        logger.warn("dataexport.error: %s", str(error))
+        capture_exception(error)
+        raise ExportError("Invalid query. Argument to function is wrong type.")
+    except snuba.SnubaError as error:
+        metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
+        logger.warn("dataexport.error: %s", str(error))
+        capture_exception(error)
+        message = "Internal error. Please try again."
+        if isinstance(
+            error,
+            (
+                snuba.RateLimitExceeded,
+                snuba.QueryMemoryLimitExceeded,
+                snuba.QueryExecutionTimeMaximum,
+                snuba.QueryTooManySimultaneous,
+            ),
+        ):
+            message = "Query timeout. Please try again. If the problem persists try a smaller date range or fewer projects."
+        elif isinstance(
+            error,
+            (
+                snuba.DatasetSelectionError,
+                snuba.QueryConnectionFailed,
+                snuba.QuerySizeExceeded,
+                snuba.QueryExecutionError,
+                snuba.SchemaValidationError,
+                snuba.UnqualifiedQueryError,
+            ),
+        ):
+            message = "Internal error. Your query failed to run."
+        raise ExportError(message)
+
+
 # Adapted into decorator from 'src/sentry/api/endpoints/organization_events.py'
 def handle_snuba_errors(logger):
     def wrapper(func):
-        @wraps(func)
-        def wrapped(*args, **kwargs):
-            try:
-                return func(*args, **kwargs)
-            except discover.InvalidSearchQuery as error:
-                metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
-                logger.warn("dataexport.error: %s", str(error))
-                capture_exception(error)
-                raise ExportError("Invalid query. Please fix the query and try again.")
-            except snuba.QueryOutsideRetentionError as error:
-                metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
-                logger.warn("dataexport.error: %s", str(error))
-                capture_exception(error)
-                raise ExportError("Invalid date range. Please try a more recent date range.")
-            except snuba.QueryIllegalTypeOfArgument as error:
-                metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
-                logger.warn("dataexport.error: %s", str(error))
-                capture_exception(error)
-                raise ExportError("Invalid query. Argument to function is wrong type.")
-            except snuba.SnubaError as error:
-                metrics.incr("dataexport.error", tags={"error": str(error)}, sample_rate=1.0)
-                logger.warn("dataexport.error: %s", str(error))
-                capture_exception(error)
-                message = "Internal error. Please try again."
-                if isinstance(
-                    error,
-                    (
-                        snuba.RateLimitExceeded,
-                        snuba.QueryMemoryLimitExceeded,
-                        snuba.QueryExecutionTimeMaximum,
-                        snuba.QueryTooManySimultaneous,
-                    ),
-                ):
-                    message = "Query timeout. Please try again. If the problem persists try a smaller date range or fewer projects."
-                elif isinstance(
-                    error,
-                    (
-                        snuba.DatasetSelectionError,
-                        snuba.QueryConnectionFailed,
-                        snuba.QuerySizeExceeded,
-                        snuba.QueryExecutionError,
-                        snuba.SchemaValidationError,
-                        snuba.UnqualifiedQueryError,
-                    ),
-                ):
-                    message = "Internal error. Your query failed to run."
-                raise ExportError(message)
+        if isgeneratorfunction(func):
+            # Errors of generators are raised while they are iterated.
+            @wraps(func)
+            def wrapped(*args, **kwargs):
+                with convert_snuba_errors(logger):
+                    yield from func(*args, **kwargs)
+
+        else:
+
+            @wraps(func)
+            def wrapped(*args, **kwargs):
+                with convert_snuba_errors(logger):
+                    return func(*args, **kwargs)
 
         return wrapped
 
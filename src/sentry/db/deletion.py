@@ -1,12 +1,20 @@
 import itertools
+import logging
+import time
+from collections import namedtuple
 from datetime import timedelta
 from uuid import uuid4
 
 from django.db import connections, router
 from django.utils import timezone
 
+from sentry.utils import metrics
 from sentry.utils.compat import zip
 
+logger = logging.getLogger(__name__)
+
+DeleteEstimate = namedtuple("DeleteEstimate", ["model", "rows", "bytes"])
+
 
 class BulkDeleteQuery:
     def __init__(self, model, project_id=None, dtfield=None, days=None, order_by=None):
@@ -65,6 +73,36 @@ class BulkDeleteQuery:
 
         return self._continuous_query(query)
 
+    def _get_where(self, extra=()):
+        quote_name = connections[self.using].ops.quote_name
+        where = [("true", [])]
+        if self.dtfield and self.days is not None:
+            cutoff = timezone.now() - timedelta(days=self.days)
+            where.append((f"{quote_name(self.dtfield)} < %s", [cutoff]))
+        if self.project_id:
+            where.append(("project_id = %s", [self.project_id]))
+        where.extend(extra)
+        conditions, parameters = zip(*where)
+        return " and ".join(conditions), list(itertools.chain.from_iterable(parameters))
+
+    def estimate(self):
+        """
+        Returns the number of rows `execute` would delete, and roughly how many
+        bytes they take up in the table, its indexes and TOAST data.
+        """
+        table = self.model._meta.db_table
+        conditions, parameters = self._get_where()
+        cursor = connections[self.using].cursor()
+        cursor.execute(f"select count(*) from {table} where {conditions}", parameters)
+        rows = cursor.fetchone()[0]
+        cursor.execute(
+            "select pg_total_relation_size(oid) / greatest(reltuples, 1) "
+            "from pg_class where oid = %s::regclass",
+            [table],
+        )
+        row_size = cursor.fetchone()[0]
+        return DeleteEstimate(self.model.__name__, rows, int(rows * row_size))
+
     def _continuous_query(self, query):
         results = True
         cursor = connections[self.using].cursor()
@@ -146,3 +184,132 @@ class BulkDeleteQuery:
 
             if chunk:
                 yield tuple(chunk)
+
+
+def get_replication_lag(using):
+    """
+    Returns how many seconds the replicas of the `using` database are behind
+    on replaying its writes, according to `pg_stat_replication`. Returns
+    `None` if no replica is visible, which is also the case when the database
+    user lacks the `pg_monitor` role.
+    """
+    cursor = connections[using].cursor()
+    cursor.execute(
+        "select count(*), coalesce(max(extract(epoch from replay_lag)), 0) from pg_stat_replication"
+    )
+    replicas, lag = cursor.fetchone()
+    if not replicas:
+        return None
+    return float(lag)
+
+
+class TimeRangeDeleteQuery(BulkDeleteQuery):
+    """
+    Deletes the rows older than `days` one `dtfield` time window at a time,
+    oldest first, so that every statement is a range scan of the `dtfield`
+    index. `BulkDeleteQuery` instead selects ids with a limit for every
+    statement, which churns the indexes of large tables.
+
+    The window grows or shrinks to keep statements around `target_duration`
+    seconds, and deletes pause while the replicas lag behind by more than
+    `max_replication_lag` seconds. No statement deletes more than `max_rows`
+    rows, a window with more rows is deleted over several statements.
+    """
+
+    min_window = timedelta(seconds=1)
+    max_window = timedelta(days=7)
+
+    def __init__(
+        self,
+        model,
+        dtfield,
+        days,
+        project_id=None,
+        window=timedelta(hours=1),
+        target_duration=0.5,
+        max_replication_lag=10,
+        throttle_interval=1,
+        max_rows=10000,
+    ):
+        super().__init__(model, project_id=project_id, dtfield=dtfield, days=days)
+        self.window = window
+        self.target_duration = target_duration
+        self.max_replication_lag = max_replication_lag
+        self.throttle_interval = throttle_interval
+        self.max_rows = max_rows
+        self._lag_unavailable_logged = False
+
+    @classmethod
+    def supports(cls, model, dtfield):
+        """ Whether `dtfield` is indexed, which time range deletes rely on. """
+        if model._meta.get_field(dtfield).db_index:
+            return True
+        for fields in model._meta.index_together:
+            if fields[0] == dtfield:
+                return True
+        return any(index.fields[0] == dtfield for index in model._meta.indexes)
+
+    def _throttle(self):
+        while True:
+            lag = get_replication_lag(self.using)
+            if lag is None:
+                if not self._lag_unavailable_logged:
+                    logger.warning(
+                        "cleanup.delete.replication-lag-unavailable",
+                        extra={"model": self.model.__name__, "using": self.using},
+                    )
+                    self._lag_unavailable_logged = True
+                return
+            if lag <= self.max_replication_lag:
+                return
+            metrics.incr("cleanup.delete.throttled", tags={"model": self.model.__name__})
+            time.sleep(self.throttle_interval)
+
+    def _adapt_window(self, window, duration):
+        factor = max(0.5, min(2.0, self.target_duration / max(duration, 0.001)))
+        return max(self.min_window, min(self.max_window, window * factor))
+
+    def execute(self, chunk_size=None):
+        """ Deletes the rows and returns how many were deleted. """
+        quote_name = connections[self.using].ops.quote_name
+        table = self.model._meta.db_table
+        dtfield = quote_name(self.dtfield)
+        pk = quote_name(self.model._meta.pk.column)
+        cursor = connections[self.using].cursor()
+
+        conditions, parameters = self._get_where()
+        cursor.execute(f"select min({dtfield}) from {table} where {conditions}", parameters)
+        start = cursor.fetchone()[0]
+
+        deleted = 0
+        window = self.window
+        cutoff = timezone.now() - timedelta(days=self.days)
+        while start is not None and start < cutoff:
+            self._throttle()
+
+            end = min(start + window, cutoff)
+            conditions, parameters = self._get_where(
+                [(f"{dtfield} >= %s", [start]), (f"{dtfield} < %s", [end])]
+            )
+            started = time.time()
+            cursor.execute(
+                f"delete from {table} where {pk} in ("
+                f"select {pk} from {table} where {conditions} limit {self.max_rows:d})",
+                parameters,
+            )
+            duration = time.time() - started
+
+            deleted += cursor.rowcount
+            metrics.timing(
+                "cleanup.delete.statement", duration, tags={"model": self.model.__name__}
+            )
+            if cursor.rowcount < self.max_rows:
+                start = end
+                window = self._adapt_window(window, duration)
+            else:
+                # The window holds more rows than one statement may delete, so
+                # the rest of it is deleted with a smaller one.
+                window = max(self.min_window, min(window / 2, self._adapt_window(window, duration)))
+
+        metrics.incr("cleanup.delete.rows", amount=deleted, tags={"model": self.model.__name__})
+        return deleted
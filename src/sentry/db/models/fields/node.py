@@ -94,6 +94,13 @@ class NodeData(collections.MutableMapping):
     def copy(self):
         return self.data.copy()
 
+    @property
+    def is_bound(self):
+        """
+        Whether the data is available without fetching it from nodestore.
+        """
+        return self._node_data is not None
+
     @memoize
     def data(self):
         """
@@ -137,11 +144,21 @@ class NodeData(collections.MutableMapping):
             currently only {"unprocessed": {...}} is added for reprocessing.
             See documentation of nodestore.
         """
+        subkeys = self.get_subkeys_to_save(subkeys)
+        if subkeys is not None:
+            nodestore.set_subkeys(self.id, subkeys)
+
+    def get_subkeys_to_save(self, subkeys=None):
+        """
+        Returns what `save` writes to nodestore for this node, for callers
+        saving multiple nodes at once with `nodestore.set_subkeys_many`.
+        Returns `None` when there is nothing to save.
+        """
 
         # We never loaded any data for reading or writing, so there
         # is nothing to save.
         if self._node_data is None:
-            return
+            return None
 
         # We can't put our wrappers into the nodestore, so we need to
         # ensure that the data is converted into a plain old dict
@@ -151,8 +168,7 @@ class NodeData(collections.MutableMapping):
 
         subkeys = subkeys or {}
         subkeys[None] = to_write
-
-        nodestore.set_subkeys(self.id, subkeys)
+        return subkeys
 
 
 class NodeField(GzippedDictField):
@@ -10,7 +10,7 @@ def load(options):
     return import_string(options["path"])(**options.get("options", {}))
 
 
-DEFAULT_CODEC = {"path": "sentry.digests.codecs.CompressedPickleCodec"}
+DEFAULT_CODEC = {"path": "sentry.digests.codecs.NotificationCodec"}
 
 
 class InvalidState(Exception):
@@ -1,6 +1,10 @@
 import pickle
 import zlib
 
+import msgpack
+
+from sentry import options
+
 
 class Codec:
     def encode(self, value):
@@ -16,3 +20,45 @@ class CompressedPickleCodec(Codec):
 
     def decode(self, value):
         return pickle.loads(zlib.decompress(value))
+
+
+class NotificationCodec(CompressedPickleCodec):
+    """
+    Stores digest notifications as the ids that are needed to rebuild them:
+    the project, event, group and rule ids, packed with msgpack behind a
+    version prefix.  The event itself is not stored, its data is fetched from
+    nodestore when the digest is built (see ``bind_record_events``.)
+
+    Values that are not notifications, and all values while the
+    ``digests.compact-encoding`` option is disabled, are stored as compressed
+    pickles.  Both formats are always decoded.
+    """
+
+    # zlib streams start with 0x78, so this never collides with pickles
+    VERSION = b"\x01"
+
+    def encode(self, value):
+        from sentry.digests.notifications import Notification
+
+        if isinstance(value, Notification) and options.get("digests.compact-encoding"):
+            event = value.event
+            try:
+                event_id = bytes.fromhex(event.event_id)
+            except (TypeError, ValueError):
+                pass
+            else:
+                return self.VERSION + msgpack.packb(
+                    [event.project_id, event_id, event.group_id, list(value.rules)],
+                    use_bin_type=True,
+                )
+        return super().encode(value)
+
+    def decode(self, value):
+        if not value.startswith(self.VERSION):
+            return super().decode(value)
+
+        from sentry.digests.notifications import Notification
+        from sentry.eventstore.models import Event
+
+        project_id, event_id, group_id, rules = msgpack.unpackb(memoryview(value)[1:], raw=False)
+        return Notification(Event(project_id, event_id.hex(), group_id=group_id), rules)
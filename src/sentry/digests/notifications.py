@@ -4,6 +4,7 @@ import logging
 from collections import OrderedDict, defaultdict, namedtuple
 from functools import reduce
 
+from sentry import eventstore
 from sentry.app import tsdb
 from sentry.digests import Record
 from sentry.models import Group, GroupStatus, Project, Rule
@@ -48,6 +49,16 @@ def event_to_record(event, rules):
     )
 
 
+def bind_record_events(records):
+    """
+    Fetches the data of all events in ``records`` that were stored without
+    it (see ``NotificationCodec``) with a single nodestore request.
+    """
+    events = [record.value.event for record in records if not record.value.event.data.is_bound]
+    if events:
+        eventstore.bind_nodes(events, "data")
+
+
 def fetch_state(project, records):
     # This reads a little strange, but remember that records are returned in
     # reverse chronological order, and we query the database in chronological
@@ -196,6 +207,7 @@ def build_digest(project, records, state=None):
     # XXX: This is a hack to allow generating a mock digest without actually
     # doing any real IO!
     if state is None:
+        bind_record_events(records)
         state = fetch_state(project, records)
 
     state = attach_state(**state)
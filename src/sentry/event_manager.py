@@ -13,7 +13,17 @@ from django.db.models import Func
 from django.utils.encoding import force_text
 from pytz import UTC
 
-from sentry import buffer, eventstore, eventstream, eventtypes, features, options, quotas, tsdb
+from sentry import (
+    buffer,
+    eventstore,
+    eventstream,
+    eventtypes,
+    features,
+    nodestore,
+    options,
+    quotas,
+    tsdb,
+)
 from sentry.attachments import MissingAttachmentChunks, attachment_cache
 from sentry.constants import (
     DEFAULT_STORE_NORMALIZER_ARGS,
@@ -388,24 +398,29 @@ class EventManager:
         with metrics.timer("event_manager.get_attachments"):
             attachments = get_attachments(cache_key, job)
 
-        save_aggregate_fn = (
-            _save_aggregate2
-            if not options.get("store.race-free-group-creation-force-disable")
-            and features.has("projects:race-free-group-creation", project)
-            else _save_aggregate
-        )
+        if not options.get("store.race-free-group-creation-force-disable") and features.has(
+            "projects:race-free-group-creation", project
+        ):
+            try:
+                job["group"], job["is_new"], job["is_regression"] = _save_aggregate2(
+                    event=job["event"],
+                    flat_hashes=flat_hashes,
+                    hierarchical_hashes=hierarchical_hashes,
+                    release=job["release"],
+                    **kwargs,
+                )
+            except HashDiscarded:
+                discard_event(job, attachments)
+                raise
+        else:
+            job["flat_hashes"] = flat_hashes
+            job["hierarchical_hashes"] = hierarchical_hashes
+            job["group_kwargs"] = kwargs
+            _save_aggregate_many(jobs, projects)
 
-        try:
-            job["group"], job["is_new"], job["is_regression"] = save_aggregate_fn(
-                event=job["event"],
-                flat_hashes=flat_hashes,
-                hierarchical_hashes=hierarchical_hashes,
-                release=job["release"],
-                **kwargs,
-            )
-        except HashDiscarded:
-            discard_event(job, attachments)
-            raise
+            if "hash_discarded" in job:
+                discard_event(job, attachments)
+                raise job["hash_discarded"]
 
         job["event"].group = job["group"]
 
@@ -759,20 +774,31 @@ def _tsdb_record_all_metrics(jobs):
 
 @metrics.wraps("save_event.nodestore_save_many")
 def _nodestore_save_many(jobs):
+    # Only events with a group keep their unprocessed payload, for reprocessing.
+    unprocessed_keys = {
+        job["event"].event_id: cache_key_for_event(
+            {"project": job["event"].project_id, "event_id": job["event"].event_id}
+        )
+        for job in jobs
+        if job["group"]
+    }
+    unprocessed = event_processing_store.get_many(list(unprocessed_keys.values()), unprocessed=True)
+
+    items = {}
     for job in jobs:
         # Write the event to Nodestore
         subkeys = {}
 
-        if job["group"]:
-            event = job["event"]
-            data = event_processing_store.get(
-                cache_key_for_event({"project": event.project_id, "event_id": event.event_id}),
-                unprocessed=True,
-            )
-            if data is not None:
-                subkeys["unprocessed"] = data
+        data = unprocessed.get(unprocessed_keys.get(job["event"].event_id))
+        if data is not None:
+            subkeys["unprocessed"] = data
 
-        job["event"].data.save(subkeys=subkeys)
+        subkeys = job["event"].data.get_subkeys_to_save(subkeys)
+        if subkeys is not None:
+            items[job["event"].data.id] = subkeys
+
+    if items:
+        nodestore.set_subkeys_many(items)
 
 
 @metrics.wraps("save_event.eventstream_insert_many")
@@ -1045,14 +1071,16 @@ def _find_existing_group_id(
     project,
     flat_grouphashes,
     hierarchical_hashes,
+    hierarchical_grouphashes=None,
 ):
     all_grouphashes = []
 
     if hierarchical_hashes:
-        hierarchical_grouphashes = {
-            h.hash: h
-            for h in GroupHash.objects.filter(project=project, hash__in=hierarchical_hashes)
-        }
+        if hierarchical_grouphashes is None:
+            hierarchical_grouphashes = {
+                h.hash: h
+                for h in GroupHash.objects.filter(project=project, hash__in=hierarchical_hashes)
+            }
 
         for hash in reversed(hierarchical_hashes):
             group_hash = hierarchical_grouphashes.get(hash)
@@ -1079,22 +1107,124 @@ def _find_existing_group_id(
             raise HashDiscarded("Matches group tombstone %s" % group_hash.group_tombstone_id)
 
 
+def _get_or_create_grouphashes_many(project, hashes, lookup_hashes=()):
+    """Returns a dictionary of hash to `GroupHash` for the given hashes of a
+    project, creating the missing ones.  `lookup_hashes` are only returned if
+    they already exist.  All existing hashes are loaded with one query.
+    """
+    rv = {
+        h.hash: h
+        for h in GroupHash.objects.filter(
+            project=project, hash__in=set(hashes) | set(lookup_hashes)
+        )
+    }
+
+    missing = []
+    for hash in hashes:
+        if hash not in rv and hash not in missing:
+            missing.append(hash)
+
+    if missing:
+        try:
+            with transaction.atomic(using=router.db_for_write(GroupHash)):
+                created = GroupHash.objects.bulk_create(
+                    [GroupHash(project=project, hash=hash) for hash in missing]
+                )
+        except IntegrityError:
+            # Another process created some of the hashes in the meantime
+            created = [
+                GroupHash.objects.get_or_create(project=project, hash=hash)[0] for hash in missing
+            ]
+        rv.update((h.hash, h) for h in created)
+
+    return rv
+
+
 def _save_aggregate(event, flat_hashes, hierarchical_hashes, release, **kwargs):
-    project = event.project
+    job = {
+        "event": event,
+        "project_id": event.project_id,
+        "flat_hashes": flat_hashes,
+        "hierarchical_hashes": hierarchical_hashes,
+        "release": release,
+        "group_kwargs": kwargs,
+    }
+    _save_aggregate_many([job], {event.project_id: event.project})
+
+    if "hash_discarded" in job:
+        raise job["hash_discarded"]
+    return job["group"], job["is_new"], job["is_regression"]
+
+
+@metrics.wraps("save_event.save_aggregate_many")
+def _save_aggregate_many(jobs, projects):
+    """Finds or creates the groups for a batch of jobs.
+
+    Each job carries the `event`, its `flat_hashes`, `hierarchical_hashes`,
+    `release` and the `group_kwargs` a new group is created with.  The
+    grouping hashes of all jobs of a project are resolved with one query and
+    the existing groups are loaded in bulk.  Jobs are then handled in order,
+    so a group created for one job is found by the following jobs sharing a
+    hash.
+
+    Sets `group`, `is_new` and `is_regression` on every job, or
+    `hash_discarded` to the `HashDiscarded` exception if the event must be
+    dropped.
+    """
+    jobs_by_project = {}
+    for job in jobs:
+        jobs_by_project.setdefault(job["project_id"], []).append(job)
+
+    for project_id, project_jobs in jobs_by_project.items():
+        project = projects[project_id]
+
+        hashes = []
+        lookup_hashes = []
+        for job in project_jobs:
+            hashes.extend(job["flat_hashes"])
+            if job["hierarchical_hashes"]:
+                hashes.append(job["hierarchical_hashes"][0])
+                lookup_hashes.extend(job["hierarchical_hashes"][1:])
+
+        with metrics.timer("event_manager.get_or_create_grouphashes_many"):
+            grouphashes = _get_or_create_grouphashes_many(project, hashes, lookup_hashes)
+
+        with metrics.timer("event_manager.get_groups_many"):
+            groups = Group.objects.in_bulk(
+                {h.group_id for h in grouphashes.values() if h.group_id is not None}
+            )
+
+        metrics.timing("event_manager.save_aggregate_many.jobs", len(project_jobs))
+
+        for job in project_jobs:
+            try:
+                (
+                    job["group"],
+                    job["is_new"],
+                    job["is_regression"],
+                ) = _save_aggregate_with_grouphashes(
+                    project, job, grouphashes, groups, **job["group_kwargs"]
+                )
+            except HashDiscarded as e:
+                job["hash_discarded"] = e
+
+
+def _save_aggregate_with_grouphashes(project, job, grouphashes, groups, **kwargs):
+    event = job["event"]
+    release = job["release"]
+    hierarchical_hashes = job["hierarchical_hashes"]
 
     # attempt to find a matching hash
-    flat_grouphashes = [
-        GroupHash.objects.get_or_create(project=project, hash=hash)[0] for hash in flat_hashes
-    ]
+    flat_grouphashes = [grouphashes[hash] for hash in job["flat_hashes"]]
 
     if hierarchical_hashes:
-        root_hierarchical_hash = GroupHash.objects.get_or_create(
-            project=project, hash=hierarchical_hashes[0]
-        )[0]
+        root_hierarchical_hash = grouphashes[hierarchical_hashes[0]]
     else:
         root_hierarchical_hash = None
 
-    existing_group_id = _find_existing_group_id(project, flat_grouphashes, hierarchical_hashes)
+    existing_group_id = _find_existing_group_id(
+        project, flat_grouphashes, hierarchical_hashes, grouphashes
+    )
 
     # XXX(dcramer): this has the opportunity to create duplicate groups
     # it should be resolved by the hash merging function later but this
@@ -1132,12 +1262,16 @@ def _save_aggregate(event, flat_hashes, hierarchical_hashes, release, **kwargs):
                 True,
             )
 
+        groups[group.id] = group
+
         metrics.incr(
             "group.created", skip_internal=True, tags={"platform": event.platform or "unknown"}
         )
 
     else:
-        group = Group.objects.get(id=existing_group_id)
+        group = groups.get(existing_group_id)
+        if group is None:
+            group = groups[existing_group_id] = Group.objects.get(id=existing_group_id)
 
         group_is_new = False
 
@@ -1170,6 +1304,12 @@ def _save_aggregate(event, flat_hashes, hierarchical_hashes, release, **kwargs):
         if group_is_new and len(new_hashes) == len(to_update):
             is_new = True
 
+        # Keep the loaded hashes in sync so that later jobs of the same batch
+        # find this group.
+        for h in new_hashes:
+            if h.state != GroupHash.State.LOCKED_IN_MIGRATION:
+                h.group_id = group.id
+
     if not is_new:
         is_regression = _process_existing_aggregate(
             group=group, event=event, data=kwargs, release=release
@@ -1274,7 +1414,9 @@ def _handle_regression(group, event, release):
 
 def _process_existing_aggregate(group, event, data, release):
     date = max(event.datetime, group.last_seen)
-    extra = {"last_seen": date, "score": ScoreClause(group), "data": data["data"]}
+    # The score is computed from the new `times_seen` and `last_seen` when the
+    # buffer is processed, see `Buffer.process`.
+    extra = {"last_seen": date, "data": data["data"]}
     if event.search_message and event.search_message != group.message:
         extra["message"] = event.search_message
     if group.level != data["level"]:
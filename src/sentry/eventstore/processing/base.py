@@ -1,5 +1,5 @@
 from datetime import timedelta
-from typing import Any, Optional
+from typing import Any, List, Mapping, Optional, Sequence
 
 from sentry.utils.cache import cache_key_for_event
 from sentry.utils.kvstore.abstract import KVStorage
@@ -37,11 +37,35 @@ class BaseEventProcessingStore:
         self.inner.set(key, event, self.timeout)
         return key
 
+    def store_many(self, events: Sequence[Event], unprocessed: bool = False) -> List[str]:
+        """
+        Like `store` but writes all events at once, which allows the backing
+        storage to batch the writes. Returns the keys in the order of the
+        given events.
+        """
+        keys = [cache_key_for_event(event) for event in events]
+        if unprocessed:
+            keys = [self.__get_unprocessed_key(key) for key in keys]
+        self.inner.set_many(list(zip(keys, events)), self.timeout)
+        return keys
+
     def get(self, key: str, unprocessed: bool = False) -> Optional[Event]:
         if unprocessed:
             key = self.__get_unprocessed_key(key)
         return self.inner.get(key)
 
+    def get_many(self, keys: Sequence[str], unprocessed: bool = False) -> Mapping[str, Event]:
+        """
+        Like `get` but fetches all keys at once. Returns the events that were
+        found by their given key.
+        """
+        if not keys:
+            return {}
+        inner_keys = {
+            (self.__get_unprocessed_key(key) if unprocessed else key): key for key in keys
+        }
+        return {inner_keys[key]: event for key, event in self.inner.get_many(list(inner_keys))}
+
     def delete_by_key(self, key: str) -> None:
         self.inner.delete(key)
         self.inner.delete(self.__get_unprocessed_key(key))
@@ -18,9 +18,16 @@ from sentry.grouping.variants import (
     FallbackVariant,
     SaltedComponentVariant,
 )
+from sentry.utils import metrics
+from sentry.utils.datastructures import LRUCache
 
 HASH_RE = re.compile(r"^[0-9a-f]{32}$")
 
+# Parsed fingerprinting rules are kept per process, keyed by the hash of the
+# rules config.
+FINGERPRINTING_RULES_CACHE_SIZE = 500
+_fingerprinting_rules_cache = LRUCache(FINGERPRINTING_RULES_CACHE_SIZE)
+
 
 class GroupingConfigNotFound(LookupError):
     pass
@@ -122,15 +129,26 @@ def get_fingerprinting_config_for_project(project):
     from sentry.utils.hashlib import md5_text
 
     cache_key = "fingerprinting-rules:" + md5_text(rules).hexdigest()
+
+    # The parsed rules are shared by all events of the process and must not be
+    # modified.
+    rv = _fingerprinting_rules_cache.get(cache_key)
+    if rv is not None:
+        metrics.incr("grouping.fingerprinting_rules_cache.hit")
+        return rv
+    metrics.incr("grouping.fingerprinting_rules_cache.miss")
+
     rv = cache.get(cache_key)
     if rv is not None:
-        return FingerprintingRules.from_json(rv)
+        rv = FingerprintingRules.from_json(rv)
+    else:
+        try:
+            rv = FingerprintingRules.from_config_string(rules)
+        except InvalidFingerprintingConfig:
+            rv = FingerprintingRules([])
+        cache.set(cache_key, rv.to_json())
 
-    try:
-        rv = FingerprintingRules.from_config_string(rules)
-    except InvalidFingerprintingConfig:
-        rv = FingerprintingRules([])
-    cache.set(cache_key, rv.to_json())
+    _fingerprinting_rules_cache[cache_key] = rv
     return rv
 
 
@@ -1,5 +1,6 @@
 import base64
 import os
+import re
 import zlib
 
 import msgpack
@@ -11,8 +12,11 @@ from sentry.grouping.component import GroupingComponent
 from sentry.grouping.utils import get_rule_bool
 from sentry.stacktraces.functions import set_in_app
 from sentry.stacktraces.platform import get_behavior_family_for_platform
+from sentry.utils import metrics
 from sentry.utils.compat import zip
+from sentry.utils.datastructures import LRUCache
 from sentry.utils.glob import glob_match
+from sentry.utils.hashlib import md5_text
 from sentry.utils.safe import get_path
 from sentry.utils.strings import unescape_string
 
@@ -104,6 +108,24 @@ MATCHERS = {
 }
 
 
+# The behavior families a frame can resolve to, see
+# `get_behavior_family_for_platform`.
+BEHAVIOR_FAMILIES = frozenset(["native", "javascript", "other"])
+
+# The order in which compiled matchers are evaluated.  Cheap checks run first
+# so that the glob matchers (which cross into relay) run as rarely as possible.
+MATCHER_ORDER = {"app": 0, "module": 1, "function": 2, "path": 3, "package": 4}
+
+# The characters that are certainly literal in a glob pattern.  The leading run
+# of these is used to reject frames before calling into `glob_match`.
+_literal_prefix_re = re.compile(r"[\w/.:<>@ ,-]*", re.ASCII)
+
+# Parsed enhancements are kept per process, keyed by the hash of their
+# serialized form.  See `Enhancements.loads_cached`.
+ENHANCEMENTS_CACHE_SIZE = 500
+_enhancements_cache = LRUCache(ENHANCEMENTS_CACHE_SIZE)
+
+
 class InvalidEnhancerConfig(Exception):
     pass
 
@@ -197,6 +219,134 @@ class Match:
         return cls(key, arg, negated)
 
 
+def _get_frame_path(frame_data, platform):
+    return frame_data.get("abs_path") or frame_data.get("filename") or ""
+
+
+def _get_frame_package(frame_data, platform):
+    return frame_data.get("package") or ""
+
+
+def _get_frame_function(frame_data, platform):
+    from sentry.stacktraces.functions import get_function_name_for_frame
+
+    return get_function_name_for_frame(frame_data, platform) or "<unknown>"
+
+
+def _get_frame_module(frame_data, platform):
+    return frame_data.get("module") or "<unknown>"
+
+
+def _get_frame_family(frame_data, platform):
+    return get_behavior_family_for_platform(frame_data.get("platform") or platform)
+
+
+class FrameValues(dict):
+    """Lazily computes and memoizes the values of a frame that matchers are
+    evaluated against.  Only values that stay the same while enhancements are
+    applied are cached, the `in_app` flag is always read from the frame.
+    """
+
+    getters = {
+        "path": _get_frame_path,
+        "package": _get_frame_package,
+        "function": _get_frame_function,
+        "module": _get_frame_module,
+        "family": _get_frame_family,
+    }
+
+    def __init__(self, frame_data, platform):
+        dict.__init__(self)
+        self.frame_data = frame_data
+        self.platform = platform
+
+    def __missing__(self, key):
+        rv = self[key] = self.getters[key](self.frame_data, self.platform)
+        return rv
+
+
+class CompiledMatch:
+    """A `Match` prepared for evaluating against many frames.  Family matchers
+    are resolved by `CompiledRule` and never end up here.
+    """
+
+    __slots__ = ("key", "pattern", "negated", "ref_val", "prefix")
+
+    def __init__(self, match):
+        self.key = match.key
+        self.pattern = match.pattern
+        self.negated = match.negated
+        self.ref_val = get_rule_bool(match.pattern) if match.key == "app" else None
+
+        prefix = _literal_prefix_re.match(match.pattern).group()
+        if match.key in ("path", "package"):
+            # Path matches are case insensitive and normalize backslashes
+            prefix = prefix.casefold()
+        self.prefix = prefix
+
+    def matches_frame(self, frame_data, values, cache):
+        if self.key == "app":
+            rv = self.ref_val is not None and self.ref_val == frame_data.get("in_app")
+        else:
+            value = values[self.key]
+            cache_key = (self.key, self.pattern, value)
+            rv = cache.get(cache_key)
+            if rv is None:
+                rv = cache[cache_key] = self._glob_match(value)
+        return rv != self.negated
+
+    def _glob_match(self, value):
+        if self.key not in ("path", "package"):
+            return value.startswith(self.prefix) and glob_match(value, self.pattern)
+
+        candidates = [value]
+        if not value.startswith("/"):
+            candidates.append("/" + value)
+        for candidate in candidates:
+            if self.prefix and not (
+                candidate.replace("\\", "/").casefold().startswith(self.prefix)
+            ):
+                continue
+            if glob_match(
+                candidate, self.pattern, ignorecase=True, doublestar=True, path_normalize=True
+            ):
+                return True
+        return False
+
+
+class CompiledRule:
+    """A `Rule` prepared for evaluating against many frames.  Family matchers
+    are folded into the set of families the rule applies to and the remaining
+    matchers are ordered cheapest first.
+    """
+
+    __slots__ = ("rule", "families", "matchers")
+
+    def __init__(self, rule):
+        self.rule = rule
+
+        families = set(BEHAVIOR_FAMILIES) if rule.matchers else set()
+        matchers = []
+        for match in rule.matchers:
+            if match.key != "family":
+                matchers.append(CompiledMatch(match))
+                continue
+            flags = match.pattern.split(",")
+            matched = BEHAVIOR_FAMILIES if "all" in flags else BEHAVIOR_FAMILIES.intersection(flags)
+            if match.negated:
+                matched = BEHAVIOR_FAMILIES - matched
+            families &= matched
+
+        self.families = frozenset(families)
+        self.matchers = sorted(matchers, key=lambda x: MATCHER_ORDER[x.key])
+
+    def matches_frame(self, frame_data, values, cache):
+        for match in self.matchers:
+            if not match.matches_frame(frame_data, values, cache):
+                return False
+        return True
+
+
 class Action:
     def apply_modifications_to_frame(self, frames, idx):
         pass
@@ -332,26 +482,60 @@ class Enhancements:
             bases = []
         self.bases = bases
 
+    def get_compiled_rules(self):
+        """Returns all rules including the ones of the bases compiled for
+        matching.  The result is cached on the enhancements.
+        """
+        rv = getattr(self, "_compiled_rules", None)
+        if rv is None:
+            rv = self._compiled_rules = [CompiledRule(rule) for rule in self.iter_rules()]
+        return rv
+
+    def iter_matching_frames(self, frames, platform):
+        """Yields `(rule, idx)` for every frame a rule matches.  This is
+        equivalent to calling `Rule.get_matching_frame_actions` for every rule
+        and every frame in that order but only considers the frames of the
+        families a rule applies to and memoizes values derived from frames.
+
+        Matching is lazy so that actions applied by the caller in between are
+        visible to the `app` matchers of the rules that follow.
+        """
+        frame_values = [FrameValues(frame, platform) for frame in frames]
+        frames_by_family = {}
+        for idx, values in enumerate(frame_values):
+            frames_by_family.setdefault(values["family"], []).append(idx)
+
+        candidates_by_families = {}
+        cache = {}
+
+        for compiled_rule in self.get_compiled_rules():
+            candidates = candidates_by_families.get(compiled_rule.families)
+            if candidates is None:
+                candidates = candidates_by_families[compiled_rule.families] = sorted(
+                    idx
+                    for family in compiled_rule.families
+                    for idx in frames_by_family.get(family, ())
+                )
+            for idx in candidates:
+                if compiled_rule.matches_frame(frames[idx], frame_values[idx], cache):
+                    yield compiled_rule.rule, idx
+
     def apply_modifications_to_frame(self, frames, platform):
         """This applies the frame modifications to the frames itself.  This
         does not affect grouping.
         """
-        for rule in self.iter_rules():
-            for idx, frame in enumerate(frames):
-                actions = rule.get_matching_frame_actions(frame, platform)
-                for action in actions or ():
-                    action.apply_modifications_to_frame(frames, idx)
+        for rule, idx in self.iter_matching_frames(frames, platform):
+            for action in rule.actions:
+                action.apply_modifications_to_frame(frames, idx)
 
     def update_frame_components_contributions(self, components, frames, platform):
         stacktrace_state = StacktraceState()
 
         # Apply direct frame actions and update the stack state alongside
-        for rule in self.iter_rules():
-            for idx, (component, frame) in enumerate(zip(components, frames)):
-                actions = rule.get_matching_frame_actions(frame, platform)
-                for action in actions or ():
-                    action.update_frame_components_contributions(components, frames, idx, rule=rule)
-                    action.modify_stacktrace_state(stacktrace_state, rule)
+        for rule, idx in self.iter_matching_frames(frames[: len(components)], platform):
+            for action in rule.actions:
+                action.update_frame_components_contributions(components, frames, idx, rule=rule)
+                action.modify_stacktrace_state(stacktrace_state, rule)
 
         # Use the stack state to update frame contributions again to trim
         # down to max-frames.  min-frames is handled on the other hand for
@@ -456,6 +640,22 @@ class Enhancements:
         except (LookupError, AttributeError, TypeError, ValueError) as e:
             raise ValueError("invalid stack trace rule config: %s" % e)
 
+    @classmethod
+    def loads_cached(cls, data):
+        """Like `loads` but returns the enhancements from a process wide
+        cache when the same config was loaded before.  The returned object is
+        shared and must not be modified.
+        """
+        cache_key = md5_text(data).hexdigest()
+        rv = _enhancements_cache.get(cache_key)
+        if rv is not None:
+            metrics.incr("grouping.enhancements_cache.hit")
+            return rv
+
+        metrics.incr("grouping.enhancements_cache.miss")
+        rv = _enhancements_cache[cache_key] = cls.loads(data)
+        return rv
+
     @classmethod
     def from_config_string(self, s, bases=None, id=None):
         try:
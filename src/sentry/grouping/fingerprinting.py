@@ -57,109 +57,172 @@ class InvalidFingerprintingConfig(Exception):
     pass
 
 
+class LazyValues:
+    """A sequence of values that is produced from an iterator on demand.  The
+    values are remembered so that every consumer sees the same values but the
+    iterator is only advanced as far as the consumers actually look.
+    """
+
+    def __init__(self, iterator):
+        self._iterator = iterator
+        self._values = []
+
+    def __iter__(self):
+        idx = 0
+        while True:
+            if idx == len(self._values):
+                if self._iterator is None:
+                    return
+                try:
+                    self._values.append(next(self._iterator))
+                except StopIteration:
+                    self._iterator = None
+                    return
+            yield self._values[idx]
+            idx += 1
+
+
+class FingerprintFrameValues:
+    """The values of a frame that matchers look at.  The function name is only
+    trimmed when a rule asks for it.
+    """
+
+    __slots__ = ("frame", "platform", "_function")
+
+    def __init__(self, frame, platform):
+        self.frame = frame
+        self.platform = platform
+        self._function = None
+
+    def get(self, key):
+        if key == "function":
+            if self._function is None:
+                from sentry.stacktraces.functions import get_function_name_for_frame
+
+                self._function = get_function_name_for_frame(self.frame, self.platform)
+                self._function = self._function or "<unknown>"
+            return self._function
+        if key == "abs_path":
+            return self.frame.get("abs_path") or self.frame.get("filename")
+        if key == "family":
+            return get_behavior_family_for_platform(self.platform)
+        if key == "app":
+            return self.frame.get("in_app")
+        if key in ("filename", "module", "package"):
+            return self.frame.get(key)
+        return None
+
+
 class EventAccess:
     def __init__(self, event):
         self.event = event
-        self._exceptions = None
-        self._frames = None
-        self._messages = None
-        self._log_info = None
-        self._toplevel = None
-        self._tags = None
-
-    def get_messages(self):
-        if self._messages is None:
-            self._messages = []
-            message = get_path(self.event, "logentry", "formatted", filter=True)
-            if message:
-                self._messages.append(
-                    {
-                        "message": message,
-                        "family": get_behavior_family_for_platform(self.event.get("platform")),
-                    }
-                )
-        return self._messages
-
-    def get_log_info(self):
-        if self._log_info is None:
-            log_info = {}
-            logger = get_path(self.event, "logger", filter=True)
-            if logger:
-                log_info["logger"] = logger
-            level = get_path(self.event, "level", filter=True)
-            if level:
-                log_info["level"] = level
-            if log_info:
-                self._log_info = [log_info]
-            else:
-                self._log_info = []
-        return self._log_info
-
-    def get_exceptions(self):
-        if self._exceptions is None:
-            self._exceptions = []
-            for exc in get_path(self.event, "exception", "values", filter=True) or ():
-                self._exceptions.append(
-                    {
-                        "type": exc.get("type"),
-                        "value": exc.get("value"),
-                        "family": get_behavior_family_for_platform(self.event.get("platform")),
-                    }
-                )
-        return self._exceptions
-
-    def get_frames(self, with_functions=False):
-        from sentry.stacktraces.functions import get_function_name_for_frame
-
-        if self._frames is None:
-            self._frames = []
-
-            def _push_frame(frame):
-                platform = frame.get("platform") or self.event.get("platform")
-                func = get_function_name_for_frame(frame, platform)
-                self._frames.append(
-                    {
-                        "function": func or "<unknown>",
-                        "abs_path": frame.get("abs_path") or frame.get("filename"),
-                        "filename": frame.get("filename"),
-                        "module": frame.get("module"),
-                        "family": get_behavior_family_for_platform(platform),
-                        "package": frame.get("package"),
-                        "app": frame.get("in_app"),
-                    }
-                )
-
-            have_errors = False
-            for exc in get_path(self.event, "exception", "values", filter=True) or ():
-                for frame in get_path(exc, "stacktrace", "frames", filter=True) or ():
-                    _push_frame(frame)
-                have_errors = True
-
-            if not have_errors:
-                frames = get_path(self.event, "stacktrace", "frames", filter=True)
-                if not frames:
-                    threads = get_path(self.event, "threads", "values", filter=True)
-                    if threads and len(threads) == 1:
-                        frames = get_path(threads, 0, "stacktrace", "frames")
-                for frame in frames or ():
-                    _push_frame(frame)
-
-        return self._frames
-
-    def get_toplevel(self):
-        if self._toplevel is None:
-            self._toplevel = self.get_messages() + self.get_exceptions()
-        return self._toplevel
-
-    def get_tags(self):
-        if self._tags is None:
-            self._tags = [
-                {"tags.%s" % k: v for (k, v) in get_path(self.event, "tags", filter=True) or ()}
-            ]
-        return self._tags
+        self._values = {}
+
+    def _iter_messages(self):
+        message = get_path(self.event, "logentry", "formatted", filter=True)
+        if message:
+            yield {
+                "message": message,
+                "family": get_behavior_family_for_platform(self.event.get("platform")),
+            }
+
+    def _iter_log_info(self):
+        log_info = {}
+        logger = get_path(self.event, "logger", filter=True)
+        if logger:
+            log_info["logger"] = logger
+        level = get_path(self.event, "level", filter=True)
+        if level:
+            log_info["level"] = level
+        if log_info:
+            yield log_info
+
+    def _iter_exceptions(self):
+        family = get_behavior_family_for_platform(self.event.get("platform"))
+        for exc in get_path(self.event, "exception", "values", filter=True) or ():
+            yield {"type": exc.get("type"), "value": exc.get("value"), "family": family}
+
+    def _iter_frames(self):
+        def _make_values(frame):
+            return FingerprintFrameValues(
+                frame, frame.get("platform") or self.event.get("platform")
+            )
+
+        have_errors = False
+        for exc in get_path(self.event, "exception", "values", filter=True) or ():
+            for frame in get_path(exc, "stacktrace", "frames", filter=True) or ():
+                yield _make_values(frame)
+            have_errors = True
+
+        if not have_errors:
+            frames = get_path(self.event, "stacktrace", "frames", filter=True)
+            if not frames:
+                threads = get_path(self.event, "threads", "values", filter=True)
+                if threads and len(threads) == 1:
+                    frames = get_path(threads, 0, "stacktrace", "frames")
+            for frame in frames or ():
+                yield _make_values(frame)
+
+    def _iter_toplevel(self):
+        yield from self.get_values("messages")
+        yield from self.get_values("exceptions")
+
+    def _iter_tags(self):
+        yield {"tags.%s" % k: v for (k, v) in get_path(self.event, "tags", filter=True) or ()}
 
     def get_values(self, match_group):
-        return getattr(self, "get_" + match_group)()
+        """Returns the values of a match group.  Values are produced lazily and
+        shared by all rules evaluated against this event.
+        """
+        rv = self._values.get(match_group)
+        if rv is None:
+            rv = self._values[match_group] = LazyValues(getattr(self, "_iter_" + match_group)())
+        return rv
+
+
+# The order in which the match groups of a compiled rule are checked.  Groups
+# with few and cheap values come first so that rules fail early.
+MATCH_GROUP_ORDER = ["tags", "log_info", "toplevel", "exceptions", "frames"]
+
+# Matchers that do not call into `glob_match` are checked first.
+CHEAP_MATCHERS = frozenset(["family", "app"])
+
+
+class CompiledRule:
+    """A `Rule` prepared for evaluating against many events.  The matchers are
+    grouped by match group once and results of matchers are shared between
+    rules through a per event cache.
+    """
+
+    __slots__ = ("rule", "match_groups")
+
+    def __init__(self, rule):
+        self.rule = rule
+
+        by_match_group = {}
+        for matcher in rule.matchers:
+            by_match_group.setdefault(matcher.match_group, []).append(matcher)
+        for matchers in by_match_group.values():
+            matchers.sort(key=lambda x: x.key not in CHEAP_MATCHERS)
+        self.match_groups = sorted(
+            by_match_group.items(), key=lambda x: MATCH_GROUP_ORDER.index(x[0])
+        )
+
+    def matches_event_access(self, access, cache):
+        for match_group, matchers in self.match_groups:
+            for idx, values in enumerate(access.get_values(match_group)):
+                for matcher in matchers:
+                    cache_key = (match_group, idx, matcher.key, matcher.pattern)
+                    rv = cache.get(cache_key)
+                    if rv is None:
+                        rv = cache[cache_key] = matcher._positive_match(values)
+                    if rv == matcher.negated:
+                        break
+                else:
+                    break
+            else:
+                return False
+        return True
 
 
 class FingerprintingRules:
@@ -173,14 +236,24 @@ class FingerprintingRules:
     def iter_rules(self):
         return iter(self.rules)
 
+    def get_compiled_rules(self):
+        """Returns the rules compiled for matching.  The result is cached on
+        the rules.
+        """
+        rv = getattr(self, "_compiled_rules", None)
+        if rv is None:
+            rv = self._compiled_rules = [CompiledRule(rule) for rule in self.iter_rules()]
+        return rv
+
     def get_fingerprint_values_for_event(self, event):
         if not self.rules:
             return
         access = EventAccess(event)
-        for rule in self.iter_rules():
-            new_values = rule.get_fingerprint_values_for_event_access(access)
-            if new_values is not None:
-                return (rule,) + new_values
+        cache = {}
+        for compiled_rule in self.get_compiled_rules():
+            if compiled_rule.matches_event_access(access, cache):
+                rule = compiled_rule.rule
+                return rule, rule.fingerprint, rule.attributes
 
     @classmethod
     def _from_config_structure(cls, data):
@@ -233,7 +233,7 @@ class StrategyConfiguration:
         if enhancements is None:
             enhancements = Enhancements([])
         else:
-            enhancements = Enhancements.loads(enhancements)
+            enhancements = Enhancements.loads_cached(enhancements)
         self.enhancements = enhancements
 
     def __repr__(self):
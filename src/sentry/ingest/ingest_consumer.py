@@ -1,6 +1,8 @@
 import functools
 import logging
 import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import msgpack
 import sentry_sdk
@@ -30,6 +32,14 @@ CACHE_TIMEOUT = 3600
 
 
 class IngestConsumerWorker(AbstractBatchWorker):
+    def __init__(self, concurrency=1):
+        # With a concurrency of 1 everything runs on the consumer thread,
+        # exactly like before. Otherwise messages are partitioned by project
+        # and partitions are flushed concurrently, while messages of the same
+        # project are still processed in the order they were consumed.
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+
     def process_message(self, message):
         message = msgpack.unpackb(message.value(), use_list=False)
         return message
@@ -67,29 +77,173 @@ class IngestConsumerWorker(AbstractBatchWorker):
         with metrics.timer("ingest_consumer.fetch_projects"):
             projects = {p.id: p for p in Project.objects.get_many_from_cache(projects_to_fetch)}
 
+        with metrics.timer("ingest_consumer.deduplicate_events"):
+            other_messages = _deduplicate_events(other_messages)
+
         if attachment_chunks:
             # attachment_chunk messages need to be processed before attachment/event messages.
             with metrics.timer("ingest_consumer.process_attachment_chunk_batch"):
-                for attachment_chunk in attachment_chunks:
-                    process_attachment_chunk(attachment_chunk, projects=projects)
+                process_attachment_chunks(attachment_chunks, projects=projects)
+
+        with metrics.timer("ingest_consumer.store_events"):
+            other_messages = _store_events(other_messages, projects)
 
         if other_messages:
-            with metrics.timer("ingest_consumer.process_other_messages_batch"):
-                for processing_func, message in other_messages:
-                    processing_func(message, projects=projects)
+            results = []
+            try:
+                with metrics.timer("ingest_consumer.process_other_messages_batch"):
+                    self._process_partitioned(other_messages, projects, results)
+            finally:
+                # remember for an 1 hour that we saved these events
+                # (deduplication protection), even if other messages of the
+                # batch failed and the batch is consumed again
+                processed_events = {
+                    _get_deduplication_key(message): ""
+                    for message, processed in results
+                    if message["type"] == "event" and processed
+                }
+                if processed_events:
+                    with metrics.timer("ingest_consumer.mark_events_seen"):
+                        cache.set_many(processed_events, CACHE_TIMEOUT)
+
+    def _process_partitioned(self, messages, projects, results):
+        """
+        Runs the processing function of every message and appends
+        ``(message, result)`` tuples to `results`, also when processing
+        fails.
+
+        Messages are partitioned by project. The messages of one partition
+        are always processed sequentially in their original order, but
+        partitions run concurrently if the worker has a thread pool. If a
+        partition raises, the others still run to completion before the
+        error is raised.
+        """
+        partitions = OrderedDict()
+        for processing_func, message in messages:
+            partitions.setdefault(message["project_id"], []).append((processing_func, message))
+
+        def process_partition(partition, partition_results):
+            # Partitions may run on the worker's threads, whose hubs do not
+            # share the scope of the consumer thread.
+            mark_scope_as_unsafe()
+            for processing_func, message in partition:
+                partition_results.append((message, processing_func(message, projects=projects)))
+
+        partition_results = [[] for _ in partitions]
+        try:
+            if self.executor is None or len(partitions) <= 1:
+                for partition, rv in zip(partitions.values(), partition_results):
+                    process_partition(partition, rv)
+            else:
+                futures = [
+                    self.executor.submit(process_partition, partition, rv)
+                    for partition, rv in zip(partitions.values(), partition_results)
+                ]
+                wait(futures)
+                for future in futures:
+                    future.result()
+        finally:
+            for rv in partition_results:
+                results.extend(rv)
+
+        metrics.timing("ingest_consumer.flush.partitions", len(partitions))
 
     def shutdown(self):
-        pass
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+
+def _get_deduplication_key(message):
+    return "ev:{}:{}".format(int(message["project_id"]), message["event_id"])
+
+
+def _deduplicate_events(messages):
+    """
+    Drops events that have already been processed (see `_do_process_event`)
+    or that appear more than once within the batch, using a single cache
+    lookup for the whole batch.
+    """
+    deduplication_keys = [
+        _get_deduplication_key(message)
+        for processing_func, message in messages
+        if message["type"] == "event"
+    ]
+    if not deduplication_keys:
+        return messages
+
+    seen = set(cache.get_many(deduplication_keys))
+
+    rv = []
+    for processing_func, message in messages:
+        if message["type"] == "event":
+            deduplication_key = _get_deduplication_key(message)
+            if deduplication_key in seen:
+                logger.warning(
+                    "pre-process-forwarder detected a duplicated event"
+                    " with id:%s for project:%s.",
+                    message["event_id"],
+                    message["project_id"],
+                )
+                continue
+            seen.add(deduplication_key)
+        rv.append((processing_func, message))
+
+    return rv
+
+
+def _store_events(messages, projects):
+    """
+    Parses all event payloads of the batch and writes them (and their
+    attachments) to the processing store in batches. The returned event
+    messages only need to be passed to `preprocess_event`, events that are
+    dropped are removed.
+    """
+    loaded_events = []
+    for processing_func, message in messages:
+        if message["type"] == "event":
+            loaded = _load_event(message, projects)
+            if loaded is not None:
+                loaded_events.append((message, *loaded))
+
+    if not loaded_events:
+        return [(f, message) for f, message in messages if message["type"] != "event"]
+
+    cache_keys = event_processing_store.store_many([data for _, _, data in loaded_events])
+
+    attachments = [
+        (cache_key, _get_attachment_objects(message))
+        for cache_key, (message, _, _) in zip(cache_keys, loaded_events)
+        if message.get("attachments")
+    ]
+    if attachments:
+        attachment_cache.set_many(attachments, timeout=CACHE_TIMEOUT)
+
+    stored_events = {
+        id(message): functools.partial(
+            process_stored_event, project=project, data=data, cache_key=cache_key
+        )
+        for cache_key, (message, project, data) in zip(cache_keys, loaded_events)
+    }
+
+    rv = []
+    for processing_func, message in messages:
+        if message["type"] == "event":
+            processing_func = stored_events.get(id(message))
+            if processing_func is None:
+                continue
+        rv.append((processing_func, message))
+
+    return rv
 
 
 def trace_func(**span_kwargs):
     def wrapper(f):
         @functools.wraps(f)
         def inner(*args, **kwargs):
-            span_kwargs["sampled"] = random.random() < getattr(
-                settings, "SENTRY_INGEST_CONSUMER_APM_SAMPLING", 0
-            )
-            with sentry_sdk.start_transaction(**span_kwargs):
+            # The decorated functions run on several partition threads at
+            # once, so the shared `span_kwargs` must not be modified.
+            sampled = random.random() < getattr(settings, "SENTRY_INGEST_CONSUMER_APM_SAMPLING", 0)
+            with sentry_sdk.start_transaction(sampled=sampled, **span_kwargs):
                 return f(*args, **kwargs)
 
         return inner
@@ -97,14 +251,59 @@ def trace_func(**span_kwargs):
     return wrapper
 
 
+def _load_event(message, projects):
+    """
+    Returns the project and the parsed payload of an event message, or `None`
+    if the event must not be processed.
+    """
+    project_id = int(message["project_id"])
+
+    if project_id in (options.get("store.load-shed-pipeline-projects") or ()):
+        # This killswitch is for the worst of scenarios and should probably not
+        # cause additional load on our logging infrastructure
+        return None
+
+    try:
+        project = projects[project_id]
+    except KeyError:
+        logger.error("Project for ingested event does not exist: %s", project_id)
+        return None
+
+    # Parse the JSON payload. This is required to compute the cache key and
+    # call process_event. The payload will be put into Kafka raw, to avoid
+    # serializing it again.
+    # XXX: Do not use CanonicalKeyDict here. This may break preprocess_event
+    # which assumes that data passed in is a raw dictionary.
+    data = json.loads(message["payload"])
+
+    return project, data
+
+
+def _get_attachment_objects(message):
+    return [
+        CachedAttachment(type=attachment.pop("attachment_type"), **attachment)
+        for attachment in message.get("attachments") or ()
+    ]
+
+
+def _preprocess_stored_event(message, project, data, cache_key):
+    # Preprocess this event, which spawns either process_event or
+    # save_event. Pass data explicitly to avoid fetching it again from the
+    # cache.
+    with sentry_sdk.start_span(op="ingest_consumer.process_event.preprocess_event"):
+        preprocess_event(
+            cache_key=cache_key,
+            data=data,
+            start_time=float(message["start_time"]),
+            event_id=message["event_id"],
+            project=project,
+        )
+
+
 @metrics.wraps("ingest_consumer.process_event")
 def _do_process_event(message, projects):
-    payload = message["payload"]
-    start_time = float(message["start_time"])
     event_id = message["event_id"]
     project_id = int(message["project_id"])
-    remote_addr = message.get("remote_addr")
-    attachments = message.get("attachments") or ()
 
     # check that we haven't already processed this event (a previous instance of the forwarder
     # died before it could commit the event queue offset)
@@ -120,7 +319,10 @@ def _do_process_event(message, projects):
     # This code has been ripped from the old python store endpoint. We're
     # keeping it around because it does provide some protection against
     # reprocessing good events if a single consumer is in a restart loop.
-    deduplication_key = f"ev:{project_id}:{event_id}"
+    #
+    # `IngestConsumerWorker` does this check for the whole batch at once, see
+    # `_deduplicate_events`.
+    deduplication_key = _get_deduplication_key(message)
     if cache.get(deduplication_key) is not None:
         logger.warning(
             "pre-process-forwarder detected a duplicated event" " with id:%s for project:%s.",
@@ -129,51 +331,28 @@ def _do_process_event(message, projects):
         )
         return  # message already processed do not reprocess
 
-    if project_id in (options.get("store.load-shed-pipeline-projects") or ()):
-        # This killswitch is for the worst of scenarios and should probably not
-        # cause additional load on our logging infrastructure
-        return
-
-    try:
-        project = projects[project_id]
-    except KeyError:
-        logger.error("Project for ingested event does not exist: %s", project_id)
+    loaded = _load_event(message, projects)
+    if loaded is None:
         return
-
-    # Parse the JSON payload. This is required to compute the cache key and
-    # call process_event. The payload will be put into Kafka raw, to avoid
-    # serializing it again.
-    # XXX: Do not use CanonicalKeyDict here. This may break preprocess_event
-    # which assumes that data passed in is a raw dictionary.
-    data = json.loads(payload)
+    project, data = loaded
 
     cache_key = event_processing_store.store(data)
 
-    if attachments:
-        attachment_objects = [
-            CachedAttachment(type=attachment.pop("attachment_type"), **attachment)
-            for attachment in attachments
-        ]
-
+    attachment_objects = _get_attachment_objects(message)
+    if attachment_objects:
         attachment_cache.set(cache_key, attachments=attachment_objects, timeout=CACHE_TIMEOUT)
 
-    # Preprocess this event, which spawns either process_event or
-    # save_event. Pass data explicitly to avoid fetching it again from the
-    # cache.
-    with sentry_sdk.start_span(op="ingest_consumer.process_event.preprocess_event"):
-        preprocess_event(
-            cache_key=cache_key,
-            data=data,
-            start_time=start_time,
-            event_id=event_id,
-            project=project,
-        )
+    _preprocess_stored_event(message, project, data, cache_key)
 
     # remember for an 1 hour that we saved this event (deduplication protection)
     cache.set(deduplication_key, "", CACHE_TIMEOUT)
 
     # emit event_accepted once everything is done
-    event_accepted.send_robust(ip=remote_addr, data=data, project=project, sender=process_event)
+    event_accepted.send_robust(
+        ip=message.get("remote_addr"), data=data, project=project, sender=process_event
+    )
+
+    return True
 
 
 @trace_func(name="ingest_consumer.process_event")
@@ -181,17 +360,48 @@ def process_event(message, projects):
     return _do_process_event(message, projects)
 
 
+@trace_func(name="ingest_consumer.process_event")
+@metrics.wraps("ingest_consumer.process_event")
+def process_stored_event(message, projects, project, data, cache_key):
+    """
+    Processes an event that has already been deduplicated and written to the
+    processing store by `IngestConsumerWorker`. The caller is responsible for
+    marking the event as seen.
+    """
+    _preprocess_stored_event(message, project, data, cache_key)
+
+    # emit event_accepted once everything is done
+    event_accepted.send_robust(
+        ip=message.get("remote_addr"), data=data, project=project, sender=process_event
+    )
+
+    return True
+
+
+def process_attachment_chunk(message, projects):
+    return process_attachment_chunks([message], projects)
+
+
 @trace_func(name="ingest_consumer.process_attachment_chunk")
 @metrics.wraps("ingest_consumer.process_attachment_chunk")
-def process_attachment_chunk(message, projects):
-    payload = message["payload"]
-    event_id = message["event_id"]
-    project_id = message["project_id"]
-    id = message["id"]
-    chunk_index = message["chunk_index"]
-    cache_key = cache_key_for_event({"event_id": event_id, "project": project_id})
-    attachment_cache.set_chunk(
-        key=cache_key, id=id, chunk_index=chunk_index, chunk_data=payload, timeout=CACHE_TIMEOUT
+def process_attachment_chunks(messages, projects):
+    """
+    Writes the payloads of a batch of attachment_chunk messages to the
+    attachment cache at once.
+    """
+    attachment_cache.set_chunks(
+        [
+            (
+                cache_key_for_event(
+                    {"event_id": message["event_id"], "project": message["project_id"]}
+                ),
+                message["id"],
+                message["chunk_index"],
+                message["payload"],
+            )
+            for message in messages
+        ],
+        timeout=CACHE_TIMEOUT,
     )
 
 
@@ -268,7 +478,7 @@ def process_userreport(message, projects):
         return False
 
 
-def get_ingest_consumer(consumer_types, once=False, **options):
+def get_ingest_consumer(consumer_types, once=False, concurrency=1, **options):
     """
     Handles events coming via a kafka queue.
 
@@ -276,5 +486,5 @@ def get_ingest_consumer(consumer_types, once=False, **options):
     """
     topic_names = {ConsumerType.get_topic_name(consumer_type) for consumer_type in consumer_types}
     return create_batching_kafka_consumer(
-        topic_names=topic_names, worker=IngestConsumerWorker(), **options
+        topic_names=topic_names, worker=IngestConsumerWorker(concurrency=concurrency), **options
     )
@@ -1,8 +1,10 @@
 from symbolic import SourceView
 
+from sentry.utils import metrics
+from sentry.utils.datastructures import LRUCache
 from sentry.utils.strings import codec_lookup
 
-__all__ = ["SourceCache", "SourceMapCache"]
+__all__ = ["SourceCache", "SourceMapCache", "ParsedArtifactCache"]
 
 
 def is_utf8(codec):
@@ -10,6 +12,22 @@ def is_utf8(codec):
     return name in ("utf-8", "ascii")
 
 
+def make_source_view(source, encoding=None):
+    if isinstance(source, SourceView):
+        return source
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    # If an encoding is provided and it's not utf-8 compatible
+    # we try to re-encoding the source and create a source view
+    # from it.
+    elif encoding is not None and not is_utf8(encoding):
+        try:
+            source = source.decode(encoding).encode("utf-8")
+        except UnicodeError:
+            pass
+    return SourceView.from_bytes(source)
+
+
 class SourceCache:
     def __init__(self):
         self._cache = {}
@@ -38,20 +56,7 @@ class SourceCache:
 
     def add(self, url, source, encoding=None):
         url = self._get_canonical_url(url)
-
-        if not isinstance(source, SourceView):
-            if isinstance(source, str):
-                source = source.encode("utf-8")
-            # If an encoding is provided and it's not utf-8 compatible
-            # we try to re-encoding the source and create a source view
-            # from it.
-            elif encoding is not None and not is_utf8(encoding):
-                try:
-                    source = source.decode(encoding).encode("utf-8")
-                except UnicodeError:
-                    pass
-            source = SourceView.from_bytes(source)
-        self._cache[url] = source
+        self._cache[url] = make_source_view(source, encoding)
 
     def add_error(self, url, error):
         url = self._get_canonical_url(url)
@@ -90,3 +95,44 @@ class SourceMapCache:
             sourcemap = self.get(sourcemap_url)
             return (sourcemap_url, sourcemap)
         return (None, None)
+
+
+class ParsedArtifactCache:
+    """
+    Keeps parsed release artifacts, `SourceView`s of minified sources and
+    `SourceMapView`s of sourcemaps, across events in a process so that they
+    are not parsed again for every event of a release.
+
+    Entries are keyed by `(kind, release id, dist id, checksum)` and the least
+    recently used ones are evicted once the raw size of all artifacts exceeds
+    `maxsize` bytes. A `maxsize` of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._cache = LRUCache(maxsize, getsize=lambda entry: entry[1]) if maxsize else None
+
+    def get(self, key):
+        if self._cache is None:
+            return None
+        entry = self._cache.get(key)
+        metrics.incr(
+            "sourcemaps.parsed_cache.hit" if entry is not None else "sourcemaps.parsed_cache.miss",
+            tags={"kind": key[0]},
+            skip_internal=True,
+        )
+        return entry[0] if entry is not None else None
+
+    def add(self, key, value, size):
+        if self._cache is None:
+            return
+        if size > self.maxsize:
+            metrics.incr("sourcemaps.parsed_cache.too_large", tags={"kind": key[0]})
+            return
+        self._cache[key] = (value, size)
+        metrics.timing("sourcemaps.parsed_cache.size", self._cache.currsize)
+        metrics.timing("sourcemaps.parsed_cache.items", len(self._cache))
+
+    def clear(self):
+        if self._cache is not None:
+            self._cache.clear()
@@ -8,11 +8,14 @@ import logging
 import re
 import sys
 import zlib
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
 from os.path import splitext
 from urllib.parse import urlsplit
 
 import sentry_sdk
 from django.conf import settings
+from django.db.models import Prefetch
 from requests.utils import get_encoding_from_headers
 from symbolic import SourceMapView
 
@@ -27,7 +30,7 @@ except ImportError:
 
 from sentry import http
 from sentry.interfaces.stacktrace import Stacktrace
-from sentry.models import EventError, Organization, ReleaseFile
+from sentry.models import EventError, FileBlobIndex, Organization, ReleaseFile
 from sentry.stacktraces.processing import StacktraceProcessor
 from sentry.utils import metrics
 
@@ -42,7 +45,7 @@ from sentry.utils.retries import ConditionalRetryPolicy, exponential_delay
 from sentry.utils.safe import get_path
 from sentry.utils.urls import non_standard_url_join
 
-from .cache import SourceCache, SourceMapCache
+from .cache import ParsedArtifactCache, SourceCache, SourceMapCache, is_utf8, make_source_view
 
 # number of surrounding lines (on each side) to fetch
 LINES_OF_CONTEXT = 5
@@ -72,11 +75,16 @@ CACHE_CONTROL_MIN = 60
 # the maximum number of remote resources (i.e. source files) that should be
 # fetched
 MAX_RESOURCE_FETCHES = 100
+# the maximum number of release artifacts read concurrently for an event
+MAX_RELEASE_FILE_READ_WORKERS = 8
 
 CACHE_MAX_VALUE_SIZE = settings.SENTRY_CACHE_MAX_VALUE_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Parsed sourcemaps and minified sources, shared by all events of a process.
+parsed_artifacts = ParsedArtifactCache(settings.SENTRY_JS_PARSED_ARTIFACT_CACHE_SIZE)
+
 
 class UnparseableSourcemap(http.BadSource):
     error_type = EventError.JS_INVALID_SOURCEMAP
@@ -212,6 +220,16 @@ def discover_sourcemap(result):
     return force_text(sourcemap) if sourcemap is not None else None
 
 
+def get_parsed_artifact_key(kind, release, dist, body):
+    """
+    Returns the key of an artifact in `parsed_artifacts`, or `None` outside of
+    a release. The checksum is the SHA1 of the body, like `File.checksum`.
+    """
+    if release is None:
+        return None
+    return (kind, release.id, dist and dist.id or None, sha1(body).hexdigest())
+
+
 def get_release_file_cache_key(release_id, releasefile_ident):
     return f"releasefile:v1:{release_id}:{releasefile_ident}"
 
@@ -337,20 +355,149 @@ def fetch_release_file(filename, release, dist=None):
 
     # in the cache as a successful attempt, including the zipped contents of the file
     else:
-        # Previous caches would be a 3-tuple instead of a 4-tuple,
-        # so this is being maintained for backwards compatibility
-        try:
-            encoding = result[3]
-        except IndexError:
-            encoding = None
-        result = http.UrlResult(
-            filename, result[0], zlib.decompress(result[1]), result[2], encoding
-        )
+        result = get_cached_release_file(filename, result)
 
     return result
 
 
-def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
+def get_cached_release_file(filename, result):
+    # Previous caches would be a 3-tuple instead of a 4-tuple,
+    # so this is being maintained for backwards compatibility
+    try:
+        encoding = result[3]
+    except IndexError:
+        encoding = None
+    return http.UrlResult(filename, result[0], zlib.decompress(result[1]), result[2], encoding)
+
+
+def fetch_release_files(filenames, release, dist=None):
+    """
+    Attempt to retrieve many release artifacts at once, with one cache lookup
+    and one database query for all of them. The bodies of the artifacts are
+    read concurrently.
+
+    Returns a dictionary of results by filename, `None` for artifacts that do
+    not exist. Artifacts that could not be read are left out, so that
+    `fetch_release_file` can try them again.
+    """
+
+    dist_name = dist and dist.name or None
+    cache_keys = {}
+    for filename in filenames:
+        releasefile_ident = ReleaseFile.get_ident(filename, dist_name)
+        cache_keys[filename] = (
+            get_release_file_cache_key(release.id, releasefile_ident),
+            get_release_file_cache_key_meta(release.id, releasefile_ident),
+        )
+
+    cached = cache.get_many([key for keys in cache_keys.values() for key in keys])
+
+    results = {}
+    filename_idents = {}
+    for filename, (cache_key, _) in cache_keys.items():
+        result = cached.get(cache_key)
+        if result is None:
+            filename_idents[filename] = [
+                ReleaseFile.get_ident(f, dist_name) for f in ReleaseFile.normalize(filename)
+            ]
+        elif result == -1:
+            results[filename] = None
+        else:
+            results[filename] = get_cached_release_file(filename, result)
+
+    if not filename_idents:
+        return results
+
+    possible_files = {}
+    for releasefile in (
+        ReleaseFile.objects.filter(
+            release=release,
+            dist=dist,
+            ident__in={ident for idents in filename_idents.values() for ident in idents},
+        ).select_related("file")
+        # The blob indexes are loaded here, so that the pool only talks to
+        # the file storage.
+        .prefetch_related(
+            Prefetch("file__fileblobindex_set", FileBlobIndex.objects.select_related("blob"))
+        )
+    ):
+        possible_files[releasefile.ident] = releasefile
+
+    missing = {}
+    to_read = []
+    for filename, idents in filename_idents.items():
+        # Idents are in priority order, pick the first one that exists.
+        releasefile = next(
+            (possible_files[ident] for ident in idents if ident in possible_files), None
+        )
+        if releasefile is None:
+            results[filename] = None
+            missing[cache_keys[filename][0]] = -1
+        else:
+            to_read.append((filename, releasefile))
+
+    if missing:
+        cache.set_many(missing, 60)
+
+    def read_release_body(releasefile, z_body_size):
+        # Opening large files downloads them into the artifact cache.
+        with ReleaseFile.cache.getfile(releasefile) as fp:
+            if z_body_size and z_body_size > CACHE_MAX_VALUE_SIZE:
+                return None, fp.read()
+            else:
+                return compress_file(fp)
+
+    reads = []
+    for filename, releasefile in to_read:
+        z_body_size = None
+        if CACHE_MAX_VALUE_SIZE:
+            cache_meta = cached.get(cache_keys[filename][1])
+            if cache_meta:
+                z_body_size = int(cache_meta.get("compressed_size"))
+        reads.append((filename, releasefile, z_body_size))
+
+    if not reads:
+        return results
+
+    to_cache = {}
+    with metrics.timer("sourcemaps.release_file_read_many"):
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_RELEASE_FILE_READ_WORKERS, len(reads))
+        ) as executor:
+            futures = [
+                (
+                    filename,
+                    releasefile,
+                    executor.submit(read_release_body, releasefile, z_body_size),
+                )
+                for filename, releasefile, z_body_size in reads
+            ]
+
+    for filename, releasefile, future in futures:
+        try:
+            z_body, body = future.result()
+        except Exception:
+            logger.error("sourcemap.compress_read_failed", exc_info=future.exception())
+            continue
+
+        headers = {k.lower(): v for k, v in releasefile.file.headers.items()}
+        encoding = get_encoding_from_headers(headers)
+        results[filename] = http.UrlResult(filename, headers, body, 200, encoding)
+
+        if z_body:
+            cache_key, cache_key_meta = cache_keys[filename]
+            to_cache[cache_key] = (headers, z_body, 200, encoding)
+            to_cache[cache_key_meta] = {"compressed_size": len(z_body)}
+
+    if to_cache:
+        # Like in `fetch_release_file`, too large payloads are implicitly
+        # skipped by the cache while their metadata is kept.
+        cache.set_many(to_cache, 3600)
+
+    return results
+
+
+def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True, release_files=None):
     """
     Pull down a URL, returning a UrlResult object.
 
@@ -358,6 +505,9 @@ def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
     event), then the internet. Caches the result of each of those two attempts
     separately, whether or not those attempts are successful. Used for both
     source files and source maps.
+
+    Release artifacts already retrieved with `fetch_release_files` can be
+    passed in `release_files`.
     """
 
     # If our url has been truncated, it'd be impossible to fetch
@@ -367,8 +517,11 @@ def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
 
     # if we've got a release to look on, try that first (incl associated cache)
     if release:
-        with metrics.timer("sourcemaps.release_file"):
-            result = fetch_release_file(url, release, dist)
+        if release_files is not None and url in release_files:
+            result = release_files[url]
+        else:
+            with metrics.timer("sourcemaps.release_file"):
+                result = fetch_release_file(url, release, dist)
     else:
         result = None
 
@@ -486,7 +639,9 @@ def get_max_age(headers):
     return min(max_age, CACHE_CONTROL_MAX)
 
 
-def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=True):
+def fetch_sourcemap(
+    url, project=None, release=None, dist=None, allow_scraping=True, release_files=None
+):
     if is_data_uri(url):
         try:
             body = base64.b64decode(
@@ -498,16 +653,33 @@ def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=T
     else:
         # look in the database and, if not found, optionally try to scrape the web
         result = fetch_file(
-            url, project=project, release=release, dist=dist, allow_scraping=allow_scraping
+            url,
+            project=project,
+            release=release,
+            dist=dist,
+            allow_scraping=allow_scraping,
+            release_files=release_files,
         )
         body = result.body
+
+    key = get_parsed_artifact_key("sourcemap", release, dist, body)
+    if key is not None:
+        sourcemap_view = parsed_artifacts.get(key)
+        if sourcemap_view is not None:
+            return sourcemap_view
+
     try:
-        return SourceMapView.from_json_bytes(body)
+        with metrics.timer("sourcemaps.parse_sourcemap"):
+            sourcemap_view = SourceMapView.from_json_bytes(body)
     except Exception as exc:
         # This is in debug because the product shows an error already.
         logger.debug(str(exc), exc_info=True)
         raise UnparseableSourcemap({"url": http.expose_url(url)})
 
+    if key is not None:
+        parsed_artifacts.add(key, sourcemap_view, len(body))
+    return sourcemap_view
+
 
 def is_data_uri(url):
     return url[:BASE64_PREAMBLE_LENGTH] == BASE64_SOURCEMAP_PREAMBLE
@@ -575,6 +747,9 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         self.fetch_count = 0
         self.sourcemaps_touched = set()
 
+        # release artifacts retrieved in bulk by `prefetch_release_files`
+        self.release_files = {}
+
         # cache holding mangled code, original code, and errors associated with
         # each abs_path in the stacktrace
         self.cache = SourceCache()
@@ -877,6 +1052,15 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         Look for and (if found) cache a source file and its associated source
         map (if any).
         """
+        sourcemap_url = self.cache_minified_source(filename)
+        if sourcemap_url:
+            self.cache_sourcemap(filename, sourcemap_url)
+
+    def cache_minified_source(self, filename):
+        """
+        Look for and (if found) cache a source file. Returns the url of its
+        source map if that still needs to be fetched.
+        """
 
         sourcemaps = self.sourcemaps
         cache = self.cache
@@ -901,6 +1085,7 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                     release=self.release,
                     dist=self.dist,
                     allow_scraping=self.allow_scraping,
+                    release_files=self.release_files,
                 )
         except http.BadSource as exc:
             # most people don't upload release artifacts for their third-party libraries,
@@ -913,7 +1098,19 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
             # either way, there's no more for us to do here, since we don't have
             # a valid file to cache
             return
-        cache.add(filename, result.body, result.encoding)
+
+        # Sources in other encodings are re-encoded before parsing, keep it simple
+        # and only share the common ones.
+        if result.encoding is None or is_utf8(result.encoding):
+            key = get_parsed_artifact_key("source", self.release, self.dist, result.body)
+        else:
+            key = None
+        source_view = parsed_artifacts.get(key) if key is not None else None
+        if source_view is None:
+            source_view = make_source_view(result.body, result.encoding)
+            if key is not None:
+                parsed_artifacts.add(key, source_view, len(result.body))
+        cache.add(filename, source_view)
         cache.alias(result.url, filename)
 
         sourcemap_url = discover_sourcemap(result)
@@ -926,6 +1123,13 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         sourcemaps.link(filename, sourcemap_url)
         if sourcemap_url in sourcemaps:
             return
+        return sourcemap_url
+
+    def cache_sourcemap(self, filename, sourcemap_url):
+        """
+        Fetch and cache the source map of a source file, along with the sources
+        inlined in it.
+        """
 
         # pull down sourcemap
         try:
@@ -939,6 +1143,7 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                     release=self.release,
                     dist=self.dist,
                     allow_scraping=self.allow_scraping,
+                    release_files=self.release_files,
                 )
         except http.BadSource as exc:
             # we don't perform the same check here as above, because if someone has
@@ -947,10 +1152,10 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
             # working, if that's the case). If they're not looking for it to be
             # mapped, then they shouldn't be uploading the source file in the
             # first place.
-            cache.add_error(filename, exc.data)
+            self.cache.add_error(filename, exc.data)
             return
 
-        sourcemaps.add(sourcemap_url, sourcemap_view)
+        self.sourcemaps.add(sourcemap_url, sourcemap_view)
 
         # cache any inlined sources
         for src_id, source_name in sourcemap_view.iter_sources():
@@ -979,12 +1184,49 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 continue
             pending_file_list.add(f["abs_path"])
 
-        for idx, filename in enumerate(pending_file_list):
+        self.prefetch_release_files(pending_file_list)
+
+        pending_sourcemaps = []
+        for filename in pending_file_list:
             with sentry_sdk.start_span(
                 op="JavaScriptStacktraceProcessor.populate_source_cache.cache_source"
             ) as span:
                 span.set_data("filename", filename)
-                self.cache_source(filename=filename)
+                sourcemap_url = self.cache_minified_source(filename)
+            if sourcemap_url:
+                pending_sourcemaps.append((filename, sourcemap_url))
+
+        self.prefetch_release_files({url for _, url in pending_sourcemaps if not is_data_uri(url)})
+
+        for filename, sourcemap_url in pending_sourcemaps:
+            # Several sources may share a source map.
+            if sourcemap_url in self.sourcemaps:
+                continue
+            with sentry_sdk.start_span(
+                op="JavaScriptStacktraceProcessor.populate_source_cache.cache_sourcemap"
+            ) as span:
+                span.set_data("sourcemap_url", sourcemap_url)
+                self.cache_sourcemap(filename, sourcemap_url)
+
+    def prefetch_release_files(self, filenames):
+        """
+        Retrieve the release artifacts for `filenames` in bulk, ahead of
+        `fetch_file` asking for them one by one.
+        """
+        if self.release is None:
+            return
+
+        # Don't read more than `cache_source` would let us fetch.
+        filenames = [f for f in filenames if f not in self.release_files]
+        filenames = filenames[: max(self.max_fetches - self.fetch_count, 0)]
+        if not filenames:
+            return
+
+        with sentry_sdk.start_span(
+            op="JavaScriptStacktraceProcessor.prefetch_release_files"
+        ) as span:
+            span.set_data("count", len(filenames))
+            self.release_files.update(fetch_release_files(filenames, self.release, self.dist))
 
     def close(self):
         StacktraceProcessor.close(self)
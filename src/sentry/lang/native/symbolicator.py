@@ -1,13 +1,17 @@
 import base64
 import logging
+import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
 import jsonschema
 import sentry_sdk
 from django.conf import settings
 from django.core.urlresolvers import reverse
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
 from sentry import features, options
@@ -134,7 +138,9 @@ class Symbolicator:
                     # Processing has already started and we need to poll
                     # symbolicator for an update. This in turn may put us back into
                     # the queue.
-                    json_response = self.sess.query_task(task_id)
+                    json_response = symbolicator_pool.wait_for_tasks(
+                        [(self.sess, task_id)], timeout=self.sess.timeout
+                    )[task_id]
 
                 if json_response is None:
                     # This is a new task, so we compute all request parameters
@@ -163,7 +169,11 @@ class Symbolicator:
                 default_cache.set(
                     self.task_id_cache_key, json_response["request_id"], REQUEST_CACHE_TIMEOUT
                 )
-                raise RetrySymbolication(retry_after=json_response["retry_after"])
+                # Symbolicator already held the request open for up to the
+                # timeout, so there is no need to wait any longer before
+                # polling again.
+                retry_after = 0 if self.sess.timeout else json_response["retry_after"]
+                raise RetrySymbolication(retry_after=retry_after)
             else:
                 # Once we arrive here, we are done processing. Clean up the
                 # task id from the cache.
@@ -468,6 +478,90 @@ def get_sources_for_project(project):
     return sources
 
 
+class SymbolicatorPool:
+    """
+    Connections to symbolicator shared by all sessions of a process.
+
+    Requests go over a pool of keep-alive connections instead of a new
+    connection per event, and `wait_for_tasks` polls many outstanding tasks
+    at the same time.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self._session = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_session(self):
+        with self._lock:
+            # Connections and threads do not survive forking worker processes.
+            if self._session is None or self._pid != os.getpid():
+                size = self.size or settings.SYMBOLICATOR_POOL_SIZE
+                # All requests go to the same host, so one pool of `size`
+                # connections is enough.
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+                session = Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._executor = ThreadPoolExecutor(max_workers=size)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._executor.shutdown()
+                self._session.close()
+                self._session = self._executor = None
+
+    def query_tasks(self, tasks, timeout=0):
+        """
+        Queries `(session, task_id)` pairs concurrently and returns their
+        responses in the same order. Symbolicator holds each request open for
+        up to `timeout` seconds while the task is pending.
+        """
+        self.get_session()
+        futures = [
+            self._executor.submit(sess.query_task, task_id, timeout=timeout)
+            for sess, task_id in tasks
+        ]
+        return [future.result() for future in futures]
+
+    def wait_for_tasks(self, tasks, timeout):
+        """
+        Waits up to `timeout` seconds for the `(session, task_id)` pairs in
+        `tasks` to complete, polling all pending ones together. Returns the
+        last response by task id, which is still pending for tasks that did
+        not complete in time and `None` for tasks unknown to symbolicator.
+        """
+        deadline = time.monotonic() + timeout
+        responses = {}
+
+        while tasks:
+            poll_timeout = max(0, min(int(deadline - time.monotonic()), timeout))
+            metrics.timing("events.symbolicator.wait_for_tasks.pending", len(tasks))
+            with metrics.timer("events.symbolicator.wait_for_tasks"):
+                results = self.query_tasks(tasks, timeout=poll_timeout)
+
+            pending = []
+            for task, response in zip(tasks, results):
+                responses[task[1]] = response
+                if response is not None and response.get("status") == "pending":
+                    pending.append(task)
+
+            if not poll_timeout:
+                break
+            tasks = pending
+
+        return responses
+
+
+symbolicator_pool = SymbolicatorPool()
+
+
 class SymbolicatorSession:
     def __init__(
         self, url=None, sources=None, project_id=None, event_id=None, timeout=None, options=None
@@ -489,12 +583,11 @@ class SymbolicatorSession:
 
     def open(self):
         if self.session is None:
-            self.session = Session()
+            self.session = symbolicator_pool.get_session()
 
     def close(self):
-        if self.session is not None:
-            self.session.close()
-            self.session = None
+        # The connections stay open in `symbolicator_pool` for the next session.
+        self.session = None
 
     def _ensure_open(self):
         if not self.session:
@@ -610,11 +703,11 @@ class SymbolicatorSession:
             files={"apple_crash_report": report},
         )
 
-    def query_task(self, task_id):
+    def query_task(self, task_id, timeout=0):
         task_url = f"requests/{task_id}"
 
         params = {
-            "timeout": 0,  # Only wait when creating, but not when querying tasks
+            "timeout": timeout,
             "scope": self.project_id,
         }
 
@@ -1,4 +1,3 @@
-import errno
 import hashlib
 import logging
 import os
@@ -13,7 +12,7 @@ from symbolic import Archive, ObjectErrorUnsupportedObject, SymbolicError, norma
 from sentry import options
 from sentry.constants import KNOWN_DIF_FORMATS
 from sentry.db.models import BaseManager, FlexibleForeignKey, JSONField, Model, sane_repr
-from sentry.models.file import File, clear_cached_files
+from sentry.models.file import File, artifact_cache
 from sentry.reprocessing import bump_reprocessing_revision, resolve_processing_issue
 from sentry.utils.zip import safe_extract_zip
 
@@ -409,18 +408,12 @@ class DIFCache:
         rv = {}
         for debug_id, dif in difs.items():
             dif_path = os.path.join(self.get_project_path(project), debug_id)
-            try:
-                os.stat(dif_path)
-            except OSError as e:
-                if e.errno != errno.ENOENT:
-                    raise
-                dif.file.save_to(dif_path)
-            rv[debug_id] = dif_path
+            rv[debug_id] = artifact_cache.fetch(dif_path, dif.file, "dif")
 
         return rv
 
     def clear_old_entries(self):
-        clear_cached_files(self.cache_path)
+        artifact_cache.evict()
 
 
 ProjectDebugFile.difcache = DIFCache()
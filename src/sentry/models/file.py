@@ -1,3 +1,4 @@
+import errno
 import mmap
 import os
 import tempfile
@@ -5,7 +6,8 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from hashlib import sha1
-from threading import Semaphore
+from io import BytesIO
+from threading import Lock, Semaphore
 from uuid import uuid4
 
 from django.conf import settings
@@ -15,6 +17,7 @@ from django.core.files.storage import get_storage_class
 from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
+from sentry import options
 from sentry.app import locks
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, JSONField, Model
 from sentry.tasks.files import delete_file as delete_file_task
@@ -318,9 +321,17 @@ class File(Model):
         app_label = "sentry"
         db_table = "sentry_file"
 
+    def _get_blob_indexes(self):
+        # Indexes loaded with `prefetch_related("fileblobindex_set")`, with their
+        # blobs, are used as they are, so that the file can be read without a
+        # database query, e.g. from another thread.
+        if "fileblobindex_set" in getattr(self, "_prefetched_objects_cache", ()):
+            return sorted(self.fileblobindex_set.all(), key=lambda index: index.offset)
+        return FileBlobIndex.objects.filter(file=self).select_related("blob").order_by("offset")
+
     def _get_chunked_blob(self, mode=None, prefetch=False, prefetch_to=None, delete=True):
         return ChunkedFileBlobIndexWrapper(
-            FileBlobIndex.objects.filter(file=self).select_related("blob").order_by("offset"),
+            self._get_blob_indexes(),
             mode=mode,
             prefetch=prefetch,
             prefetch_to=prefetch_to,
@@ -627,28 +638,155 @@ class FileBlobOwner(Model):
         unique_together = (("blob", "organization"),)
 
 
-def clear_cached_files(cache_path):
-    try:
-        cache_folders = os.listdir(cache_path)
-    except OSError:
-        return
+class MappedFile(FileObj):
+    """A read-only file backed by a memory map of a file on disk.
+
+    ``buffer`` exposes its contents without copying them into Python, and
+    processes mapping the same file share its pages.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # Empty files cannot be mapped.
+            if size:
+                impl = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                impl = BytesIO()
+        super().__init__(impl, path)
+        self.size = size
 
-    cutoff = int(time.time()) - ONE_DAY_AND_A_HALF
+    @property
+    def buffer(self):
+        if not self.size:
+            return memoryview(b"")
+        return memoryview(self.file)
 
-    for cache_folder in cache_folders:
-        cache_folder = os.path.join(cache_path, cache_folder)
+    def close(self):
         try:
-            items = os.listdir(cache_folder)
-        except OSError:
-            continue
-        for cached_file in items:
-            cached_file = os.path.join(cache_folder, cached_file)
+            self.file.close()
+        except BufferError:
+            # A view of the buffer is still alive, the map is closed once
+            # that is released.
+            pass
+
+
+class ArtifactCache:
+    """Keeps copies of files on the local disk, shared by all processes of a
+    host, for the release file and debug file caches.
+
+    Cached files are touched whenever they are used, and the least recently
+    used ones are removed once all caches together grow past the
+    ``artifacts.cache-max-size`` option or were not used for a day and a half.
+    """
+
+    #: Eviction removes files until the caches are back below this share of
+    #: their size limit, so that it doesn't run again on the next insert.
+    low_watermark = 0.9
+
+    def __init__(self):
+        # Bytes in the caches as of the last eviction plus the misses of this
+        # process since, which triggers an eviction once it passes the limit.
+        self._disk_usage = 0
+        self._evict_lock = Lock()
+
+    def get_cache_paths(self):
+        return [options.get("releasefile.cache-path"), options.get("dsym.cache-path")]
+
+    def fetch(self, path, file, kind):
+        """Returns ``path`` after making sure it holds the contents of
+        ``file``, downloading them if it does not exist yet.
+        """
+        try:
+            os.utime(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            file.save_to(path)
+            metrics.incr("artifact_cache.miss", tags={"kind": kind})
+            metrics.timing("artifact_cache.miss.size", file.size, tags={"kind": kind})
+            self._disk_usage += file.size
+            max_size = options.get("artifacts.cache-max-size")
+            if max_size and self._disk_usage > max_size:
+                self._evict_once()
+        else:
+            metrics.incr("artifact_cache.hit", tags={"kind": kind})
+        return path
+
+    def open(self, path, file, kind):
+        """Like `fetch`, but returns the cached file as a `MappedFile`."""
+        return MappedFile(self.fetch(path, file, kind))
+
+    def _list_files(self):
+        for cache_path in self.get_cache_paths():
             try:
-                mtime = os.path.getmtime(cached_file)
+                cache_folders = os.listdir(cache_path)
             except OSError:
                 continue
+            for cache_folder in cache_folders:
+                cache_folder = os.path.join(cache_path, cache_folder)
+                try:
+                    items = os.listdir(cache_folder)
+                except OSError:
+                    continue
+                for cached_file in items:
+                    # Files that are still being written by `File.save_to`.
+                    if cached_file.startswith("._"):
+                        continue
+                    cached_file = os.path.join(cache_folder, cached_file)
+                    try:
+                        stat = os.stat(cached_file)
+                    except OSError:
+                        continue
+                    yield cached_file, stat.st_mtime, stat.st_size
+
+    def evict(self):
+        """Removes expired files and, if the caches are over their size
+        limit, the least recently used ones. Returns the number of bytes in
+        the caches afterwards.
+        """
+        cutoff = int(time.time()) - ONE_DAY_AND_A_HALF
+        max_size = options.get("artifacts.cache-max-size")
+
+        files = []
+        disk_usage = 0
+        evicted = 0
+        for cached_file, mtime, size in self._list_files():
             if mtime < cutoff:
                 try:
                     os.remove(cached_file)
                 except OSError:
-                    pass
+                    continue
+                evicted += 1
+            else:
+                files.append((mtime, size, cached_file))
+                disk_usage += size
+
+        if max_size and disk_usage > max_size:
+            files.sort()
+            for mtime, size, cached_file in files:
+                if disk_usage <= max_size * self.low_watermark:
+                    break
+                try:
+                    os.remove(cached_file)
+                except OSError:
+                    continue
+                disk_usage -= size
+                evicted += 1
+
+        metrics.incr("artifact_cache.evicted", amount=evicted)
+        metrics.timing("artifact_cache.disk_usage", disk_usage)
+        self._disk_usage = disk_usage
+        return disk_usage
+
+    def _evict_once(self):
+        # Threads missing at the same time leave the eviction to the first.
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            self.evict()
+        finally:
+            self._evict_lock.release()
+
+
+artifact_cache = ArtifactCache()
@@ -1,13 +1,11 @@
-import errno
 import os
 from urllib.parse import urlsplit, urlunsplit
 
-from django.core.files.base import File as FileObj
 from django.db import models
 
 from sentry import options
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model, sane_repr
-from sentry.models import clear_cached_files
+from sentry.models import artifact_cache
 from sentry.utils import metrics
 from sentry.utils.hashlib import sha1_text
 
@@ -101,20 +99,11 @@ class ReleaseFileCache:
         organization_id = str(releasefile.organization_id)
         file_path = os.path.join(self.cache_path, organization_id, file_id)
 
-        hit = True
-        try:
-            os.stat(file_path)
-        except OSError as e:
-            if e.errno != errno.ENOENT:
-                raise
-            releasefile.file.save_to(file_path)
-            hit = False
-
-        metrics.timing("release_file.cache.get.size", file_size, tags={"hit": hit, "cutoff": False})
-        return FileObj(open(file_path, "rb"))
+        metrics.timing("release_file.cache.get.size", file_size, tags={"cutoff": False})
+        return artifact_cache.open(file_path, releasefile.file, "releasefile")
 
     def clear_old_entries(self):
-        clear_cached_files(self.cache_path)
+        artifact_cache.evict()
 
 
 ReleaseFile.cache = ReleaseFileCache()
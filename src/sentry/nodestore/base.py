@@ -3,6 +3,8 @@ from threading import local
 import sentry_sdk
 from django.core.cache import InvalidCacheBackendError, caches
 
+from sentry import options
+from sentry.nodestore import encoding
 from sentry.utils import json
 from sentry.utils.cache import memoize
 from sentry.utils.services import Service
@@ -64,7 +66,9 @@ class NodeStorage(local, Service):
         "get",
         "get_multi",
         "set",
+        "set_many",
         "set_subkeys",
+        "set_subkeys_many",
         "cleanup",
         "validate",
         "bootstrap",
@@ -92,6 +96,10 @@ class NodeStorage(local, Service):
         if value is None:
             return None
 
+        if encoding.is_encoded(value):
+            payload = encoding.decode(value, subkey)
+            return json_loads(payload) if payload is not None else None
+
         lines_iter = iter(value.splitlines())
         try:
             if subkey is not None:
@@ -199,7 +207,17 @@ class NodeStorage(local, Service):
 
         >>> _encode({"unprocessed": {}, None: {"stacktrace": {}}})
         b'{"stacktrace": {}}\nunprocessed\n{}'
+
+        With the `nodestore.encoding-version` option set, values are written
+        with the compressed encoding of `sentry.nodestore.encoding` instead.
         """
+        if options.get("nodestore.encoding-version") == encoding.VERSION:
+            default = data.pop(None)
+            payloads = {None: json_dumps(default).encode("utf8")}
+            for key, value in data.items():
+                payloads[key] = json_dumps(value).encode("utf8")
+            return encoding.encode(payloads, encoding.select_dictionary_id(default))
+
         lines = [json_dumps(data.pop(None)).encode("utf8")]
         for key, value in data.items():
             lines.append(key.encode("ascii"))
@@ -243,6 +261,41 @@ class NodeStorage(local, Service):
             # set cache only after encoding and write to nodestore has succeeded
             self._set_cache_item(id, cache_item)
 
+    def _set_bytes_multi(self, items, ttl=None):
+        """
+        >>> nodestore._set_bytes_multi({'key1': b"{'foo': 'bar'}", 'key2': b"{'foo': 'baz'}"})
+        """
+        for id, data in items.items():
+            self._set_bytes(id, data, ttl=ttl)
+
+    def set_many(self, items, ttl=None):
+        """
+        Set the values of multiple ids at once. Like `set`, this deletes their
+        existing subkeys.
+
+        >>> nodestore.set_many({'key1': {'foo': 'bar'}, 'key2': {'foo': 'baz'}})
+        """
+        return self.set_subkeys_many({id: {None: data} for id, data in items.items()}, ttl=ttl)
+
+    def set_subkeys_many(self, items, ttl=None):
+        """
+        Set the values and subkeys of multiple ids at once, see `set_subkeys`.
+
+        Note: This is not guaranteed to be atomic and may result in a partial
+        write.
+
+        >>> nodestore.set_subkeys_many({
+        ...    'key1': {None: {'foo': 'bar'}, "reprocessing": {'foo': 'bam'}},
+        ...    'key2': {None: {'foo': 'baz'}},
+        ... })
+        """
+        with sentry_sdk.start_span(op="nodestore.set_subkeys_many") as span:
+            span.set_tag("num_ids", len(items))
+            cache_items = {id: data.get(None) for id, data in items.items()}
+            self._set_bytes_multi({id: self._encode(data) for id, data in items.items()}, ttl=ttl)
+            # set cache only after encoding and write to nodestore has succeeded
+            self._set_cache_items({id: data for id, data in cache_items.items() if data})
+
     def cleanup(self, cutoff_timestamp):
         raise NotImplementedError
 
@@ -1,18 +1,37 @@
+import base64
 import logging
 import math
 import pickle
+import zlib
 
+from django.db import connections, router
 from django.utils import timezone
 
 from sentry.db.models import create_or_update
+from sentry.nodestore import encoding
 from sentry.nodestore.base import NodeStorage
-from sentry.utils.strings import compress, decompress
+from sentry.utils.strings import compress
 
 from .models import Node
 
 logger = logging.getLogger("sentry")
 
 
+def _compress(data):
+    # Values of the compressed encoding are compressed already, so they are
+    # only base64 encoded for the text column.
+    if encoding.is_encoded(data):
+        return base64.b64encode(data).decode("utf-8")
+    return compress(data)
+
+
+def _decompress(value):
+    data = base64.b64decode(value)
+    if encoding.is_encoded(data):
+        return data
+    return zlib.decompress(data)
+
+
 class DjangoNodeStorage(NodeStorage):
     def delete(self, id):
         Node.objects.filter(id=id).delete()
@@ -23,7 +42,7 @@ class DjangoNodeStorage(NodeStorage):
             return None
 
         try:
-            if value.startswith(b"{"):
+            if value.startswith(b"{") or encoding.is_encoded(value):
                 return NodeStorage._decode(self, value, subkey=subkey)
 
             if subkey is None:
@@ -37,27 +56,54 @@ class DjangoNodeStorage(NodeStorage):
     def _get_bytes(self, id):
         try:
             data = Node.objects.get(id=id).data
-            return decompress(data)
+            return _decompress(data)
         except Node.DoesNotExist:
             return None
 
     def _get_bytes_multi(self, id_list):
-        return {n.id: decompress(n.data) for n in Node.objects.filter(id__in=id_list)}
+        return {n.id: _decompress(n.data) for n in Node.objects.filter(id__in=id_list)}
 
     def delete_multi(self, id_list):
         Node.objects.filter(id__in=id_list).delete()
         self._delete_cache_items(id_list)
 
     def _set_bytes(self, id, data, ttl=None):
-        create_or_update(Node, id=id, values={"data": compress(data), "timestamp": timezone.now()})
+        create_or_update(Node, id=id, values={"data": _compress(data), "timestamp": timezone.now()})
+
+    def _set_bytes_multi(self, items, ttl=None):
+        if not items:
+            return
+
+        connection = connections[router.db_for_write(Node)]
+        quote_name = connection.ops.quote_name
+        timestamp = timezone.now()
+        params = []
+        # Sorted so that concurrent writes lock rows in the same order.
+        for id, data in sorted(items.items()):
+            params.extend((id, _compress(data), timestamp))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                insert into {table} (id, data, {timestamp})
+                values {values}
+                on conflict (id) do update
+                set data = excluded.data, {timestamp} = excluded.{timestamp}
+                """.format(
+                    table=quote_name(Node._meta.db_table),
+                    timestamp=quote_name("timestamp"),
+                    values=", ".join(["(%s, %s, %s)"] * len(items)),
+                ),
+                params,
+            )
 
     def cleanup(self, cutoff_timestamp):
-        from sentry.db.deletion import BulkDeleteQuery
+        from sentry.db.deletion import TimeRangeDeleteQuery
 
         total_seconds = (timezone.now() - cutoff_timestamp).total_seconds()
         days = math.floor(total_seconds / 86400)
 
-        BulkDeleteQuery(model=Node, dtfield="timestamp", days=days).execute()
+        TimeRangeDeleteQuery(model=Node, dtfield="timestamp", days=days).execute()
         if self.cache:
             self.cache.clear()
 
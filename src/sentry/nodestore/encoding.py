@@ -0,0 +1,179 @@
+"""
+Compressed encoding of nodestore values.
+
+Values written by `NodeStorage._encode` are newline separated JSON payloads,
+one per subkey, left to the backend to compress. The compressed encoding
+instead compresses every payload with zstd, optionally with a dictionary
+trained on similar events, and prefixes them with an index so that a single
+subkey can be read without decompressing the others:
+
+    magic (3 bytes) | version (1 byte) | dictionary id (4 bytes) | count (2 bytes)
+    count * [key length (2 bytes) | value length (4 bytes) | key]
+    count * [compressed value]
+
+The default payload (the `None` subkey) has an empty key and comes first. The
+other subkeys, such as the unprocessed event, mostly repeat the default
+payload, so they are compressed with the default payload as their dictionary.
+
+Dictionary ids are stored with every value, so a dictionary has to stay in
+`SENTRY_NODESTORE_DICTIONARIES` as long as values compressed with it exist.
+Id 0 means no dictionary.
+"""
+
+import struct
+import threading
+
+import zstandard
+from django.conf import settings
+
+MAGIC = b"\xfeNS"
+VERSION = 1
+COMPRESSION_LEVEL = 3
+
+_header = struct.Struct(">3sBIH")
+_entry = struct.Struct(">HI")
+
+_local = threading.local()
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+class UnknownDictionaryError(Exception):
+    pass
+
+
+def is_encoded(value):
+    return value[: len(MAGIC)] == MAGIC
+
+
+def get_dictionary(dictionary_id):
+    """ Returns the dictionary registered under `dictionary_id`. """
+    try:
+        return _dictionaries[dictionary_id]
+    except KeyError:
+        pass
+
+    path = settings.SENTRY_NODESTORE_DICTIONARIES.get(dictionary_id)
+    if path is None:
+        raise UnknownDictionaryError(dictionary_id)
+    with open(path, "rb") as f:
+        dictionary = zstandard.ZstdCompressionDict(f.read())
+    with _dictionaries_lock:
+        return _dictionaries.setdefault(dictionary_id, dictionary)
+
+
+def select_dictionary_id(data):
+    """
+    Returns the id of the dictionary to compress an event's `data` with: the
+    one of its project, else the one of its platform, else 0 for none.
+    """
+    if not isinstance(data, dict):
+        return 0
+    project_dictionaries = settings.SENTRY_NODESTORE_PROJECT_DICTIONARIES
+    platform_dictionaries = settings.SENTRY_NODESTORE_PLATFORM_DICTIONARIES
+    if data.get("project") in project_dictionaries:
+        return project_dictionaries[data["project"]]
+    return platform_dictionaries.get(data.get("platform"), 0)
+
+
+def _get_compressor(dictionary_id):
+    # Compressors are expensive to set up with a dictionary, but cannot be
+    # shared between threads.
+    compressors = getattr(_local, "compressors", None)
+    if compressors is None:
+        compressors = _local.compressors = {}
+    if dictionary_id not in compressors:
+        compressors[dictionary_id] = zstandard.ZstdCompressor(
+            level=COMPRESSION_LEVEL,
+            dict_data=get_dictionary(dictionary_id) if dictionary_id else None,
+        )
+    return compressors[dictionary_id]
+
+
+def _get_decompressor(dictionary_id):
+    decompressors = getattr(_local, "decompressors", None)
+    if decompressors is None:
+        decompressors = _local.decompressors = {}
+    if dictionary_id not in decompressors:
+        decompressors[dictionary_id] = zstandard.ZstdDecompressor(
+            dict_data=get_dictionary(dictionary_id) if dictionary_id else None
+        )
+    return decompressors[dictionary_id]
+
+
+def _get_prefix(default):
+    return zstandard.ZstdCompressionDict(default, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+
+def encode(payloads, dictionary_id=0):
+    """
+    Encodes the JSON `payloads` of a node, by subkey. The default payload
+    (subkey `None`) is required.
+
+    >>> encode({None: b'{"foo": "bar"}', "unprocessed": b'{"foo": "baz"}'})
+    """
+    default = payloads[None]
+    keys = [b""]
+    values = [_get_compressor(dictionary_id).compress(default)]
+
+    if len(payloads) > 1:
+        prefix = _get_prefix(default)
+        compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=prefix)
+        for key, payload in payloads.items():
+            if key is not None:
+                keys.append(key.encode("ascii"))
+                values.append(compressor.compress(payload))
+
+    parts = [_header.pack(MAGIC, VERSION, dictionary_id, len(keys))]
+    for key, value in zip(keys, values):
+        parts.append(_entry.pack(len(key), len(value)))
+        parts.append(key)
+    parts.extend(values)
+    return b"".join(parts)
+
+
+def decode(value, subkey=None):
+    """
+    Returns the JSON payload of `subkey` from an encoded value, or `None` when
+    the value has no such subkey. Only the requested payload, and the default
+    payload for other subkeys, are decompressed.
+    """
+    _, version, dictionary_id, count = _header.unpack_from(value)
+    if version != VERSION:
+        raise ValueError(f"Unsupported nodestore encoding version: {version}")
+
+    wanted = subkey.encode("ascii") if subkey is not None else b""
+    position = _header.size
+    offset = 0
+    default = found = None
+    for _ in range(count):
+        key_length, value_length = _entry.unpack_from(value, position)
+        position += _entry.size
+        key = value[position : position + key_length]
+        position += key_length
+        if key == b"":
+            default = (offset, value_length)
+        if key == wanted:
+            found = (offset, value_length)
+        offset += value_length
+
+    if found is None:
+        return None
+
+    def get_compressed(entry):
+        start = position + entry[0]
+        return value[start : start + entry[1]]
+
+    payload = _get_decompressor(dictionary_id).decompress(get_compressed(default))
+    if subkey is None:
+        return payload
+    decompressor = zstandard.ZstdDecompressor(dict_data=_get_prefix(payload))
+    return decompressor.decompress(get_compressed(found))
+
+
+def train_dictionary(samples, size=112640):
+    """
+    Trains a dictionary for the JSON payloads in `samples` and returns it, to
+    be written to a file registered in `SENTRY_NODESTORE_DICTIONARIES`.
+    """
+    return zstandard.train_dictionary(size, samples).as_bytes()
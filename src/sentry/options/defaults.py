@@ -51,6 +51,8 @@ register(
     flags=FLAG_PRIORITIZE_DISK,
 )
 register("releasefile.cache-limit", type=Int, default=10 * 1024 * 1024, flags=FLAG_PRIORITIZE_DISK)
+# Bytes of the release file and dsym caches together, 0 for no limit
+register("artifacts.cache-max-size", type=Int, default=10 * 1024 ** 3, flags=FLAG_PRIORITIZE_DISK)
 
 # Mail
 register("mail.backend", default="smtp", flags=FLAG_NOSTORE)
@@ -86,6 +88,10 @@ register(
 )
 
 register("api.rate-limit.org-create", default=5, flags=FLAG_ALLOW_EMPTY | FLAG_PRIORITIZE_DISK)
+# Share the attrs fetched by `serialize` between the nested serializers of a GET request.
+register("api.serialize.attrs-cache", default=True)
+# Log the attrs lookups repeated within an API request, by endpoint and serializer.
+register("api.serialize.attrs-cache-debug", default=False)
 
 # Beacon
 register("beacon.anonymous", type=Bool, flags=FLAG_REQUIRED)
@@ -192,6 +198,9 @@ register("snuba.search.chunk-growth-rate", default=1.5)
 register("snuba.search.max-chunk-size", default=2000)
 register("snuba.search.max-total-chunk-time-seconds", default=30.0)
 register("snuba.search.hits-sample-size", default=100)
+# Seconds the Postgres candidates and sorted Snuba results of an issue search are kept
+# for later pages of the same search, 0 disables the cache.
+register("snuba.search.candidate-cache-ttl", default=0)
 register("snuba.track-outcomes-sample-rate", default=0.0)
 register("snuba.snql.referrer-rate", default=0.0)
 
@@ -256,6 +265,10 @@ register("outcomes.tsdb-in-consumer-sample-rate", default=0.0)  # unused
 register("nodedata.cache-sample-rate", default=0.0, flags=FLAG_PRIORITIZE_DISK)
 register("nodedata.cache-on-save", default=False, flags=FLAG_PRIORITIZE_DISK)
 
+# Nodestore value encoding to write, 0 for JSON lines and 1 for zstd compressed. Every
+# version can be read, so only enable a version once all readers are deployed.
+register("nodestore.encoding-version", default=0, flags=FLAG_PRIORITIZE_DISK)
+
 # Use nodestore for eventstore.get_events
 register("eventstore.use-nodestore", default=False, flags=FLAG_PRIORITIZE_DISK)
 
@@ -300,3 +313,11 @@ register("store.load-shed-group-creation-projects", type=Sequence, default=[])
 
 # Killswitch for dropping events in ingest consumer or really anywhere
 register("store.load-shed-pipeline-projects", type=Sequence, default=[])
+
+# Store buffer filters and extra values with the versioned msgpack encoding
+# instead of pickle. Only enable this once all buffer workers can read it.
+register("buffer.redis.msgpack-encoding", default=False, flags=FLAG_PRIORITIZE_DISK)
+
+# Store digest records as ids with the compact encoding of NotificationCodec
+# instead of pickled events. Only enable this once all digest workers can read it.
+register("digests.compact-encoding", default=False, flags=FLAG_PRIORITIZE_DISK)
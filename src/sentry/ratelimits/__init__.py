@@ -2,7 +2,7 @@ from django.conf import settings
 
 from sentry.utils.services import LazyServiceWrapper
 
-from .base import RateLimiter  # NOQA
+from .base import RateLimiter, RateLimitResult  # NOQA
 
 backend = LazyServiceWrapper(
     RateLimiter, settings.SENTRY_RATELIMITER, settings.SENTRY_RATELIMITER_OPTIONS
@@ -1,10 +1,28 @@
+from collections import namedtuple
+
 from sentry.utils.services import Service
 
+# The outcome of a rate limit check.  `remaining` is the number of further
+# requests allowed right now and `reset_time` the unix timestamp at which the
+# full quota is available again.  Both are `None` if the backend cannot tell.
+RateLimitResult = namedtuple("RateLimitResult", ["is_limited", "remaining", "reset_time"])
+
 
 class RateLimiter(Service):
-    __all__ = ("is_limited", "validate")
+    __all__ = ("is_limited", "is_limited_many", "validate")
 
     window = 60
 
     def is_limited(self, key, limit, project=None, window=None):
         return False
+
+    def is_limited_many(self, requests, project=None):
+        """Checks several rate limits at once.  `requests` is a sequence of
+        `(key, limit, window)` tuples where the window may be `None` to use
+        the default one.  Every key is counted and checked independently,
+        one `RateLimitResult` is returned per request in the same order.
+        """
+        return [
+            RateLimitResult(self.is_limited(key, limit, project=project, window=window), None, None)
+            for key, limit, window in requests
+        ]
@@ -1,12 +1,18 @@
 from time import time
 
 from sentry.exceptions import InvalidConfiguration
-from sentry.ratelimits.base import RateLimiter
+from sentry.ratelimits.base import RateLimiter, RateLimitResult
 from sentry.utils.hashlib import md5_text
-from sentry.utils.redis import get_cluster_from_options
+from sentry.utils.redis import get_cluster_from_options, load_script
+
+gcra = load_script("ratelimits/gcra.lua")
 
 
 class RedisRateLimiter(RateLimiter):
+    """Counts requests in fixed windows.  This permits bursts of up to twice
+    the limit around the edge of a window.
+    """
+
     window = 60
 
     def __init__(self, **options):
@@ -19,20 +25,91 @@ class RedisRateLimiter(RateLimiter):
         except Exception as e:
             raise InvalidConfiguration(str(e))
 
+    def _get_bucket_key(self, key, project, bucket):
+        key_hex = md5_text(key).hexdigest()
+
+        if project:
+            return f"rl:{key_hex}:{project.id}:{bucket}"
+        else:
+            return f"rl:{key_hex}:{bucket}"
+
     def is_limited(self, key, limit, project=None, window=None):
         if window is None:
             window = self.window
 
-        key_hex = md5_text(key).hexdigest()
         bucket = int(time() / window)
-
-        if project:
-            key = f"rl:{key_hex}:{project.id}:{bucket}"
-        else:
-            key = f"rl:{key_hex}:{bucket}"
+        key = self._get_bucket_key(key, project, bucket)
 
         with self.cluster.map() as client:
             result = client.incr(key)
             client.expire(key, window)
 
         return result.value > limit
+
+    def is_limited_many(self, requests, project=None):
+        now = time()
+
+        results = []
+        with self.cluster.map() as client:
+            for key, limit, window in requests:
+                if window is None:
+                    window = self.window
+                bucket = int(now / window)
+                key = self._get_bucket_key(key, project, bucket)
+                results.append((client.incr(key), limit, (bucket + 1) * window))
+                client.expire(key, window)
+
+        return [
+            RateLimitResult(result.value > limit, max(limit - result.value, 0), reset_time)
+            for result, limit, reset_time in results
+        ]
+
+
+class RedisGCRARateLimiter(RedisRateLimiter):
+    """Limits requests with the generic cell rate algorithm, which behaves
+    like a sliding window: no more than `limit` requests are allowed within
+    any `window` seconds.  A check is a single script call and keys of a
+    batch that live on the same host are checked with one call.
+    """
+
+    def _get_key(self, key, project):
+        key_hex = md5_text(key).hexdigest()
+
+        if project:
+            return f"rl:gcra:{key_hex}:{project.id}"
+        else:
+            return f"rl:gcra:{key_hex}"
+
+    def is_limited(self, key, limit, project=None, window=None):
+        return self.is_limited_many([(key, limit, window)], project=project)[0].is_limited
+
+    def is_limited_many(self, requests, project=None):
+        now = int(time() * 1000)
+
+        router = self.cluster.get_router()
+        requests_by_host = {}
+        for idx, (key, limit, window) in enumerate(requests):
+            if window is None:
+                window = self.window
+            key = self._get_key(key, project)
+            requests_by_host.setdefault(router.get_host_for_key(key), []).append(
+                (idx, key, limit, window)
+            )
+
+        results = [None] * len(requests)
+        for host_id, host_requests in requests_by_host.items():
+            keys = []
+            args = [now]
+            for _, key, limit, window in host_requests:
+                keys.append(key)
+                args.extend((limit, window * 1000))
+
+            host_results = gcra(self.cluster.get_local_client(host_id), keys, args)
+            for (idx, _, _, _), (limited, remaining, reset_after) in zip(
+                host_requests, host_results
+            ):
+                results[idx] = RateLimitResult(
+                    bool(limited), int(remaining), (now + int(reset_after)) / 1000.0
+                )
+
+        return results
@@ -113,8 +113,14 @@ def multiprocess_worker(task_queue):
     is_flag=True,
     help="Send the duration of this command to internal metrics.",
 )
+@click.option(
+    "--dry-run",
+    default=False,
+    is_flag=True,
+    help="Report the rows and bytes that would be deleted, without deleting them.",
+)
 @log_options()
-def cleanup(days, project, concurrency, silent, model, router, timed):
+def cleanup(days, project, concurrency, silent, model, router, timed, dry_run):
     """Delete a portion of trailing data based on creation date.
 
     All data that is older than `--days` will be deleted.  The default for
@@ -136,7 +142,7 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
 
     pool = []
     task_queue = Queue(1000)
-    for _ in range(concurrency):
+    for _ in range(concurrency if not dry_run else 0):
         p = Process(target=multiprocess_worker, args=(task_queue,))
         p.daemon = True
         p.start()
@@ -151,7 +157,7 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
     from sentry import models
     from sentry.app import nodestore
     from sentry.data_export.models import ExportedData
-    from sentry.db.deletion import BulkDeleteQuery
+    from sentry.db.deletion import BulkDeleteQuery, TimeRangeDeleteQuery
 
     if timed:
         import time
@@ -185,6 +191,30 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
         (models.Group, "last_seen", "last_seen"),
     ]
 
+    project_id = None
+    if project:
+        project_id = get_project(project)
+        if project_id is None:
+            click.echo("Error: Project not found", err=True)
+            raise click.Abort()
+
+    if dry_run:
+        from django.template.defaultfilters import filesizeformat
+
+        click.echo(
+            "Rows that would be deleted for days={days} project={project}, "
+            "not including their child relations:".format(days=days, project=project or "*")
+        )
+        for bqd in BULK_QUERY_DELETES + DELETES:
+            model, dtfield = bqd[:2]
+            if is_filtered(model):
+                continue
+            estimate = BulkDeleteQuery(
+                model=model, dtfield=dtfield, days=days, project_id=project_id
+            ).estimate()
+            click.echo(f"{estimate.model}: {estimate.rows} rows, {filesizeformat(estimate.bytes)}")
+        return
+
     if not silent:
         click.echo("Removing expired values for LostPasswordHash")
 
@@ -238,13 +268,8 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
         for item in queryset:
             item.delete_file()
 
-    project_id = None
     if project:
         click.echo("Bulk NodeStore deletion not available for project selection", err=True)
-        project_id = get_project(project)
-        if project_id is None:
-            click.echo("Error: Project not found", err=True)
-            raise click.Abort()
     else:
         if not silent:
             click.echo("Removing old NodeStore values")
@@ -271,6 +296,10 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
         if is_filtered(model):
             if not silent:
                 click.echo(">> Skipping %s" % model.__name__)
+        elif TimeRangeDeleteQuery.supports(model, dtfield):
+            TimeRangeDeleteQuery(
+                model=model, dtfield=dtfield, days=days, project_id=project_id
+            ).execute()
         else:
             BulkDeleteQuery(
                 model=model, dtfield=dtfield, days=days, project_id=project_id, order_by=order_by
@@ -333,16 +362,16 @@ def cleanup_unused_files(quiet=False):
     referenced.
     """
     from sentry.models import File, FileBlob, FileBlobIndex
-
-    if quiet:
-        from sentry.utils.query import RangeQuerySetWrapper
-    else:
-        from sentry.utils.query import RangeQuerySetWrapperWithProgressBar as RangeQuerySetWrapper
+    from sentry.utils.query import ShardedRangeQuerySetWrapper, WithProgressBar
 
     cutoff = timezone.now() - timedelta(days=1)
     queryset = FileBlob.objects.filter(timestamp__lte=cutoff)
 
-    for blob in RangeQuerySetWrapper(queryset):
+    blobs = ShardedRangeQuerySetWrapper(queryset)
+    if not quiet:
+        blobs = WithProgressBar(blobs, queryset.count(), "File Blobs")
+
+    for blob in blobs:
         if FileBlobIndex.objects.filter(blob=blob).exists():
             continue
         if File.objects.filter(blob=blob).exists():
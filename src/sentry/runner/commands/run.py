@@ -471,6 +471,12 @@ def batching_kafka_options(group):
     default=None,
     help="(Deprecated) Ingest consumers no longer use multiple processing threads.",
 )
+@click.option(
+    "--flush-threads",
+    type=int,
+    default=1,
+    help="Number of threads used to flush a batch. Messages of the same project are always processed in order.",
+)
 @configuration
 def ingest_consumer(consumer_types, all_consumer_types, **options):
     """
@@ -500,4 +506,6 @@ def ingest_consumer(consumer_types, all_consumer_types, **options):
     with metrics.global_tags(
         ingest_consumer_types=",".join(sorted(consumer_types)), _all_threads=True
     ):
-        get_ingest_consumer(consumer_types=consumer_types, **options).run()
+        get_ingest_consumer(
+            consumer_types=consumer_types, concurrency=options.pop("flush_threads"), **options
+        ).run()
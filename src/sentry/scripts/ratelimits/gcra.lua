@@ -0,0 +1,51 @@
+-- Check and count rate limits using the generic cell rate algorithm (GCRA).
+--
+-- Instead of a counter per fixed window, GCRA stores a single value per key:
+-- the theoretical arrival time (TAT) of the next request if requests arrived
+-- at exactly the allowed rate.  A request is allowed if it does not arrive
+-- earlier than ``TAT - window``, which permits bursts of up to ``limit``
+-- requests but never more than ``limit`` requests within any window.
+--
+-- Values provided as ``KEYS`` are the keys to check.  The first value of
+-- ``ARGV`` is the current time in milliseconds, followed by the limit and the
+-- window in milliseconds of every key.  For example, to check key ``foo``
+-- with 10 requests per minute and ``bar`` with 100 requests per hour:
+--
+--   KEYS = {"foo", "bar"}
+--   ARGV = {1600000000000, 10, 60000, 100, 3600000}
+--
+-- Every key is checked and counted independently.  The result holds a
+-- ``{limited, remaining, reset_after}`` triple for every key, where
+-- ``reset_after`` is the number of milliseconds until the full limit is
+-- available again.
+assert(#ARGV == #KEYS * 2 + 1, "incorrect number of keys and arguments provided")
+
+local now = tonumber(ARGV[1])
+local results = {}
+
+for i=1, #KEYS do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then
+        tat = now
+    end
+
+    if limit <= 0 then
+        results[i] = {1, 0, math.ceil(tat - now)}
+    else
+        local interval = window / limit
+        local new_tat = tat + interval
+        local allow_at = new_tat - window
+
+        if now < allow_at then
+            results[i] = {1, 0, math.ceil(tat - now)}
+        else
+            redis.call('SET', KEYS[i], new_tat, 'PX', math.ceil(new_tat - now))
+            results[i] = {0, math.floor((now - allow_at) / interval), math.ceil(new_tat - now)}
+        end
+    end
+end
+
+return results
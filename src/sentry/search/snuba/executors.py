@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from hashlib import md5
 
 import sentry_sdk
+from django.core.cache import cache
 from django.utils import timezone
 
 from sentry import options
@@ -384,11 +385,43 @@ class PostgresSnubaQueryExecutor(AbstractQueryExecutor):
         # clause.
         max_candidates = options.get("snuba.search.max-pre-snuba-candidates")
 
-        with sentry_sdk.start_span(op="snuba_group_query") as span:
-            group_ids = list(group_queryset.values_list("id", flat=True)[: max_candidates + 1])
-            span.set_data("Max Candidates", max_candidates)
-            span.set_data("Result Size", len(group_ids))
-        metrics.timing("snuba.search.num_candidates", len(group_ids))
+        # Later pages of a search reuse the candidates and the Snuba results
+        # that earlier pages gathered, see `get_candidate_cache_key`.
+        cache_ttl = options.get("snuba.search.candidate-cache-ttl")
+        cache_key = None
+        cached = None
+        if cache_ttl:
+            cache_key = self.get_candidate_cache_key(
+                projects,
+                environments,
+                sort_by,
+                search_filters,
+                retention_window_start and (now - retention_window_start),
+                date_from,
+                date_to,
+                max_candidates,
+                limit,
+                cache_ttl,
+            )
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            metrics.incr(
+                "snuba.search.candidate_cache.hit"
+                if cached is not None
+                else "snuba.search.candidate_cache.miss"
+            )
+
+        if cached is not None:
+            group_ids = cached["group_ids"]
+        else:
+            with sentry_sdk.start_span(op="snuba_group_query") as span:
+                group_ids = list(group_queryset.values_list("id", flat=True)[: max_candidates + 1])
+                span.set_data("Max Candidates", max_candidates)
+                span.set_data("Result Size", len(group_ids))
+            metrics.timing("snuba.search.num_candidates", len(group_ids))
+            if cache_key is not None:
+                cached = {"group_ids": group_ids, "results": None}
+                cache.set(cache_key, cached, cache_ttl)
 
         too_many_candidates = False
         if not group_ids:
@@ -415,29 +448,52 @@ class PostgresSnubaQueryExecutor(AbstractQueryExecutor):
         chunk_limit = limit
         offset = 0
         num_chunks = 0
-        hits = self.calculate_hits(
-            group_ids,
-            too_many_candidates,
-            sort_field,
-            projects,
-            retention_window_start,
-            group_queryset,
-            environments,
-            sort_by,
-            limit,
-            cursor,
-            count_hits,
-            paginator_options,
-            search_filters,
-            start,
-            end,
-        )
+        if count_hits and cached is not None and cached.get("hits") is not None:
+            hits = cached["hits"]
+        else:
+            hits = self.calculate_hits(
+                group_ids,
+                too_many_candidates,
+                sort_field,
+                projects,
+                retention_window_start,
+                group_queryset,
+                environments,
+                sort_by,
+                limit,
+                cursor,
+                count_hits,
+                paginator_options,
+                search_filters,
+                start,
+                end,
+            )
         if count_hits and hits == 0:
             return self.empty_result
 
         paginator_results = self.empty_result
         result_groups = []
         result_group_ids = set()
+        # Without a cache the chunks are filtered by the cursor. With one they
+        # are read from the start of the sort order, so that they extend the
+        # cached results and the paginator applies the cursor.
+        snuba_cursor = cursor
+        done = False
+
+        if cached is not None and (cached["results"] is not None or cursor is None):
+            snuba_cursor = None
+        if cached is not None and cached["results"] is not None:
+            result_groups = [(group_id, score) for group_id, score in cached["results"]]
+            result_group_ids = {group_id for group_id, _ in result_groups}
+            offset = cached["offset"]
+            chunk_limit = cached["chunk_limit"]
+            # With candidates the cached results are complete.
+            more_results = cached["more_results"] and not group_ids
+            paginator_results = SequencePaginator(
+                [(score, id) for (id, score) in result_groups], reverse=True, **paginator_options
+            ).get_result(limit, cursor, known_hits=hits, max_hits=max_hits)
+            done = group_ids or len(paginator_results.results) >= limit or not more_results
+            metrics.incr("snuba.search.candidate_cache.chunks_saved", amount=cached["num_chunks"])
 
         max_time = options.get("snuba.search.max-total-chunk-time-seconds")
         time_start = time.time()
@@ -448,7 +504,7 @@ class PostgresSnubaQueryExecutor(AbstractQueryExecutor):
         # sorted by `last_seen`, and we want to avoid returning all of
         # a project's groups and then post-sorting them all in Postgres
         # when typically the first N results will do.
-        while (time.time() - time_start) < max_time:
+        while not done and (time.time() - time_start) < max_time:
             num_chunks += 1
 
             # grow the chunk size on each iteration to account for huge projects
@@ -464,7 +520,7 @@ class PostgresSnubaQueryExecutor(AbstractQueryExecutor):
                 project_ids=[p.id for p in projects],
                 environment_ids=environments and [environment.id for environment in environments],
                 sort_field=sort_field,
-                cursor=cursor,
+                cursor=snuba_cursor,
                 group_ids=group_ids,
                 limit=chunk_limit,
                 offset=offset,
@@ -541,11 +597,74 @@ class PostgresSnubaQueryExecutor(AbstractQueryExecutor):
 
         metrics.timing("snuba.search.num_chunks", num_chunks)
 
+        if cache_key is not None and snuba_cursor is None and num_chunks:
+            cached.update(
+                results=result_groups,
+                offset=offset,
+                chunk_limit=chunk_limit,
+                more_results=more_results,
+                num_chunks=(cached.get("num_chunks") or 0) + num_chunks,
+                hits=hits,
+            )
+            cache.set(cache_key, cached, cache_ttl)
+
         groups = Group.objects.in_bulk(paginator_results.results)
         paginator_results.results = [groups[k] for k in paginator_results.results if k in groups]
 
         return paginator_results
 
+    def get_candidate_cache_key(
+        self,
+        projects,
+        environments,
+        sort_by,
+        search_filters,
+        retention,
+        date_from,
+        date_to,
+        max_candidates,
+        limit,
+        cache_ttl,
+    ):
+        """
+        Returns the cache key of the candidates and results of a search.
+
+        The key is built from the normalized inputs of the search rather than
+        from the group queryset or the computed time window, which move with
+        the current time, so that all pages of a search share it. Dates are
+        quantized to the cache TTL and the retention to days. The limit is part
+        of the key because the cached `more_results` depends on it.
+        """
+
+        def serialize(value):
+            if isinstance(value, datetime):
+                return str(int(value.timestamp()) // cache_ttl)
+            return str(value)
+
+        hashable = "\n".join(
+            [
+                ",".join(sorted(str(p.id) for p in projects)),
+                ",".join(sorted(str(e.id) for e in environments or ())),
+                sort_by,
+                *sorted(
+                    "".join(
+                        (
+                            search_filter.key.name,
+                            search_filter.operator,
+                            serialize(search_filter.value.raw_value),
+                        )
+                    )
+                    for search_filter in search_filters or ()
+                ),
+                str(retention and round(retention.total_seconds() / 86400)),
+                serialize(date_from),
+                serialize(date_to),
+                str(max_candidates),
+                str(limit),
+            ]
+        )
+        return f"search:candidates:{md5(hashable.encode('utf-8')).hexdigest()}"
+
     def calculate_hits(
         self,
         group_ids,
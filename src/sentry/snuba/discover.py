@@ -134,6 +134,37 @@ def transform_meta(results, function_alias_map):
     return meta
 
 
+def transform_row(row, translated_columns):
+    transformed = {}
+    for key, value in row.items():
+        if isinstance(value, float) and math.isnan(value):
+            value = 0
+        transformed[translated_columns.get(key, key)] = value
+
+    return transformed
+
+
+def transform_result_stream(stream, translated_columns):
+    """
+    Streaming counterpart of `transform_results` for a `SnubaResultStream`.
+
+    The rows of the returned `data` iterator are transformed as they are read.
+    There is no `meta`: snuba does not guarantee to send it ahead of the rows,
+    so it is only known once all rows have been read. Timeseries are not
+    supported either since they need all rows to be zerofilled.
+    """
+    if not len(translated_columns):
+        return {"data": stream}
+
+    def iter_data():
+        # Closing the iterator closes the stream.
+        with stream:
+            for row in stream:
+                yield transform_row(row, translated_columns)
+
+    return {"data": iter_data()}
+
+
 def transform_data(result, translated_columns, snuba_filter, selected_columns=None):
     """
     Transform internal names back to the public schema ones.
@@ -148,17 +179,8 @@ def transform_data(result, translated_columns, snuba_filter, selected_columns=No
         # Translate back column names that were converted to snuba format
         col["name"] = translated_columns.get(col["name"], col["name"])
 
-    def get_row(row):
-        transformed = {}
-        for key, value in row.items():
-            if isinstance(value, float) and math.isnan(value):
-                value = 0
-            transformed[translated_columns.get(key, key)] = value
-
-        return transformed
-
     if len(translated_columns):
-        result["data"] = [get_row(row) for row in result["data"]]
+        result["data"] = [transform_row(row, translated_columns) for row in result["data"]]
 
     rollup = snuba_filter.rollup
     if rollup and rollup > 0:
@@ -186,6 +208,7 @@ def query(
     use_aggregate_conditions=False,
     conditions=None,
     functions_acl=None,
+    stream=False,
 ):
     """
     High-level API for doing arbitrary user queries against events.
@@ -210,6 +233,9 @@ def query(
     use_aggregate_conditions (bool) Set to true if aggregates conditions should be used at all.
     conditions (Sequence[any]) List of conditions that are passed directly to snuba without
                     any additional processing.
+    stream (bool) Set to true to get `data` as an iterator whose rows are decoded from the
+                    snuba response as they are read, see `SnubaResultStream`. The result
+                    has no `meta` then.
     """
     if not selected_columns:
         raise InvalidSearchQuery("No columns selected")
@@ -311,8 +337,12 @@ def query(
             limit=limit,
             offset=offset,
             referrer=referrer,
+            **({"stream": True} if stream else {}),
         )
 
+    if stream:
+        return transform_result_stream(result, translated_columns)
+
     with sentry_sdk.start_span(
         op="discover.discover", description="query.transform_results"
     ) as span:
@@ -81,7 +81,7 @@ from sentry.utils.compat import mock
 from sentry.utils.compat.mock import patch
 from sentry.utils.pytest.selenium import Browser
 from sentry.utils.retries import TimedRetryPolicy
-from sentry.utils.snuba import _snuba_pool
+from sentry.utils.snuba import _snuba_pool, clear_local_query_cache
 
 from . import assert_status_code
 from .factories import Factories
@@ -233,6 +233,7 @@ class BaseTestCase(Fixtures, Exam):
         super()._pre_setup()
 
         cache.clear()
+        clear_local_query_cache()
         ProjectOption.objects.clear_local_cache()
         GroupMeta.objects.clear_local_cache()
 
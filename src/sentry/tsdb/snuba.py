@@ -251,6 +251,42 @@ class SnubaTSDB(BaseTSDB):
         `group_on_time`: whether to add a GROUP BY clause on the 'time' field.
         `group_on_model`: whether to add a GROUP BY clause on the primary model.
         """
+        query_kwargs, finish = self._get_data_query(
+            model,
+            keys,
+            start,
+            end,
+            rollup,
+            environment_ids,
+            aggregation,
+            group_on_model,
+            group_on_time,
+            conditions,
+        )
+        if query_kwargs is not None:
+            result = snuba.query(use_cache=use_cache, **query_kwargs)
+        else:
+            result = {}
+        return finish(result)
+
+    def _get_data_query(
+        self,
+        model,
+        keys,
+        start,
+        end,
+        rollup,
+        environment_ids,
+        aggregation,
+        group_on_model,
+        group_on_time,
+        conditions,
+    ):
+        """
+        Returns the `snuba.query` keyword arguments of a `get_data` query, or
+        `None` when there is nothing to query, along with the function turning
+        the nested query result into what `get_data` returns.
+        """
         # XXX: to counteract the hack in project_key_stats.py
         if model in [
             TSDBModel.key_total_received,
@@ -311,7 +347,7 @@ class SnubaTSDB(BaseTSDB):
             orderby.append(model_group)
 
         if keys:
-            result = snuba.query(
+            query_kwargs = dict(
                 dataset=model_query_settings.dataset,
                 start=start,
                 end=end,
@@ -324,18 +360,18 @@ class SnubaTSDB(BaseTSDB):
                 orderby=orderby,
                 referrer=f"tsdb-modelid:{model.value}",
                 is_grouprelease=(model == TSDBModel.frequent_releases_by_group),
-                use_cache=use_cache,
             )
         else:
-            result = {}
+            query_kwargs = None
 
-        if group_on_time:
-            keys_map["time"] = series
+        zerofill_keys = dict(keys_map, time=series) if group_on_time else keys_map
 
-        self.zerofill(result, groupby, keys_map)
-        self.trim(result, groupby, keys)
+        def finish(result):
+            self.zerofill(result, groupby, zerofill_keys)
+            self.trim(result, groupby, keys)
+            return result
 
-        return result
+        return query_kwargs, finish
 
     def zerofill(self, result, groups, flat_keys):
         """
@@ -385,6 +421,36 @@ class SnubaTSDB(BaseTSDB):
         conditions=None,
         use_cache=False,
     ):
+        query_kwargs, process = self._get_range_query(
+            model, keys, start, end, rollup, environment_ids, conditions
+        )
+        body = None
+        if query_kwargs is not None:
+            try:
+                body = snuba.raw_query(use_cache=use_cache, **query_kwargs)
+            except (snuba.QueryOutsideRetentionError, snuba.QueryOutsideGroupActivityError):
+                pass
+        return process(body)
+
+    def get_range_query(
+        self, model, keys, start, end, rollup=None, environment_ids=None, conditions=None
+    ):
+        """
+        Deferred form of `get_range` for callers batching their queries through
+        `snuba.bulk_raw_query`. Returns the `SnubaQueryParams` keyword arguments
+        of the query, or `None` when there is nothing to query, along with the
+        function turning the raw query result into what `get_range` returns.
+        The function is called with `None` when the query was not sent.
+        """
+        query_kwargs, process = self._get_range_query(
+            model, keys, start, end, rollup, environment_ids, conditions
+        )
+        if query_kwargs is not None:
+            # Batched queries are sent with the referrer of the batch.
+            query_kwargs.pop("referrer")
+        return query_kwargs, process
+
+    def _get_range_query(self, model, keys, start, end, rollup, environment_ids, conditions):
         # 10s is the only rollup under an hour that we support
         if rollup and rollup == 10 and model in self.lower_rollup_query_settings:
             model_query_settings = self.lower_rollup_query_settings.get(model)
@@ -398,7 +464,7 @@ class SnubaTSDB(BaseTSDB):
         else:
             aggregate_function = "count()"
 
-        result = self.get_data(
+        query_kwargs, finish = self._get_data_query(
             model,
             keys,
             start,
@@ -406,15 +472,26 @@ class SnubaTSDB(BaseTSDB):
             rollup,
             environment_ids,
             aggregation=aggregate_function,
+            group_on_model=True,
             group_on_time=True,
             conditions=conditions,
-            use_cache=use_cache,
         )
-        # convert
-        #    {group:{timestamp:count, ...}}
-        # into
-        #    {group: [(timestamp, count), ...]}
-        return {k: sorted(result[k].items()) for k in result}
+
+        def process(body):
+            if body is None:
+                result = collections.OrderedDict()
+            else:
+                result = snuba.nest_query_result(
+                    body, query_kwargs["groupby"], query_kwargs["aggregations"], []
+                )
+            result = finish(result)
+            # convert
+            #    {group:{timestamp:count, ...}}
+            # into
+            #    {group: [(timestamp, count), ...]}
+            return {k: sorted(result[k].items()) for k in result}
+
+        return query_kwargs, process
 
     def get_distinct_counts_series(
         self, model, keys, start, end=None, rollup=None, environment_id=None
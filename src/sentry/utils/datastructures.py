@@ -1,4 +1,5 @@
-from collections import Hashable, MutableMapping
+import threading
+from collections import Hashable, MutableMapping, OrderedDict
 
 __unset__ = object()
 
@@ -59,3 +60,62 @@ class BidirectionalMapping(MutableMapping):
 
     def inverse(self):
         return self.__inverse.copy()
+
+
+class LRUCache(MutableMapping):
+    """\
+    A mapping that holds at most ``maxsize`` items.
+
+    Reading or writing an item marks it as the most recently used one and the
+    least recently used item is evicted once the mapping grows past its size.
+    All operations are thread safe so that instances can be shared across a
+    process.
+
+    When ``getsize`` is given, ``maxsize`` bounds the sum of ``getsize(value)``
+    over all values instead of their number, and ``currsize`` holds that sum.
+    A value larger than ``maxsize`` is not stored at all.
+    """
+
+    def __init__(self, maxsize, getsize=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.getsize = getsize
+        self.currsize = 0
+        self.__data = OrderedDict()
+        self.__sizes = {}
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self.__lock:
+            value = self.__data[key]
+            self.__data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        size = self.getsize(value) if self.getsize is not None else 1
+        with self.__lock:
+            if size > self.maxsize:
+                if key in self.__data:
+                    del self.__data[key]
+                    self.currsize -= self.__sizes.pop(key)
+                return
+            self.currsize += size - self.__sizes.get(key, 0)
+            self.__data[key] = value
+            self.__sizes[key] = size
+            self.__data.move_to_end(key)
+            while self.currsize > self.maxsize:
+                evicted, _ = self.__data.popitem(last=False)
+                self.currsize -= self.__sizes.pop(evicted)
+
+    def __delitem__(self, key):
+        with self.__lock:
+            del self.__data[key]
+            self.currsize -= self.__sizes.pop(key)
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(list(self.__data))
+
+    def __len__(self):
+        return len(self.__data)
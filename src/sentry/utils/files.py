@@ -1,10 +1,16 @@
 import zlib
 
 from sentry import features, options
-from sentry.models import MAX_FILE_SIZE
+from sentry.models import MAX_FILE_SIZE, MappedFile
 
 
 def compress_file(fp, level=6):
+    if isinstance(fp, MappedFile):
+        # Memory mapped files are compressed straight from the map. Callers
+        # keep the body after the file is closed, so it is still copied.
+        with fp.buffer as buffer:
+            return zlib.compress(buffer, level), bytes(buffer)
+
     compressor = zlib.compressobj(level)
     z_chunks = []
     chunks = []
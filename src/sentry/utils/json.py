@@ -8,7 +8,7 @@ import datetime
 import decimal
 import uuid
 from enum import Enum
-from typing import Any
+from typing import Any, Container, Iterable, Iterator, Tuple
 
 from django.utils.encoding import force_text
 from django.utils.functional import Promise
@@ -108,6 +108,88 @@ def loads(value: str, **kwargs) -> JSONData:
     return _default_decoder.decode(value)
 
 
+class _ChunkReader:
+    def __init__(self, chunks: Iterable[str]):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        # Drop whatever has been decoded already so the buffer stays small.
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise JSONDecodeError("Unexpected end of data", self.buffer, self.pos)
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise JSONDecodeError(f"Expecting one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self) -> JSONData:
+        self.peek()
+        while True:
+            try:
+                value, end = _default_decoder.raw_decode(self.buffer, self.pos)
+            except JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iterload_object(
+    chunks: Iterable[str], stream_keys: Container[str] = ()
+) -> Iterator[Tuple[str, JSONData]]:
+    """
+    Incrementally decodes a JSON object from an iterable of text chunks.
+
+    Yields ``(key, value)`` for every member of the object as soon as it has
+    been read. Members whose key is in ``stream_keys`` must hold arrays and are
+    yielded item by item as ``(key, item)`` instead, so that only one item of
+    them is held in memory at a time.
+    """
+    reader = _ChunkReader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key in stream_keys:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield key, reader.value()
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            yield key, reader.value()
+
+        if reader.expect(",}") == "}":
+            return
+
+
 def dumps_htmlsafe(value):
     return mark_safe(_default_escaped_encoder.encode(value))
 
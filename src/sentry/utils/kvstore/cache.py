@@ -1,5 +1,5 @@
 from datetime import timedelta
-from typing import Any, Optional
+from typing import Any, Optional, Sequence, Tuple
 
 from sentry.cache.base import BaseCache
 from sentry.utils.kvstore.abstract import KVStorage
@@ -32,6 +32,11 @@ class CacheKVStorage(KVStorage[Any, Any]):
     def set(self, key: Any, value: Any, ttl: Optional[timedelta] = None) -> None:
         self.backend.set(key, value, timeout=int(ttl.total_seconds()) if ttl is not None else None)
 
+    def set_many(self, items: Sequence[Tuple[Any, Any]], ttl: Optional[timedelta] = None) -> None:
+        self.backend.set_many(
+            dict(items), timeout=int(ttl.total_seconds()) if ttl is not None else None
+        )
+
     def delete(self, key: Any) -> None:
         self.backend.delete(key)
 
@@ -34,6 +34,13 @@ class KVStorageCodecWrapper(KVStorage[K, TDecoded]):
     def set(self, key: K, value: TDecoded, ttl: Optional[timedelta] = None) -> None:
         return self.store.set(key, self.value_codec.encode(value), ttl)
 
+    def set_many(
+        self, items: Sequence[Tuple[K, TDecoded]], ttl: Optional[timedelta] = None
+    ) -> None:
+        return self.store.set_many(
+            [(key, self.value_codec.encode(value)) for key, value in items], ttl
+        )
+
     def delete(self, key: K) -> None:
         return self.store.delete(key)
 
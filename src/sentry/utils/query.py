@@ -1,7 +1,11 @@
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full, Queue
 
 import progressbar
 from django.db import connections, router
+from django.db.models import Max, Min
 
 from sentry import eventstore
 
@@ -150,6 +154,180 @@ class RangeQuerySetWrapper:
             has_results = num > start
 
 
+class ShardedRangeQuerySetWrapper:
+    """
+    Iterates through a queryset like ``RangeQuerySetWrapper``, but splits the
+    primary key range into ``shards`` disjoint ranges which are walked
+    concurrently by up to ``workers`` threads, each on its own connection.
+    Every shard fetches its next chunk while the caller handles the current
+    one.
+
+    Shards are split evenly between the smallest and largest primary key, or
+    at the quantiles of a ``sample_size`` rows sample of the table (postgres
+    only) when the keys are unevenly distributed. ``boundaries`` can also be
+    given explicitly.
+
+    Results are yielded in no particular order. ``callbacks`` are called with
+    every chunk, in the calling thread, before its results are yielded.
+
+    ``checkpoint`` is the progress made so far, and can be passed back to
+    resume an interrupted iteration: every result that was already yielded
+    is skipped, including the one being handled when the iteration stopped.
+
+    Since results are fetched in other threads, they will not see rows
+    written by the calling thread in a transaction that is not committed.
+    """
+
+    def __init__(
+        self,
+        queryset,
+        step=1000,
+        shards=4,
+        workers=None,
+        limit=None,
+        sample_size=None,
+        boundaries=None,
+        checkpoint=None,
+        callbacks=(),
+    ):
+        if (
+            queryset.query.low_mark
+            or queryset.query.high_mark
+            or queryset.query.order_by
+            or queryset.query.extra_order_by
+        ):
+            raise InvalidQuerySetError
+
+        self.queryset = queryset
+        self.step = step
+        self.shards = shards
+        self.workers = workers or shards
+        self.limit = limit
+        self.sample_size = sample_size
+        self.boundaries = boundaries
+        self.callbacks = callbacks
+        self._ranges = checkpoint["ranges"] if checkpoint is not None else None
+
+    @property
+    def checkpoint(self):
+        if self._ranges is None:
+            return None
+        return {"ranges": [list(r) for r in self._ranges]}
+
+    def _get_ranges(self):
+        pk_name = self.queryset.model._meta.pk.name
+        bounds = self.queryset.aggregate(min=Min(pk_name), max=Max(pk_name))
+        if bounds["min"] is None:
+            return []
+        low, high = bounds["min"], bounds["max"] + 1
+
+        if self.boundaries is not None:
+            boundaries = self.boundaries
+        elif self.sample_size:
+            boundaries = self._sample_boundaries()
+        else:
+            size = (high - low) / self.shards
+            boundaries = [low + int(size * i) for i in range(1, self.shards)]
+
+        points = [low] + sorted({b for b in boundaries if low < b < high}) + [high]
+        # [start, end, last handled key]
+        return [[start, end, None] for start, end in zip(points, points[1:])]
+
+    def _sample_boundaries(self):
+        model = self.queryset.model
+        connection = connections[self.queryset.db]
+        quote_name = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+        estimate = max(row[0] if row else 0, 1)
+        cursor.execute(
+            "SELECT %s FROM %s TABLESAMPLE SYSTEM (%%s)"
+            % (quote_name(model._meta.pk.column), quote_name(model._meta.db_table)),
+            [min(100.0, 100.0 * self.sample_size / estimate)],
+        )
+        sample = sorted(r[0] for r in cursor.fetchall())
+        if not sample:
+            return []
+        return [sample[len(sample) * i // self.shards] for i in range(1, self.shards)]
+
+    def _fetch_shard(self, index, start, end, cursor, results, stopped):
+        pk_name = self.queryset.model._meta.pk.name
+        queryset = self.queryset.order_by(pk_name).filter(**{f"{pk_name}__lt": end})
+        try:
+            while not stopped.is_set():
+                if cursor is None:
+                    chunk = queryset.filter(**{f"{pk_name}__gte": start})
+                else:
+                    chunk = queryset.filter(**{f"{pk_name}__gt": cursor})
+                chunk = list(chunk[: self.step])
+                if chunk:
+                    # Bind the keys now, the caller may delete the results.
+                    keys = [result.pk for result in chunk]
+                    cursor = keys[-1]
+                    self._put(results, stopped, (index, chunk, keys))
+                if len(chunk) < self.step:
+                    break
+            self._put(results, stopped, (index, None, None))
+        except Exception as e:
+            self._put(results, stopped, (index, e, None))
+        finally:
+            connections.close_all()
+
+    def _put(self, results, stopped, item):
+        while not stopped.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def __iter__(self):
+        if self._ranges is None:
+            self._ranges = self._get_ranges()
+
+        pending = [i for i, (_, end, cursor) in enumerate(self._ranges) if cursor != end - 1]
+        if not pending:
+            return
+
+        num = 0
+        # Every shard can have one chunk waiting while the caller handles another.
+        results = Queue(maxsize=len(pending))
+        stopped = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(self.workers, len(pending)))
+        try:
+            for index in pending:
+                start, end, cursor = self._ranges[index]
+                executor.submit(self._fetch_shard, index, start, end, cursor, results, stopped)
+
+            while pending:
+                index, chunk, keys = results.get()
+                if chunk is None:
+                    pending.remove(index)
+                    # mark the shard as done for the checkpoint
+                    self._ranges[index][2] = self._ranges[index][1] - 1
+                    continue
+                elif isinstance(chunk, Exception):
+                    raise chunk
+
+                for cb in self.callbacks:
+                    cb(chunk)
+
+                for result, key in zip(chunk, keys):
+                    if self.limit and num >= self.limit:
+                        return
+                    num += 1
+                    # Recorded before yielding, so a result whose handling
+                    # was interrupted is not yielded again when resuming.
+                    self._ranges[index][2] = key
+                    yield result
+        finally:
+            stopped.set()
+            executor.shutdown(wait=True)
+
+
 class RangeQuerySetWrapperWithProgressBar(RangeQuerySetWrapper):
     def __iter__(self):
         total_count = self.queryset.count()
@@ -23,24 +23,29 @@ def for_organization_member_invite(organization, email, user=None, auth=None, co
     if not features.has("organizations:invite-members-rate-limits", organization, actor=user):
         return False
 
-    limits = (
-        ratelimiter.is_limited(
-            "members:invite-by-user:{}".format(
-                md5_text(user.id if user and user.is_authenticated() else str(auth)).hexdigest()
-            ),
-            **config["members:invite-by-user"],
+    keys = []
+    if user or auth:
+        keys.append(
+            (
+                "members:invite-by-user:{}".format(
+                    md5_text(user.id if user and user.is_authenticated() else str(auth)).hexdigest()
+                ),
+                "members:invite-by-user",
+            )
         )
-        if (user or auth)
-        else None,
-        ratelimiter.is_limited(
-            f"members:invite-by-org:{md5_text(organization.id).hexdigest()}",
-            **config["members:invite-by-org"],
-        ),
-        ratelimiter.is_limited(
+    keys.append(
+        (f"members:invite-by-org:{md5_text(organization.id).hexdigest()}", "members:invite-by-org")
+    )
+    keys.append(
+        (
             "members:org-invite-to-email:{}-{}".format(
                 organization.id, md5_text(email.lower()).hexdigest()
             ),
-            **config["members:org-invite-to-email"],
-        ),
+            "members:org-invite-to-email",
+        )
+    )
+
+    results = ratelimiter.is_limited_many(
+        [(key, config[name]["limit"], config[name]["window"]) for key, name in keys]
     )
-    return any(limits)
+    return any(result.is_limited for result in results)
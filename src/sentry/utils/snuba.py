@@ -1,16 +1,32 @@
+import asyncio
+import codecs
 import functools
 import logging
 import os
 import re
+import threading
 import time
 from collections import OrderedDict, namedtuple
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime, timedelta
 from hashlib import sha1
 from operator import itemgetter
-from typing import Any, Callable, List, Mapping, MutableMapping, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib.parse import urlparse
 
 import pytz
@@ -38,7 +54,9 @@ from sentry.snuba.dataset import Dataset
 from sentry.snuba.events import Columns
 from sentry.utils import json, metrics
 from sentry.utils.compat import map
+from sentry.utils.datastructures import LRUCache
 from sentry.utils.dates import outside_retention_with_modified_start, to_timestamp
+from sentry.utils.locking import UnableToAcquireLock
 from sentry.utils.snql import should_use_snql
 
 logger = logging.getLogger(__name__)
@@ -318,9 +336,157 @@ _snuba_pool = connection_from_url(
         method_whitelist={"GET", "POST", "DELETE"},
     ),
     timeout=settings.SENTRY_SNUBA_TIMEOUT,
-    maxsize=10,
+    maxsize=settings.SENTRY_SNUBA_POOL_SIZE,
 )
-_query_thread_pool = ThreadPoolExecutor(max_workers=10)
+
+
+class SnubaQueryPool:
+    """
+    Runs snuba queries on a bounded set of worker threads.
+
+    Queries of referrers listed in `SENTRY_SNUBA_REFERRER_CONCURRENCY` are
+    limited to that many at a time in the process, submitting more blocks the
+    caller until one of them finished. The pool reports how many queries are
+    pending (more than `max_workers` means they queue), how long they waited
+    for a worker and for their referrer, and how many requests reused a
+    connection of `_snuba_pool`.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._referrer_semaphores: MutableMapping[str, threading.BoundedSemaphore] = {}
+        self._connections = self._requests = 0
+
+    def _get_referrer_semaphore(self, referrer: Optional[str]) -> Optional[threading.Semaphore]:
+        limit = settings.SENTRY_SNUBA_REFERRER_CONCURRENCY.get(referrer)
+        if not limit:
+            return None
+        with self._lock:
+            semaphore = self._referrer_semaphores.get(referrer)
+            if semaphore is None:
+                semaphore = self._referrer_semaphores[referrer] = threading.BoundedSemaphore(limit)
+            return semaphore
+
+    def _record_connection_usage(self) -> None:
+        with self._lock:
+            connections = _snuba_pool.num_connections - self._connections
+            requests = _snuba_pool.num_requests - self._requests
+            self._connections += connections
+            self._requests += requests
+        if requests:
+            metrics.incr("snuba.pool.requests", amount=requests)
+        if connections:
+            metrics.incr("snuba.pool.new_connections", amount=connections)
+
+    def _wrap(self, fn, args, referrer, semaphore):
+        tags = {"referrer": referrer or "<unknown>"}
+        with self._lock:
+            self._pending += 1
+            pending = self._pending
+        metrics.timing("snuba.query_pool.pending", pending, tags=tags)
+        submitted = time.monotonic()
+
+        def run():
+            metrics.timing("snuba.query_pool.queue_wait", time.monotonic() - submitted, tags=tags)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                if semaphore is not None:
+                    semaphore.release()
+                self._record_connection_usage()
+
+        return run
+
+    def _acquire(self, semaphore: threading.Semaphore, referrer: Optional[str]) -> None:
+        if not semaphore.acquire(blocking=False):
+            with metrics.timer("snuba.query_pool.referrer_wait", tags={"referrer": referrer}):
+                semaphore.acquire()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, referrer: Optional[str] = None) -> Future:
+        semaphore = self._get_referrer_semaphore(referrer)
+        if semaphore is not None:
+            self._acquire(semaphore, referrer)
+        return self._executor.submit(self._wrap(fn, args, referrer, semaphore))
+
+    def map(
+        self, fn: Callable[[Any], Any], iterable: Iterable[Any], referrer: Optional[str] = None
+    ) -> List[Any]:
+        items = list(iterable)
+        if len(items) == 1:
+            # No need to submit to a worker if we're just performing a single query
+            semaphore = self._get_referrer_semaphore(referrer)
+            if semaphore is not None:
+                self._acquire(semaphore, referrer)
+            return [self._wrap(fn, items, referrer, semaphore)()]
+
+        futures = [self.submit(fn, item, referrer=referrer) for item in items]
+        return [future.result() for future in futures]
+
+    async def submit_async(
+        self, fn: Callable[..., Any], *args: Any, referrer: Optional[str] = None
+    ) -> Any:
+        """
+        Runs `fn` on a worker without blocking the event loop, including while
+        waiting for the concurrency limit of the referrer.
+        """
+        loop = asyncio.get_event_loop()
+        semaphore = self._get_referrer_semaphore(referrer)
+        if semaphore is not None and not semaphore.acquire(blocking=False):
+            with metrics.timer("snuba.query_pool.referrer_wait", tags={"referrer": referrer}):
+                await self._acquire_async(loop, semaphore)
+        future = self._executor.submit(self._wrap(fn, args, referrer, semaphore))
+        # A query that was cancelled before it started would never release its
+        # permit, so cancelling the caller lets it run to completion instead.
+        return await asyncio.shield(asyncio.wrap_future(future, loop=loop))
+
+    async def _acquire_async(
+        self, loop: asyncio.AbstractEventLoop, semaphore: threading.Semaphore
+    ) -> None:
+        # The blocking acquire cannot be interrupted, so a permit it obtains
+        # after the caller was cancelled is handed back right away.
+        lock = threading.Lock()
+        cancelled = acquired = False
+
+        def acquire() -> None:
+            nonlocal acquired
+            semaphore.acquire()
+            with lock:
+                if cancelled:
+                    semaphore.release()
+                else:
+                    acquired = True
+
+        try:
+            await loop.run_in_executor(None, acquire)
+        except asyncio.CancelledError:
+            with lock:
+                cancelled = True
+                if acquired:
+                    semaphore.release()
+            raise
+
+
+_query_pool = SnubaQueryPool(max_workers=settings.SENTRY_SNUBA_QUERY_WORKERS)
+
+# Process local tier of the query cache, see `_apply_cache_and_build_results`. Values are
+# `(expires_at, serialized_result)` so that every hit hands out its own copy of the result.
+_local_query_cache = LRUCache(settings.SENTRY_SNUBA_LOCAL_CACHE_SIZE)
+
+# Cache keys of the cached queries running in this process, mapped to an event that is set
+# once the query finished. Other threads asking for the same query wait on it.
+_in_flight_queries: MutableMapping[str, threading.Event] = {}
+_in_flight_lock = threading.Lock()
+
+# Number of bytes read from the connection at a time by streamed results.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# How often processes waiting on a query run by another process check the shared cache.
+COALESCE_POLL_INTERVAL = 0.05
 
 
 epoch_naive = datetime(1970, 1, 1, tzinfo=None)
@@ -624,11 +790,15 @@ def raw_query(
     is_grouprelease=False,
     use_cache=False,
     use_snql=None,
+    stream=False,
     **kwargs,
-) -> Mapping[str, Any]:
+) -> Union[Mapping[str, Any], "SnubaResultStream"]:
     """
     Sends a query to snuba.  See `SnubaQueryParams` docstring for param
     descriptions.
+
+    With `stream` the result is returned as a `SnubaResultStream` that decodes
+    its rows while they are iterated. Streamed results are never cached.
     """
     snuba_params = SnubaQueryParams(
         dataset=dataset,
@@ -647,7 +817,7 @@ def raw_query(
         use_snql = should_use_snql(referrer)
 
     return bulk_raw_query(
-        [snuba_params], referrer=referrer, use_cache=use_cache, use_snql=use_snql
+        [snuba_params], referrer=referrer, use_cache=use_cache, use_snql=use_snql, stream=stream
     )[0]
 
 
@@ -680,16 +850,163 @@ def get_cache_key(query: SnubaQuery) -> str:
     return f"sqc:{sha1(hashable.encode('utf-8')).hexdigest()}"
 
 
+def get_quantized_cache_key(query_params: SnubaQueryBody, duration: int) -> str:
+    """
+    Returns the cache key of a query with its time window quantized by `quantize_time`.
+
+    Queries relative to the current time move `from_date` and `to_date` forward on every
+    request, so the dates are replaced by the length of the window and its quantized end.
+    Identical queries share a key for up to `duration` seconds, and the jitter derived from the
+    rest of the query spreads the expiry of different queries. SnQL queries are keyed as is.
+    """
+    query = query_params[0]
+    if isinstance(query, Query) or not query.get("from_date") or not query.get("to_date"):
+        return get_cache_key(query_params)
+
+    undated = {k: v for k, v in query.items() if k not in ("from_date", "to_date")}
+    key = get_cache_key((undated,) + tuple(query_params[1:]))
+    start = parse_datetime(query["from_date"])
+    end = parse_datetime(query["to_date"])
+    window = round((end - start).total_seconds())
+    quantized_end = quantize_time(end, int(key[4:], 16), duration)
+    return f"{key}:{window}:{duration}@{quantized_end.isoformat()}"
+
+
+def clear_local_query_cache() -> None:
+    _local_query_cache.clear()
+
+
+def _get_local_cached_result(cache_key: str) -> Optional[str]:
+    try:
+        expires_at, value = _local_query_cache[cache_key]
+    except KeyError:
+        return None
+    if expires_at < time.monotonic():
+        _local_query_cache.pop(cache_key, None)
+        return None
+    return value
+
+
+def _set_cached_result(cache_key: str, value: str) -> None:
+    ttl = settings.SENTRY_SNUBA_CACHE_TTL_SECONDS
+    _local_query_cache[cache_key] = (time.monotonic() + ttl, value)
+    cache.set(cache_key, value, ttl)
+
+
+def _get_cached_results(cache_keys: Sequence[str]) -> Tuple[MutableMapping[str, str], Set[str]]:
+    """
+    Looks up serialized results in the process local tier first and in the shared cache for
+    whatever is missing from it. Results found in the shared cache are copied to the local tier.
+
+    Returns the results by cache key along with the keys that were found locally.
+    """
+    found = {}
+    remote_keys = []
+    for cache_key in cache_keys:
+        value = _get_local_cached_result(cache_key)
+        if value is None:
+            remote_keys.append(cache_key)
+        else:
+            found[cache_key] = value
+    local_keys = set(found)
+
+    if remote_keys:
+        expires_at = time.monotonic() + settings.SENTRY_SNUBA_CACHE_TTL_SECONDS
+        for cache_key, value in cache.get_many(remote_keys).items():
+            if value is not None:
+                _local_query_cache[cache_key] = (expires_at, value)
+                found[cache_key] = value
+
+    return found, local_keys
+
+
+def _wait_for_cached_results(
+    waiting: Sequence[Tuple[int, SnubaQueryBody, str, Optional[threading.Event]]],
+    metric_tags: Optional[Mapping[str, str]],
+) -> Tuple[List[Tuple[int, Any]], List[Tuple[int, SnubaQueryBody, str]]]:
+    """
+    Waits for the results of queries that another thread or process is running.
+
+    Queries coalesced in this process wait for the event of the thread running them, queries
+    coalesced across processes poll the shared cache. Queries whose result does not show up
+    within `SENTRY_SNUBA_CACHE_COALESCE_TIMEOUT` seconds, or whose leading thread finished
+    without one, are returned to be run by the caller.
+    """
+    deadline = time.monotonic() + settings.SENTRY_SNUBA_CACHE_COALESCE_TIMEOUT
+    results = []
+    give_up = []
+    pending = list(waiting)
+    while pending:
+        for _, _, _, event in pending:
+            if event is not None:
+                event.wait(max(deadline - time.monotonic(), 0))
+
+        found, _ = _get_cached_results([cache_key for _, _, cache_key, _ in pending])
+        timed_out = time.monotonic() >= deadline
+        remaining = []
+        for query_pos, query_params, cache_key, event in pending:
+            if cache_key in found:
+                metrics.incr("snuba.query_cache.coalesced", tags=metric_tags)
+                results.append((query_pos, json.loads(found[cache_key])))
+            elif timed_out or (event is not None and event.is_set()):
+                give_up.append((query_pos, query_params, cache_key))
+            else:
+                remaining.append((query_pos, query_params, cache_key, event))
+        pending = remaining
+
+        if pending:
+            time.sleep(COALESCE_POLL_INTERVAL)
+
+    return results, give_up
+
+
+def _finish_flight(cache_key: str, event: threading.Event, lock: Optional[Any]) -> None:
+    if lock is not None:
+        lock.release()
+    with _in_flight_lock:
+        if _in_flight_queries.get(cache_key) is event:
+            del _in_flight_queries[cache_key]
+    event.set()
+
+
 def bulk_raw_query(
     snuba_param_list: Sequence[SnubaQueryParams],
     referrer: Optional[str] = None,
     use_cache: Optional[bool] = False,
     use_snql: Optional[bool] = None,
-) -> ResultSet:
-    params = map(_prepare_query_params, snuba_param_list)
-    return _apply_cache_and_build_results(
-        params, referrer=referrer, use_cache=use_cache, use_snql=use_snql
-    )
+    stream: bool = False,
+    return_exceptions: bool = False,
+) -> Union[ResultSet, List["SnubaResultStream"]]:
+    """
+    Sends a batch of queries to snuba concurrently.
+
+    With `return_exceptions`, a query that cannot be prepared (e.g. because it
+    falls outside of the retention window) does not fail the whole batch: its
+    exception is returned in place of its result.
+    """
+    if not return_exceptions:
+        params = map(_prepare_query_params, snuba_param_list)
+    else:
+        params, errors = [], {}
+        for index, snuba_params in enumerate(snuba_param_list):
+            try:
+                params.append(_prepare_query_params(snuba_params))
+            except Exception as e:
+                errors[index] = e
+    if stream:
+        # The SnQL dry run of legacy queries needs the whole result, streams skip it.
+        results = _stream_snuba_queries(params, {"referer": referrer} if referrer else {})
+    else:
+        results = _apply_cache_and_build_results(
+            params, referrer=referrer, use_cache=use_cache, use_snql=use_snql
+        )
+    if not return_exceptions or not errors:
+        return results
+    results = iter(results)
+    return [
+        errors[index] if index in errors else next(results)
+        for index in range(len(snuba_param_list))
+    ]
 
 
 def _apply_cache_and_build_results(
@@ -705,30 +1022,101 @@ def _apply_cache_and_build_results(
     # Store the original position of the query so that we can maintain the order
     query_param_list = list(enumerate(snuba_param_list))
 
-    results = []
+    if not use_cache:
+        results = _run_queries(
+            [(query_pos, query_params, None) for query_pos, query_params in query_param_list],
+            headers,
+            use_snql,
+        )
+        # Sort so that we get the results back in the original param list order
+        results.sort()
+        # Drop the sort order val
+        return map(itemgetter(1), results)
 
-    if use_cache:
-        cache_keys = [get_cache_key(query_params) for _, query_params in query_param_list]
-        cache_data = cache.get_many(cache_keys)
-        to_query: List[Tuple[int, SnubaQueryBody, Optional[str]]] = []
+    from sentry.app import locks
+
+    results = []
+    metric_tags = {"referrer": referrer} if referrer else None
+    ttl = settings.SENTRY_SNUBA_CACHE_TTL_SECONDS
+    cache_keys = [
+        get_quantized_cache_key(query_params, ttl) for _, query_params in query_param_list
+    ]
+    cache_data, local_keys = _get_cached_results(cache_keys)
+
+    # Identical queries that miss the cache are coalesced: the first thread of the first
+    # process to see a miss runs the query while everybody else waits for its result.
+    to_query: List[Tuple[int, SnubaQueryBody, Optional[str]]] = []
+    waiting: List[Tuple[int, SnubaQueryBody, str, Optional[threading.Event]]] = []
+    # cache key -> (event, lock) of every query this thread leads in this process
+    flights: MutableMapping[str, Tuple[threading.Event, Optional[Any]]] = {}
+    first_positions: MutableMapping[str, int] = {}
+    duplicates: List[Tuple[int, int]] = []
+    try:
         for (query_pos, query_params), cache_key in zip(query_param_list, cache_keys):
             cached_result = cache_data.get(cache_key)
-            metric_tags = {"referrer": referrer} if referrer else None
-            if cached_result is None:
+            if cached_result is not None:
+                metrics.incr(
+                    "snuba.query_cache.hit",
+                    tags={
+                        **(metric_tags or {}),
+                        "tier": "local" if cache_key in local_keys else "shared",
+                    },
+                )
+                results.append((query_pos, json.loads(cached_result)))
+                continue
+
+            if cache_key in first_positions:
+                # The same query appears more than once in this batch.
+                duplicates.append((query_pos, first_positions[cache_key]))
+                continue
+            first_positions[cache_key] = query_pos
+
+            with _in_flight_lock:
+                event = _in_flight_queries.get(cache_key)
+                is_leader = event is None
+                if is_leader:
+                    event = _in_flight_queries[cache_key] = threading.Event()
+            if not is_leader:
+                waiting.append((query_pos, query_params, cache_key, event))
+                continue
+
+            lock = locks.get(
+                f"{cache_key}:lock",
+                duration=settings.SENTRY_SNUBA_CACHE_COALESCE_TIMEOUT,
+                routing_key=cache_key,
+            )
+            try:
+                lock.acquire()
+            except UnableToAcquireLock:
+                # Another process runs this query. Threads of this process keep waiting on
+                # our event while we wait for the result in the shared cache.
+                flights[cache_key] = (event, None)
+                waiting.append((query_pos, query_params, cache_key, None))
+            else:
+                flights[cache_key] = (event, lock)
                 metrics.incr("snuba.query_cache.miss", tags=metric_tags)
                 to_query.append((query_pos, query_params, cache_key))
-            else:
-                metrics.incr("snuba.query_cache.hit", tags=metric_tags)
-                results.append((query_pos, json.loads(cached_result)))
-    else:
-        to_query = [(query_pos, query_params, None) for query_pos, query_params in query_param_list]
 
-    if to_query:
-        query_results = _bulk_snuba_query(map(itemgetter(1), to_query), headers, use_snql)
-        for result, (query_pos, _, cache_key) in zip(query_results, to_query):
-            if cache_key:
-                cache.set(cache_key, json.dumps(result), settings.SENTRY_SNUBA_CACHE_TTL_SECONDS)
-            results.append((query_pos, result))
+        # Run the queries this thread leads before waiting on anybody else, so that two
+        # threads waiting on each other's queries cannot deadlock.
+        results.extend(_run_queries(to_query, headers, use_snql))
+        for _, _, cache_key in to_query:
+            _finish_flight(cache_key, *flights.pop(cache_key))
+
+        if waiting:
+            coalesced, timed_out = _wait_for_cached_results(waiting, metric_tags)
+            results.extend(coalesced)
+            for _ in timed_out:
+                metrics.incr("snuba.query_cache.miss", tags=metric_tags)
+            results.extend(_run_queries(timed_out, headers, use_snql))
+    finally:
+        for cache_key, (event, lock) in flights.items():
+            _finish_flight(cache_key, event, lock)
+
+    if duplicates:
+        results_by_position = dict(results)
+        for query_pos, first_pos in duplicates:
+            results.append((query_pos, deepcopy(results_by_position[first_pos])))
 
     # Sort so that we get the results back in the original param list order
     results.sort()
@@ -736,6 +1124,23 @@ def _apply_cache_and_build_results(
     return map(itemgetter(1), results)
 
 
+def _run_queries(
+    to_query: Sequence[Tuple[int, SnubaQueryBody, Optional[str]]],
+    headers: Mapping[str, str],
+    use_snql: Optional[bool] = None,
+) -> List[Tuple[int, Any]]:
+    if not to_query:
+        return []
+
+    results = []
+    query_results = _bulk_snuba_query(map(itemgetter(1), to_query), headers, use_snql)
+    for result, (query_pos, _, cache_key) in zip(query_results, to_query):
+        if cache_key:
+            _set_cached_result(cache_key, json.dumps(result))
+        results.append((query_pos, result))
+    return results
+
+
 def _bulk_snuba_query(
     snuba_param_list: Sequence[SnubaQueryBody],
     headers: Mapping[str, str],
@@ -754,61 +1159,217 @@ def _bulk_snuba_query(
         # 1. A legacy JSON query (_snuba_query)
         # 2. A dryrun SnQL query of a legacy query (_snql_dryrun_query)
         # 3. A direct SnQL query using the new SDK (_snql_query)
-        query_fn = _snuba_query
-        if isinstance(snuba_param_list[0][0], Query):
-            query_fn = _snql_query
-        elif use_snql:
-            query_fn = _snql_dryrun_query
-
-        if len(snuba_param_list) > 1:
-            query_results = list(
-                _query_thread_pool.map(
-                    query_fn,
-                    [(params, Hub(Hub.current), headers) for params in snuba_param_list],
-                )
-            )
-        else:
-            # No need to submit to the thread pool if we're just performing a single query
-            query_results = [query_fn((snuba_param_list[0], Hub(Hub.current), headers))]
+        query_fn = _get_query_fn(snuba_param_list, use_snql)
+        query_results = _query_pool.map(
+            query_fn,
+            [(params, Hub(Hub.current), headers) for params in snuba_param_list],
+            referrer=headers.get("referer"),
+        )
+
+    return _build_results(query_results, headers)
+
 
+def _get_query_fn(
+    snuba_param_list: Sequence[SnubaQueryBody], use_snql: Optional[bool]
+) -> Callable[[Tuple[SnubaQueryBody, Hub, Mapping[str, str]]], "RawResult"]:
+    # This is confusing because this function is overloaded right now with three cases:
+    # 1. A legacy JSON query (_snuba_query)
+    # 2. A dryrun SnQL query of a legacy query (_snql_dryrun_query)
+    # 3. A direct SnQL query using the new SDK (_snql_query)
+    if isinstance(snuba_param_list[0][0], Query):
+        return _snql_query
+    elif use_snql:
+        return _snql_dryrun_query
+    return _snuba_query
+
+
+def _build_results(query_results: Sequence["RawResult"], headers: Mapping[str, str]) -> ResultSet:
     results = []
     for response, _, reverse in query_results:
-        try:
-            body = json.loads(response.data)
-            if SNUBA_INFO:
-                if "sql" in body:
-                    logger.info(
-                        "{}.sql: {}".format(headers.get("referer", "<unknown>"), body["sql"])
-                    )
-                if "error" in body:
-                    logger.info(
-                        "{}.err: {}".format(headers.get("referer", "<unknown>"), body["error"])
-                    )
-        except ValueError:
-            if response.status != 200:
-                logger.error("snuba.query.invalid-json")
-                raise SnubaError("Failed to parse snuba error response")
-            raise UnexpectedResponseError(f"Could not decode JSON response: {response.data}")
+        body = _decode_response(response, headers)
+        # Forward and reverse translation maps from model ids to snuba keys, per column
+        body["data"] = [reverse(d) for d in body["data"]]
+        results.append(body)
 
+    return results
+
+
+async def bulk_raw_query_async(
+    snuba_param_list: Sequence[SnubaQueryParams],
+    referrer: Optional[str] = None,
+    use_snql: Optional[bool] = None,
+) -> ResultSet:
+    """
+    Asyncio flavour of `bulk_raw_query` for callers fanning out many queries.
+
+    The queries run concurrently on the workers of the query pool while the
+    event loop stays free, results are not cached.
+    """
+    snuba_param_list = map(_prepare_query_params, snuba_param_list)
+    if not snuba_param_list:
+        return []
+
+    headers = {"referer": referrer} if referrer else {}
+    query_fn = _get_query_fn(snuba_param_list, use_snql)
+    query_results = await asyncio.gather(
+        *(
+            _query_pool.submit_async(
+                query_fn, (params, Hub(Hub.current), headers), referrer=referrer
+            )
+            for params in snuba_param_list
+        )
+    )
+    return _build_results(query_results, headers)
+
+
+def _decode_response(
+    response: urllib3.response.HTTPResponse, headers: Mapping[str, str]
+) -> MutableMapping[str, Any]:
+    """
+    Decodes the body of a snuba response, raising the matching `SnubaError` for errors.
+    """
+    try:
+        body = json.loads(response.data)
+        if SNUBA_INFO:
+            if "sql" in body:
+                logger.info("{}.sql: {}".format(headers.get("referer", "<unknown>"), body["sql"]))
+            if "error" in body:
+                logger.info("{}.err: {}".format(headers.get("referer", "<unknown>"), body["error"]))
+    except ValueError:
         if response.status != 200:
-            if body.get("error"):
-                error = body["error"]
-                if response.status == 429:
-                    raise RateLimitExceeded(error["message"])
-                elif error["type"] == "schema":
-                    raise SchemaValidationError(error["message"])
-                elif error["type"] == "clickhouse":
-                    raise clickhouse_error_codes_map.get(error["code"], QueryExecutionError)(
-                        error["message"]
-                    )
-                else:
-                    raise SnubaError(error["message"])
+            logger.error("snuba.query.invalid-json")
+            raise SnubaError("Failed to parse snuba error response")
+        raise UnexpectedResponseError(f"Could not decode JSON response: {response.data}")
+
+    if response.status != 200:
+        if body.get("error"):
+            error = body["error"]
+            if response.status == 429:
+                raise RateLimitExceeded(error["message"])
+            elif error["type"] == "schema":
+                raise SchemaValidationError(error["message"])
+            elif error["type"] == "clickhouse":
+                raise clickhouse_error_codes_map.get(error["code"], QueryExecutionError)(
+                    error["message"]
+                )
             else:
-                raise SnubaError(f"HTTP {response.status}")
+                raise SnubaError(error["message"])
+        else:
+            raise SnubaError(f"HTTP {response.status}")
 
-        # Forward and reverse translation maps from model ids to snuba keys, per column
-        body["data"] = [reverse(d) for d in body["data"]]
-        results.append(body)
+    return body
+
+
+class SnubaResultStream:
+    """
+    The result of a snuba query whose rows are decoded while they are iterated.
+
+    Iterating yields the rows of `data`, reverse translated one at a time, so
+    that results of any size can be consumed with bounded memory. The other
+    members of the response are collected in `body`: the ones snuba sends ahead
+    of the rows (such as `meta`) are there once `peek` has been called, the
+    rest once the rows are exhausted. Streams can only be read once and release
+    their connection when exhausted or closed.
+    """
+
+    _empty = object()
+
+    def __init__(self, response: urllib3.response.HTTPResponse, reverse: Translator):
+        self.body: MutableMapping[str, Any] = {}
+        self._response = response
+        self._reverse = reverse
+        self._members = json.iterload_object(_iter_response_text(response), stream_keys=("data",))
+        self._next_row = self._empty
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Mapping[str, Any]:
+        if self._next_row is not self._empty:
+            row, self._next_row = self._next_row, self._empty
+            return row
+
+        try:
+            for key, value in self._members:
+                if key == "data":
+                    return self._reverse(value)
+                self.body[key] = value
+        except ValueError as err:
+            self.close()
+            raise UnexpectedResponseError(f"Could not decode JSON response: {err}")
+        except urllib3.exceptions.HTTPError as err:
+            self.close()
+            raise SnubaError(err)
+
+        self.close()
+        raise StopIteration
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def peek(self) -> Optional[Mapping[str, Any]]:
+        """
+        Returns the next row without consuming it, or `None` if there is none.
+        """
+        if self._next_row is self._empty:
+            try:
+                self._next_row = next(self)
+            except StopIteration:
+                return None
+        return self._next_row
+
+    def close(self) -> None:
+        self._members.close()
+        self._response.release_conn()
+
+
+def _iter_response_text(
+    response: urllib3.response.HTTPResponse, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in response.stream(chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def _stream_snuba_queries(
+    snuba_param_list: Sequence[SnubaQueryBody], headers: Mapping[str, str]
+) -> List[SnubaResultStream]:
+    """
+    Sends the queries without reading their responses past the status line, and
+    wraps every successful one into a `SnubaResultStream`.
+    """
+    with sentry_sdk.start_span(
+        op="start_snuba_query",
+        description=f"streaming {len(snuba_param_list)} snuba queries",
+    ) as span:
+        span.set_tag("query.referrer", headers.get("referer", "<unknown>"))
+
+        def query_fn(params):
+            if isinstance(params[0][0], Query):
+                return _snql_query(params, preload_content=False)
+            return _snuba_query(params, preload_content=False)
+
+        query_results = _query_pool.map(
+            query_fn,
+            [(params, Hub(Hub.current), headers) for params in snuba_param_list],
+            referrer=headers.get("referer"),
+        )
+
+    results = []
+    try:
+        for response, _, reverse in query_results:
+            if response.status != 200:
+                # Raises the error returned by snuba
+                _decode_response(response, headers)
+            results.append(SnubaResultStream(response, reverse))
+    except Exception:
+        for response, _, _ in query_results:
+            response.release_conn()
+        raise
 
     return results
 
@@ -816,7 +1377,9 @@ def _bulk_snuba_query(
 RawResult = Tuple[urllib3.response.HTTPResponse, Callable[[Any], Any], Callable[[Any], Any]]
 
 
-def _snuba_query(params: Tuple[SnubaQuery, Hub, Mapping[str, str]]) -> RawResult:
+def _snuba_query(
+    params: Tuple[SnubaQuery, Hub, Mapping[str, str]], preload_content: bool = True
+) -> RawResult:
     query_data, thread_hub, headers = params
     query_params, forward, reverse = query_data
     try:
@@ -832,7 +1395,13 @@ def _snuba_query(params: Tuple[SnubaQuery, Hub, Mapping[str, str]]) -> RawResult
                 for param_key, param_data in query_params.items():
                     span.set_data(param_key, param_data)
                 return (
-                    _snuba_pool.urlopen("POST", "/query", body=body, headers=headers),
+                    _snuba_pool.urlopen(
+                        "POST",
+                        "/query",
+                        body=body,
+                        headers=headers,
+                        preload_content=preload_content,
+                    ),
                     forward,
                     reverse,
                 )
@@ -840,14 +1409,16 @@ def _snuba_query(params: Tuple[SnubaQuery, Hub, Mapping[str, str]]) -> RawResult
         raise SnubaError(err)
 
 
-def _snql_query(params: Tuple[SnubaQuery, Hub, Mapping[str, str]]) -> RawResult:
+def _snql_query(
+    params: Tuple[SnubaQuery, Hub, Mapping[str, str]], preload_content: bool = True
+) -> RawResult:
     # Eventually we can get rid of this wrapper, but for now it's cleaner to unwrap
     # the params here than in the calling function.
     query_data, thread_hub, headers = params
     query, forward, reverse = query_data
     assert isinstance(query, Query)
     try:
-        return _raw_snql_query(query, thread_hub, headers), forward, reverse
+        return _raw_snql_query(query, thread_hub, headers, preload_content), forward, reverse
     except Exception as err:
         raise SnubaError(err)
 
@@ -877,7 +1448,7 @@ def _snql_dryrun_query(params: Tuple[SnubaQuery, Hub, Mapping[str, str]]) -> Raw
     query = query.set_dry_run(True).set_debug(True)
     query_params["debug"] = True
 
-    snql_future = _query_thread_pool.submit(_raw_snql_query, query, Hub(thread_hub), headers)
+    snql_future = _query_pool.submit(_raw_snql_query, query, Hub(thread_hub), headers)
     # If this fails then there's no point doing anything else, so let any exception get reraised
     legacy_result = _snuba_query(params)
 
@@ -947,7 +1518,7 @@ def _snql_dryrun_query(params: Tuple[SnubaQuery, Hub, Mapping[str, str]]) -> Raw
 
 
 def _raw_snql_query(
-    query: Query, thread_hub: Hub, headers: Mapping[str, str]
+    query: Query, thread_hub: Hub, headers: Mapping[str, str], preload_content: bool = True
 ) -> urllib3.response.HTTPResponse:
     with timer("snql_query"):
         referrer = headers.get("referer", "<unknown>")
@@ -959,7 +1530,13 @@ def _raw_snql_query(
         with thread_hub.start_span(op="snuba_snql", description=f"query {referrer}") as span:
             span.set_tag("referrer", referrer)
             span.set_tag("snql", str(query))
-            return _snuba_pool.urlopen("POST", f"/{query.dataset}/snql", body=body, headers=headers)
+            return _snuba_pool.urlopen(
+                "POST",
+                f"/{query.dataset}/snql",
+                body=body,
+                headers=headers,
+                preload_content=preload_content,
+            )
 
 
 def query(
@@ -1003,6 +1580,14 @@ def query(
         else:
             return OrderedDict()
 
+    return nest_query_result(body, groupby, aggregations, selected_columns, totals)
+
+
+def nest_query_result(body, groupby, aggregations, selected_columns, totals=None):
+    """
+    Turns the raw result of a query built like `query` builds them into the
+    nested mapping `query` returns.
+    """
     # Validate and scrub response, and translate snuba keys back to IDs
     aggregate_names = [a[2] for a in aggregations]
     selected_names = [c[2] if isinstance(c, (list, tuple)) else c for c in selected_columns]
@@ -1157,7 +1742,11 @@ def aliased_query(**kwargs):
         return _aliased_query_impl(**kwargs)
 
 
-def _aliased_query_impl(
+def _aliased_query_impl(**kwargs):
+    return raw_query(**aliased_query_params(**kwargs))
+
+
+def aliased_query_params(
     start=None,
     end=None,
     groupby=None,
@@ -1170,9 +1759,13 @@ def _aliased_query_impl(
     dataset=None,
     orderby=None,
     condition_resolver=None,
-    use_snql=None,
     **kwargs,
 ):
+    """
+    Resolves the column aliases of an `aliased_query` and returns the
+    resulting `raw_query` keyword arguments, so that the query can also be
+    sent as part of a `bulk_raw_query` batch.
+    """
     if dataset is None:
         raise ValueError("A dataset is required, and is no longer automatically detected.")
 
@@ -1211,7 +1804,7 @@ def _aliased_query_impl(
             updated_order.append("{}{}".format("-" if order.startswith("-") else "", order_field))
         orderby = updated_order
 
-    return raw_query(
+    return dict(
         start=start,
         end=end,
         groupby=groupby,
@@ -1223,7 +1816,6 @@ def _aliased_query_impl(
         having=having,
         dataset=dataset,
         orderby=orderby,
-        use_snql=use_snql,
         **kwargs,
     )
 
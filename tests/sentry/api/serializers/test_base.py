@@ -1,5 +1,9 @@
+from unittest import mock
+
 from sentry.api.serializers import Serializer, serialize
+from sentry.api.serializers.base import AttributeBatch, ColumnarAttrs, serialize_attrs_cache
 from sentry.testutils import TestCase
+from sentry.utils.snuba import QueryOutsideRetentionError
 
 
 class Foo:
@@ -16,6 +20,22 @@ class VariadicSerializer(Serializer):
         return {"kw": kw}
 
 
+class CountingSerializer(Serializer):
+    # kept on the class, the serializer configuration is part of the cache key
+    calls = []
+
+    def __init__(self, suffix="", expand=None):
+        self.suffix = suffix
+        self.expand = expand
+
+    def get_attrs(self, item_list, user, **kwargs):
+        self.calls.append(list(item_list))
+        return {item: {"name": item.name + self.suffix} for item in item_list}
+
+    def serialize(self, obj, attrs, user, **kwargs):
+        return attrs["name"]
+
+
 class BaseSerializerTest(TestCase):
     def test_serialize(self):
         assert serialize([]) == []
@@ -53,3 +73,99 @@ class BaseSerializerTest(TestCase):
         user = self.create_user()
         result = serialize(foo, user, VariadicSerializer(), kw="keyword")
         assert result["kw"] == "keyword"
+
+
+class AttributeBatchTest(TestCase):
+    @mock.patch("sentry.utils.snuba.bulk_raw_query")
+    def test_load(self, bulk_raw_query):
+        bulk_raw_query.return_value = [{"data": [1]}, QueryOutsideRetentionError()]
+        batch = AttributeBatch(referrer="test")
+        batch.add_query("a", {"dataset": "events"}, process=lambda body: body["data"])
+        batch.add_query("b", {"dataset": "events"})
+        batch.add_query("c", None, process=lambda body: body is None)
+        batch.add("d", lambda x, y=0: x + y, 1, y=2)
+
+        assert batch.load() == {"a": [1], "b": None, "c": True, "d": 3}
+        assert bulk_raw_query.call_count == 1
+        assert len(bulk_raw_query.call_args[0][0]) == 2
+        assert bulk_raw_query.call_args[1]["referrer"] == "test"
+        assert bulk_raw_query.call_args[1]["return_exceptions"]
+
+    @mock.patch("sentry.utils.snuba.bulk_raw_query")
+    def test_load_error(self, bulk_raw_query):
+        bulk_raw_query.return_value = [ValueError("boom")]
+        batch = AttributeBatch()
+        batch.add_query("a", {"dataset": "events"})
+        with self.assertRaises(ValueError):
+            batch.load()
+
+
+class ColumnarAttrsTest(TestCase):
+    def test_columns(self):
+        a, b = Foo(), Foo()
+        attrs = ColumnarAttrs([a, b], base={a: {"x": 1}})
+        attrs.set_column("y", [2, 3])
+
+        assert len(attrs) == 2
+        assert list(attrs) == [a, b]
+        assert attrs[a] == {"x": 1, "y": 2}
+        assert attrs.get(b, {}) == {"y": 3}
+        assert attrs.get(Foo(), {}) == {}
+        with self.assertRaises(AssertionError):
+            attrs.set_column("z", [1])
+
+
+class SerializeAttrsCacheTest(TestCase):
+    def setUp(self):
+        CountingSerializer.calls = []
+
+    def test_memoizes_attrs(self):
+        user = self.create_user()
+        serializer = CountingSerializer(expand=["foo"])
+        with serialize_attrs_cache():
+            assert serialize([self.organization], user, serializer) == [self.organization.name]
+            assert serialize(self.organization, user, serializer) == self.organization.name
+            other = self.create_organization()
+            assert serialize([self.organization, other], user, serializer) == [
+                self.organization.name,
+                other.name,
+            ]
+        assert serializer.calls == [[self.organization], [other]]
+
+        # attrs depend on the serializer configuration, the user and the kwargs
+        with serialize_attrs_cache():
+            serialize(self.organization, user, serializer)
+            assert serialize(self.organization, user, CountingSerializer("!")).endswith("!")
+            serialize(self.organization, user, CountingSerializer(expand=["foo"]))
+            serialize(self.organization, self.create_user(), serializer)
+        assert len(serializer.calls) == 5
+
+        # and are not shared outside of the block
+        serialize(self.organization, user, serializer)
+        assert len(serializer.calls) == 6
+
+    def test_unsortable_configuration(self):
+        # dict keys of mixed types cannot be sorted into a cache key
+        serializer = CountingSerializer(expand={1: "foo", "bar": "baz"})
+        with serialize_attrs_cache():
+            serialize(self.organization, serializer=serializer)
+            serialize(self.organization, serializer=serializer)
+        assert len(serializer.calls) == 2
+
+    def test_no_memoize(self):
+        serializer = CountingSerializer()
+        with serialize_attrs_cache(memoize=False):
+            serialize(self.organization, serializer=serializer)
+            serialize(self.organization, serializer=serializer)
+        assert len(serializer.calls) == 2
+
+    @mock.patch("sentry.api.serializers.base.logger")
+    def test_debug(self, logger):
+        serializer = CountingSerializer()
+        with serialize_attrs_cache(name="TestEndpoint", memoize=False, debug=True):
+            for _ in range(3):
+                serialize(self.organization, serializer=serializer)
+        logger.info.assert_called_once_with(
+            "serialize.duplicate-lookups",
+            extra={"endpoint": "TestEndpoint", "duplicates": {"CountingSerializer": 2}},
+        )
@@ -25,6 +25,10 @@ class InMemoryCache:
         assert key not in self.raw_map or raw == self.raw_map[key]
         self.data[key] = value
 
+    def set_many(self, items, timeout=None, raw=False):
+        for key, value in items.items():
+            self.set(key, value, timeout=timeout, raw=raw)
+
     def delete(self, key):
         del self.data[key]
 
@@ -110,3 +114,25 @@ def test_basic_rate_limited():
     assert att2.id == att.id == 0
     assert att2.data == att.data == b"Hello World! Bye."
     assert att2.rate_limited is True
+
+
+def test_batched():
+    data = InMemoryCache()
+    cache = BaseAttachmentCache(data)
+
+    cache.set_chunks([("c:foo", 123, 0, b"Hello World! "), ("c:foo", 123, 1, b"Bye.")])
+
+    chunked = CachedAttachment(
+        key="c:foo", id=123, name="lol.txt", content_type="text/plain", chunks=2
+    )
+    unchunked = CachedAttachment(name="lol.txt", content_type="text/plain", data=b"Hello!")
+    cache.set_many([("c:foo", [chunked]), ("c:bar", [unchunked])])
+
+    (att,) = cache.get("c:foo")
+    assert att.id == 123
+    assert att.data == b"Hello World! Bye."
+
+    (att,) = cache.get("c:bar")
+    assert att.key == "c:bar"
+    assert att.id == 0
+    assert att.data == b"Hello!"
@@ -4,6 +4,7 @@ from django.utils import timezone
 
 from sentry.buffer.base import Buffer
 from sentry.models import Group, Organization, Project, Release, ReleaseProject, Team
+from sentry.signals import buffer_incr_complete
 from sentry.testutils import TestCase
 from sentry.utils.compat import mock
 
@@ -73,3 +74,48 @@ class BufferTest(TestCase):
         self.buf.process(Group, columns, filters, {"last_seen": the_date}, signal_only=True)
         group.refresh_from_db()
         assert group.times_seen == prev_times_seen
+
+    def test_process_batch(self):
+        groups = [Group.objects.create(project=Project(id=1)) for _ in range(3)]
+        the_date = timezone.now() + timedelta(days=5)
+        incrs = [
+            ({"times_seen": i + 1}, {"id": group.id}, {"last_seen": the_date}, None)
+            for i, group in enumerate(groups)
+        ]
+        # no row exists for this one yet
+        incrs.append(({"times_seen": 1}, {"message": "foo bar", "project_id": 1}, None, None))
+
+        received = []
+
+        def receiver(filters, created, **kwargs):
+            received.append((filters, created))
+
+        buffer_incr_complete.connect(receiver, sender=Group, weak=False)
+        try:
+            self.buf.process_batch(Group, incrs)
+        finally:
+            buffer_incr_complete.disconnect(receiver, sender=Group)
+
+        for i, group in enumerate(groups):
+            group_ = Group.objects.get(id=group.id)
+            assert group_.times_seen == group.times_seen + i + 1
+            assert group_.last_seen == the_date
+
+        # the score is computed the same way as for single updates
+        reference = Group.objects.create(project=Project(id=1))
+        self.buf.process(Group, {"times_seen": 1}, {"id": reference.id}, {"last_seen": the_date})
+        assert Group.objects.get(id=groups[0].id).score == Group.objects.get(id=reference.id).score
+
+        assert Group.objects.get(message="foo bar").times_seen == 2
+        assert [created for _, created in received] == [False, False, False, True]
+
+    def test_process_batch_isolates_failures(self):
+        groups = [Group.objects.create(project=Project(id=1)) for _ in range(2)]
+        incrs = [({"times_seen": 1}, {"id": group.id}, None, None) for group in groups]
+        # the invalid id fails the bulk update, after which each row is retried on its own
+        incrs.insert(1, ({"times_seen": 1}, {"id": "not-an-id"}, None, None))
+
+        self.buf.process_batch(Group, incrs)
+
+        for group in groups:
+            assert Group.objects.get(id=group.id).times_seen == group.times_seen + 1
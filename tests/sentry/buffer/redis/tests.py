@@ -1,4 +1,6 @@
 import pickle
+import threading
+import time
 from datetime import datetime
 
 from django.utils import timezone
@@ -46,8 +48,8 @@ class RedisBufferTest(TestCase):
         assert client.zrange("b:p", 0, -1) == []
 
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
-    @mock.patch("sentry.buffer.base.Buffer.process")
-    def test_process_does_bubble_up_json(self, process):
+    @mock.patch("sentry.buffer.base.Buffer.process_batch")
+    def test_process_does_bubble_up_json(self, process_batch):
         client = self.buf.cluster.get_routing_client()
         client.hmset(
             "foo",
@@ -64,11 +66,11 @@ class RedisBufferTest(TestCase):
         extra = {"foo": "bar", "datetime": datetime(2017, 5, 3, 6, 6, 6, tzinfo=timezone.utc)}
         signal_only = None
         self.buf.process("foo")
-        process.assert_called_once_with(Group, columns, filters, extra, signal_only)
+        process_batch.assert_called_once_with(Group, [(columns, filters, extra, signal_only)])
 
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
-    @mock.patch("sentry.buffer.base.Buffer.process")
-    def test_process_does_bubble_up_pickle(self, process):
+    @mock.patch("sentry.buffer.base.Buffer.process_batch")
+    def test_process_does_bubble_up_pickle(self, process_batch):
         client = self.buf.cluster.get_routing_client()
         client.hmset(
             "foo",
@@ -84,7 +86,7 @@ class RedisBufferTest(TestCase):
         extra = {"foo": "bar"}
         signal_only = None
         self.buf.process("foo")
-        process.assert_called_once_with(Group, columns, filters, extra, signal_only)
+        process_batch.assert_called_once_with(Group, [(columns, filters, extra, signal_only)])
 
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
     @mock.patch("sentry.buffer.redis.process_incr", mock.Mock())
@@ -121,6 +123,105 @@ class RedisBufferTest(TestCase):
         pending = client.zrange("b:p", 0, -1)
         assert pending == [b"foo"]
 
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    @mock.patch("sentry.buffer.redis.process_incr", mock.Mock())
+    def test_incr_saves_to_redis_msgpack(self):
+        now = datetime(2017, 5, 3, 6, 6, 6, 123456, tzinfo=timezone.utc)
+        client = self.buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = "Mock"
+        columns = {"times_seen": 1}
+        filters = {"pk": 1, "project": Project(id=2)}
+        with self.options({"buffer.redis.msgpack-encoding": True}):
+            self.buf.incr(model, columns, filters, extra={"foo": "bar", "datetime": now})
+        result = client.hgetall("foo")
+        # Force keys to strings
+        result = {force_text(k): v for k, v in result.items()}
+
+        assert result["f"].startswith(b"\x02")
+        assert self.buf._decode(result.pop("f"), json_prefix=b"{") == {
+            "pk": 1,
+            "project": Project(id=2),
+        }
+        assert self.buf._decode(result.pop("e+datetime"), json_prefix=b"[") == now
+        assert self.buf._decode(result.pop("e+foo"), json_prefix=b"[") == "bar"
+        assert result == {"i+times_seen": b"1", "m": b"mock.mock.Mock"}
+
+    @mock.patch("sentry.buffer.base.Buffer.process_batch")
+    def test_process_batch_mixed_encodings(self, process_batch):
+        now = datetime(2017, 5, 3, 6, 6, 6, tzinfo=timezone.utc)
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+        with self.options({"buffer.redis.msgpack-encoding": True}):
+            self.buf.incr(Group, {"times_seen": 2}, {"pk": 2}, extra={"last_seen": now})
+
+        self.buf.process(
+            batch_keys=[
+                self.buf._make_key(Group, {"pk": 1}),
+                self.buf._make_key(Group, {"pk": 2}),
+            ]
+        )
+        process_batch.assert_called_once_with(
+            Group,
+            [
+                ({"times_seen": 1}, {"pk": 1}, {"foo": "bar"}, None),
+                ({"times_seen": 2}, {"pk": 2}, {"last_seen": now}, None),
+            ],
+        )
+
+        client = self.buf.cluster.get_routing_client()
+        assert client.zrange("b:p", 0, -1) == []
+
+    def test_incr_local_buffer(self):
+        buf = RedisBuffer(local_buffer_size=2, local_flush_interval=60)
+        client = buf.cluster.get_routing_client()
+        now = datetime(2017, 5, 3, 6, 6, 6, tzinfo=timezone.utc)
+
+        buf.incr(Group, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+        buf.incr(Group, {"times_seen": 2}, {"pk": 1}, extra={"foo": "baz", "datetime": now})
+        key = buf._make_key(Group, {"pk": 1})
+        assert client.hgetall(key) == {}
+
+        # a second distinct key fills up the local buffer
+        buf.incr(Group, {"times_seen": 1}, {"pk": 2})
+        result = {force_text(k): v for k, v in client.hgetall(key).items()}
+        assert int(result["i+times_seen"]) == 3
+        assert pickle.loads(result["e+foo"]) == "baz"
+        assert pickle.loads(result["e+datetime"]) == now
+        assert int(client.hget(buf._make_key(Group, {"pk": 2}), "i+times_seen")) == 1
+
+        buf.incr(Group, {"times_seen": 1}, {"pk": 3})
+        assert client.hgetall(buf._make_key(Group, {"pk": 3})) == {}
+        buf.flush_local()
+        assert int(client.hget(buf._make_key(Group, {"pk": 3}), "i+times_seen")) == 1
+
+    def test_incr_local_buffer_threads(self):
+        buf = RedisBuffer(local_buffer_size=2, local_flush_interval=60)
+        client = buf.cluster.get_routing_client()
+        incr_redis = buf._incr_redis
+
+        def slow_incr_redis(*args, **kwargs):
+            # Gives other threads the chance to add to the buffer while it
+            # is being written.
+            time.sleep(0.001)
+            incr_redis(*args, **kwargs)
+
+        def incr(thread):
+            for i in range(50):
+                buf.incr(Group, {"times_seen": 1}, {"pk": thread * 100 + i % 5})
+
+        with mock.patch.object(buf, "_incr_redis", side_effect=slow_incr_redis):
+            threads = [threading.Thread(target=incr, args=(thread,)) for thread in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            buf.flush_local()
+
+        for thread in range(8):
+            for i in range(5):
+                key = buf._make_key(Group, {"pk": thread * 100 + i})
+                assert int(client.hget(key, "i+times_seen")) == 10
+
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
     @mock.patch("sentry.buffer.redis.process_incr")
     @mock.patch("sentry.buffer.redis.process_pending")
@@ -168,8 +269,8 @@ class RedisBufferTest(TestCase):
         assert len(process_pending.apply_async.mock_calls) == 2
 
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
-    @mock.patch("sentry.buffer.base.Buffer.process")
-    def test_process_uses_signal_only(self, process):
+    @mock.patch("sentry.buffer.base.Buffer.process_batch")
+    def test_process_uses_signal_only(self, process_batch):
         client = self.buf.cluster.get_routing_client()
         client.hmset(
             "foo",
@@ -181,7 +282,7 @@ class RedisBufferTest(TestCase):
             },
         )
         self.buf.process("foo")
-        process.assert_called_once_with(mock.Mock, {"times_seen": 1}, {"pk": 1}, {}, True)
+        process_batch.assert_called_once_with(mock.Mock, [({"times_seen": 1}, {"pk": 1}, {}, True)])
 
     """
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
@@ -40,3 +40,13 @@ class DiscoverProcessorTest(TestCase, SnubaTestCase):
         new_result_list = processor.handle_fields(result_list)
         assert new_result_list[0] != result_list
         assert new_result_list[0]["issue"] == self.group.qualified_short_id
+
+    def test_iter_handled_fields(self):
+        processor = DiscoverProcessor(
+            organization_id=self.org.id, discover_query=self.discover_query
+        )
+        rows = ({"issue.id": self.group.id} for _ in range(3))
+        new_result_list = list(processor.iter_handled_fields(rows))
+        assert [result["issue"] for result in new_result_list] == [
+            self.group.qualified_short_id
+        ] * 3
@@ -423,6 +423,36 @@ class AssembleDownloadTest(TestCase, SnubaTestCase):
         error = emailer.call_args[1]["message"]
         assert error == "Invalid query. Please fix the query and try again."
 
+    @patch("sentry.data_export.tasks.metrics")
+    @patch("sentry.snuba.discover.query")
+    @patch("sentry.data_export.models.ExportedData.email_failure")
+    def test_discover_snuba_error_while_streaming(self, emailer, mock_query, mock_metrics):
+        de = ExportedData.objects.create(
+            user=self.user,
+            organization=self.org,
+            query_type=ExportQueryType.DISCOVER,
+            query_info={"project": [self.project.id], "field": ["title"], "query": ""},
+        )
+
+        closed = []
+
+        def iter_rows():
+            try:
+                yield {"title": "foo"}
+                raise QueryExecutionError("test")
+            finally:
+                closed.append(True)
+
+        mock_query.return_value = {"data": iter_rows()}
+        with self.tasks():
+            assemble_download(de.id)
+        error = emailer.call_args[1]["message"]
+        assert error == "Internal error. Your query failed to run."
+        assert closed == [True]
+        mock_metrics.incr.assert_any_call(
+            "dataexport.error", tags={"error": error}, sample_rate=1.0
+        )
+
     @patch("sentry.snuba.discover.raw_query")
     @patch("sentry.data_export.models.ExportedData.email_failure")
     def test_discover_snuba_error(self, emailer, mock_query):
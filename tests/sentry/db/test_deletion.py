@@ -1,9 +1,10 @@
 from datetime import timedelta
+from unittest import mock
 
 from django.utils import timezone
 
-from sentry.db.deletion import BulkDeleteQuery
-from sentry.models import Group, Project
+from sentry.db.deletion import BulkDeleteQuery, TimeRangeDeleteQuery
+from sentry.models import Group, GroupRuleStatus, Project
 from sentry.testutils import TestCase, TransactionTestCase
 
 
@@ -34,6 +35,81 @@ class BulkDeleteQueryTest(TestCase):
         assert not Group.objects.filter(id=group1_2.id).exists()
         assert Group.objects.filter(id=group1_3.id).exists()
 
+    def test_estimate(self):
+        now = timezone.now()
+        self.create_group(last_seen=now - timedelta(days=2))
+        self.create_group(last_seen=now)
+        estimate = BulkDeleteQuery(model=Group, dtfield="last_seen", days=1).estimate()
+        assert estimate.model == "Group"
+        assert estimate.rows == 1
+        assert estimate.bytes >= 0
+
+
+class TimeRangeDeleteQueryTest(TestCase):
+    def test_datetime_restriction(self):
+        now = timezone.now()
+        project1 = self.create_project()
+        project2 = self.create_project()
+        old = [self.create_group(project1, last_seen=now - timedelta(days=d)) for d in (2, 5, 30)]
+        recent = self.create_group(project1, last_seen=now)
+        other = self.create_group(project2, last_seen=now - timedelta(days=2))
+
+        deleted = TimeRangeDeleteQuery(
+            model=Group, dtfield="last_seen", days=1, project_id=project1.id
+        ).execute()
+
+        assert deleted == 3
+        assert not Group.objects.filter(id__in=[g.id for g in old]).exists()
+        assert Group.objects.filter(id=recent.id).exists()
+        assert Group.objects.filter(id=other.id).exists()
+        assert TimeRangeDeleteQuery(model=Group, dtfield="last_seen", days=1).execute() == 1
+
+    @mock.patch("sentry.db.deletion.time.sleep")
+    @mock.patch("sentry.db.deletion.get_replication_lag", side_effect=[30, 5])
+    def test_throttle(self, get_replication_lag, sleep):
+        group = self.create_group(last_seen=timezone.now() - timedelta(minutes=150))
+        query = TimeRangeDeleteQuery(
+            model=Group, dtfield="last_seen", days=0, window=timedelta(days=1)
+        )
+        assert query.execute() == 1
+        assert not Group.objects.filter(id=group.id).exists()
+        assert get_replication_lag.call_count == 2
+        sleep.assert_called_once_with(1)
+
+    @mock.patch("sentry.db.deletion.get_replication_lag", return_value=0)
+    def test_max_rows(self, get_replication_lag):
+        now = timezone.now()
+        groups = [self.create_group(last_seen=now - timedelta(days=2)) for _ in range(5)]
+        query = TimeRangeDeleteQuery(model=Group, dtfield="last_seen", days=1, max_rows=2)
+        assert query.execute() == 5
+        assert not Group.objects.filter(id__in=[g.id for g in groups]).exists()
+        # two full statements, the third one finishes the window
+        assert get_replication_lag.call_count >= 3
+
+    @mock.patch("sentry.db.deletion.logger")
+    @mock.patch("sentry.db.deletion.get_replication_lag", return_value=None)
+    def test_replication_lag_unavailable(self, get_replication_lag, logger):
+        self.create_group(last_seen=timezone.now() - timedelta(days=2))
+        self.create_group(last_seen=timezone.now() - timedelta(days=3))
+        query = TimeRangeDeleteQuery(
+            model=Group, dtfield="last_seen", days=1, window=timedelta(hours=12)
+        )
+        assert query.execute() == 2
+        logger.warning.assert_called_once()
+
+    def test_adapt_window(self):
+        query = TimeRangeDeleteQuery(model=Group, dtfield="last_seen", days=1)
+        window = timedelta(hours=1)
+        assert query._adapt_window(window, 0.25) == timedelta(hours=2)
+        assert query._adapt_window(window, 0.0) == timedelta(hours=2)
+        assert query._adapt_window(window, 10) == timedelta(minutes=30)
+        assert query._adapt_window(timedelta(seconds=1), 10) == timedelta(seconds=1)
+        assert query._adapt_window(timedelta(days=7), 0.1) == timedelta(days=7)
+
+    def test_supports(self):
+        assert TimeRangeDeleteQuery.supports(Group, "last_seen")
+        assert not TimeRangeDeleteQuery.supports(GroupRuleStatus, "date_added")
+
 
 class BulkDeleteQueryIteratorTestCase(TransactionTestCase):
     def test_iteration(self):
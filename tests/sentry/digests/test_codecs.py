@@ -0,0 +1,42 @@
+import uuid
+
+from sentry.digests.codecs import CompressedPickleCodec, NotificationCodec
+from sentry.digests.notifications import Notification
+from sentry.eventstore.models import Event
+from sentry.testutils import TestCase
+
+
+class NotificationCodecTestCase(TestCase):
+    def setUp(self):
+        self.codec = NotificationCodec()
+        self.notification = Notification(
+            Event(self.project.id, uuid.uuid4().hex, group_id=123, data={"message": "foo"}),
+            [1, 2],
+        )
+
+    def test_compact_encoding(self):
+        with self.options({"digests.compact-encoding": True}):
+            value = self.codec.encode(self.notification)
+
+        assert value.startswith(NotificationCodec.VERSION)
+        assert len(value) < len(CompressedPickleCodec().encode(self.notification))
+
+        notification = self.codec.decode(value)
+        assert notification.rules == [1, 2]
+        assert notification.event.project_id == self.project.id
+        assert notification.event.event_id == self.notification.event.event_id
+        assert notification.event.group_id == 123
+        assert not notification.event.data.is_bound
+
+    def test_pickle_encoding(self):
+        value = self.codec.encode(self.notification)
+        assert value == CompressedPickleCodec().encode(self.notification)
+
+        notification = self.codec.decode(value)
+        assert notification.rules == [1, 2]
+        assert notification.event.data["message"] == "foo"
+
+    def test_other_values(self):
+        with self.options({"digests.compact-encoding": True}):
+            value = self.codec.encode({"foo": "bar"})
+        assert self.codec.decode(value) == {"foo": "bar"}
@@ -6,6 +6,7 @@ from exam import fixture
 from sentry.digests import Record
 from sentry.digests.notifications import (
     Notification,
+    bind_record_events,
     event_to_record,
     group_records,
     rewrite_record,
@@ -14,11 +15,28 @@ from sentry.digests.notifications import (
     split_key,
     unsplit_key,
 )
+from sentry.eventstore.models import Event
 from sentry.mail.adapter import ActionTargetType
 from sentry.models import Rule
 from sentry.testutils import TestCase
 
 
+class BindRecordEventsTestCase(TestCase):
+    def test_binds_unbound_events(self):
+        event = self.store_event(data={"message": "hello"}, project_id=self.project.id)
+        bound = event_to_record(event, [])
+        unbound = Record(
+            "unbound",
+            Notification(Event(self.project.id, event.event_id, group_id=event.group_id), []),
+            bound.timestamp,
+        )
+
+        bind_record_events([bound, unbound])
+
+        assert unbound.value.event.data.is_bound
+        assert unbound.value.event.message == "hello"
+
+
 class RewriteRecordTestCase(TestCase):
     @fixture
     def rule(self):
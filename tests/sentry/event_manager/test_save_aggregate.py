@@ -1,11 +1,18 @@
 import contextlib
 import time
+import uuid
 from threading import Thread
 
 import pytest
 
-from sentry.event_manager import _save_aggregate, _save_aggregate2
+from sentry.event_manager import (
+    HashDiscarded,
+    _save_aggregate,
+    _save_aggregate2,
+    _save_aggregate_many,
+)
 from sentry.eventstore.models import Event
+from sentry.models import GroupHash
 
 
 @pytest.mark.django_db(transaction=True)
@@ -93,3 +100,99 @@ def test_group_creation_race(monkeypatch, default_project, save_aggregate_versio
         # assert many groups are new
         assert 1 < len({rv[0].id for rv in return_values}) <= CONCURRENCY
         assert 1 < sum(rv[1] for rv in return_values) <= CONCURRENCY
+
+
+@pytest.mark.django_db
+def test_save_aggregate_many(default_project):
+    def make_job(flat_hashes, hierarchical_hashes=()):
+        data = {"timestamp": time.time()}
+        return {
+            "event": Event(default_project.id, uuid.uuid4().hex, data=data),
+            "project_id": default_project.id,
+            "flat_hashes": flat_hashes,
+            "hierarchical_hashes": list(hierarchical_hashes),
+            "release": None,
+            "group_kwargs": {"data": data, "level": 10, "culprit": ""},
+        }
+
+    existing_group, _, _ = _save_aggregate(
+        make_job([])["event"],
+        flat_hashes=["c" * 32],
+        hierarchical_hashes=[],
+        release=None,
+        data={},
+        level=10,
+        culprit="",
+    )
+    GroupHash.objects.create(project=default_project, hash="d" * 32, group_tombstone_id=1)
+
+    jobs = [
+        make_job(["a" * 32, "b" * 32]),
+        make_job(["b" * 32]),
+        make_job(["c" * 32, "e" * 32]),
+        make_job(["d" * 32]),
+        make_job(["f" * 32], hierarchical_hashes=["g" * 32, "a" * 32]),
+    ]
+    _save_aggregate_many(jobs, {default_project.id: default_project})
+
+    assert jobs[0]["is_new"]
+    assert not jobs[1]["is_new"]
+    assert jobs[1]["group"].id == jobs[0]["group"].id
+
+    assert not jobs[2]["is_new"]
+    assert jobs[2]["group"].id == existing_group.id
+
+    assert isinstance(jobs[3]["hash_discarded"], HashDiscarded)
+    assert "group" not in jobs[3]
+
+    # The hierarchical hash was associated with the first group within the batch
+    assert not jobs[4]["is_new"]
+    assert jobs[4]["group"].id == jobs[0]["group"].id
+
+    assert {h.hash for h in GroupHash.objects.filter(group=jobs[0]["group"])} == {
+        "a" * 32,
+        "b" * 32,
+    }
+    assert {h.hash for h in GroupHash.objects.filter(group=existing_group)} == {
+        "c" * 32,
+        "e" * 32,
+    }
+
+
+@pytest.mark.django_db
+def test_save_aggregate_hashes(default_project):
+    def save_aggregate(flat_hashes, hierarchical_hashes=()):
+        data = {"timestamp": time.time()}
+        return _save_aggregate(
+            Event(default_project.id, uuid.uuid4().hex, data=data),
+            flat_hashes=flat_hashes,
+            hierarchical_hashes=list(hierarchical_hashes),
+            release=None,
+            data=data,
+            level=10,
+            culprit="",
+        )
+
+    group, is_new, _ = save_aggregate(["a" * 32, "b" * 32])
+    assert is_new
+
+    other_group, is_new, _ = save_aggregate(["b" * 32, "c" * 32])
+    assert not is_new
+    assert other_group.id == group.id
+
+    # The hierarchical hash is looked up together with the flat ones
+    hierarchical_group, is_new, _ = save_aggregate(
+        ["d" * 32], hierarchical_hashes=["e" * 32, "a" * 32]
+    )
+    assert not is_new
+    assert hierarchical_group.id == group.id
+
+    GroupHash.objects.create(project=default_project, hash="f" * 32, group_tombstone_id=1)
+    with pytest.raises(HashDiscarded):
+        save_aggregate(["f" * 32])
+
+    assert {h.hash for h in GroupHash.objects.filter(group=group)} == {
+        "a" * 32,
+        "b" * 32,
+        "c" * 32,
+    }
@@ -1,6 +1,8 @@
+from copy import deepcopy
+
 import pytest
 
-from sentry.grouping.enhancer import Enhancements, InvalidEnhancerConfig
+from sentry.grouping.enhancer import ENHANCEMENT_BASES, Enhancements, InvalidEnhancerConfig
 
 
 def dump_obj(obj):
@@ -200,3 +202,59 @@ def test_package_matching():
     assert not bool(
         bundled_rule.get_matching_frame_actions({"package": "/usr/lib/linux-gate.so"}, "native")
     )
+
+
+def _iter_matching_frames_naive(enhancement, frames, platform):
+    for rule in enhancement.iter_rules():
+        for idx, frame in enumerate(frames):
+            if rule.get_matching_frame_actions(frame, platform):
+                yield rule, idx
+
+
+@pytest.mark.parametrize("base", sorted(ENHANCEMENT_BASES))
+def test_compiled_matching(base):
+    enhancement = Enhancements.from_config_string(
+        """
+        family:native function:main                     ^-app
+        !family:javascript module:foo.*                 +app
+        family:native,javascript app:no path:**/vendor/** -group
+        family:all !package:/usr/**                     v+group
+    """,
+        bases=[base],
+    )
+    frames = [
+        {"function": "std::rt::lang_start", "package": "/usr/lib/libstd.so"},
+        {"function": "main", "package": "/Users/me/MyApp.app/Contents/MacOS/MyApp"},
+        {"function": "__cxa_throw", "package": "C:\\Windows\\System32\\kernel32.dll"},
+        {"function": "-[SentryClient crash]", "package": "/var/containers/Bundle/Application/x"},
+        {"function": "kscrash_foo", "package": "linux-gate.so.1", "in_app": True},
+        {"function": "handle", "module": "foo.bar", "platform": "python"},
+        {
+            "function": "render",
+            "abs_path": "webpack:///./vendor/react.js",
+            "platform": "javascript",
+        },
+        {"function": "core::panicking::begin_panic", "abs_path": "/USR/LOCAL/lib/x.rs"},
+    ]
+
+    assert list(enhancement.iter_matching_frames(frames, "native")) == list(
+        _iter_matching_frames_naive(enhancement, frames, "native")
+    )
+
+    # Actions applied while iterating are visible to the app matchers of
+    # subsequent rules.
+    compiled_frames = deepcopy(frames)
+    naive_frames = deepcopy(frames)
+    enhancement.apply_modifications_to_frame(compiled_frames, "native")
+    for rule, idx in _iter_matching_frames_naive(enhancement, naive_frames, "native"):
+        for action in rule.actions:
+            action.apply_modifications_to_frame(naive_frames, idx)
+    assert compiled_frames == naive_frames
+
+
+def test_loads_cached():
+    dumped = Enhancements.from_config_string("function:foo -app", bases=["common:v1"]).dumps()
+
+    enhancement = Enhancements.loads_cached(dumped)
+    assert enhancement.dumps() == dumped
+    assert Enhancements.loads_cached(dumped) is enhancement
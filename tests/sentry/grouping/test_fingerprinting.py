@@ -1,7 +1,11 @@
 import pytest
 
 from sentry.grouping.api import get_default_grouping_config_dict
-from sentry.grouping.fingerprinting import FingerprintingRules, InvalidFingerprintingConfig
+from sentry.grouping.fingerprinting import (
+    EventAccess,
+    FingerprintingRules,
+    InvalidFingerprintingConfig,
+)
 from tests.sentry.grouping import with_fingerprint_input
 
 GROUPING_CONFIG = get_default_grouping_config_dict()
@@ -157,6 +161,55 @@ app:true                                        -> {{ default }}
     )
 
 
+def test_compiled_rules_match_like_rules():
+    rules = FingerprintingRules.from_config_string(
+        """
+type:DatabaseUnavailable function:nope -> never
+!app:no family:other module:io.sentry.* type:Database* -> database-{{ function }}
+message:"*went away*" -> went-away
+tags.server_name:web-* -> web
+"""
+    )
+    event = {
+        "platform": "java",
+        "tags": [["server_name", "web-1"]],
+        "exception": {
+            "values": [
+                {
+                    "type": "DatabaseUnavailable",
+                    "value": "For some reason the database went away",
+                    "stacktrace": {
+                        "frames": [
+                            {"function": "run", "module": "java.lang.Thread", "in_app": False},
+                            {"function": "main", "module": "io.sentry.Application", "in_app": True},
+                        ]
+                    },
+                }
+            ]
+        },
+    }
+
+    access = EventAccess(event)
+    matching = [
+        rule for rule in rules.rules if rule.get_fingerprint_values_for_event_access(access)
+    ]
+    assert [rule.fingerprint for rule in matching] == [
+        ["database-", "{{ function }}"],
+        ["went-away"],
+        ["web"],
+    ]
+
+    rule, fingerprint, attributes = rules.get_fingerprint_values_for_event(event)
+    assert rule is matching[0]
+    assert fingerprint == ["database-", "{{ function }}"]
+    assert attributes == {}
+
+    event["tags"] = []
+    event["exception"]["values"][0]["type"] = "ValueError"
+    event["exception"]["values"][0]["value"] = "nothing to see"
+    assert rules.get_fingerprint_values_for_event(event) is None
+
+
 @with_fingerprint_input("input")
 def test_event_hash_variant(insta_snapshot, input):
     config, evt = input.create_event()
@@ -5,6 +5,7 @@ import pytest
 
 from sentry.event_manager import EventManager
 from sentry.ingest.ingest_consumer import (
+    IngestConsumerWorker,
     process_attachment_chunk,
     process_event,
     process_individual_attachment,
@@ -60,6 +61,81 @@ def test_deduplication_works(default_project, task_runner, preprocess_event):
     }
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize("concurrency", (1, 4))
+def test_flush_batch_deduplicates(default_project, task_runner, preprocess_event, concurrency):
+    project_id = default_project.id
+    start_time = time.time() - 3600
+    messages = []
+
+    for message in ("hello", "world"):
+        payload = get_normalized_event({"message": message}, default_project)
+        messages.append(
+            {
+                "type": "event",
+                "payload": json.dumps(payload),
+                "start_time": start_time,
+                "event_id": payload["event_id"],
+                "project_id": project_id,
+                "remote_addr": "127.0.0.1",
+            }
+        )
+
+    worker = IngestConsumerWorker(concurrency=concurrency)
+    try:
+        # duplicates within the batch and across batches are dropped
+        worker.flush_batch(messages + messages[:1])
+        worker.flush_batch(messages)
+    finally:
+        worker.shutdown()
+
+    assert [kwargs["event_id"] for kwargs in preprocess_event] == [
+        message["event_id"] for message in messages
+    ]
+
+
+@pytest.mark.django_db
+def test_flush_batch_marks_processed_events_on_failure(
+    default_project, default_team, factories, monkeypatch
+):
+    failing_project = factories.create_project(name="Baz", slug="baz", teams=[default_team])
+    start_time = time.time() - 3600
+    messages = []
+
+    for project in (default_project, failing_project):
+        payload = get_normalized_event({"message": "hello"}, project)
+        messages.append(
+            {
+                "type": "event",
+                "payload": json.dumps(payload),
+                "start_time": start_time,
+                "event_id": payload["event_id"],
+                "project_id": project.id,
+                "remote_addr": "127.0.0.1",
+            }
+        )
+
+    calls = []
+
+    def preprocess_event(project, **kwargs):
+        if project.id == failing_project.id:
+            raise ValueError("failed")
+        calls.append(kwargs["event_id"])
+
+    monkeypatch.setattr("sentry.ingest.ingest_consumer.preprocess_event", preprocess_event)
+
+    worker = IngestConsumerWorker(concurrency=4)
+    try:
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                worker.flush_batch(messages)
+    finally:
+        worker.shutdown()
+
+    # The event of the other partition is not processed again with the batch.
+    assert calls == [messages[0]["event_id"]]
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize("missing_chunks", (True, False))
 def test_with_attachments(default_project, task_runner, missing_chunks, monkeypatch):
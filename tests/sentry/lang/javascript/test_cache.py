@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from sentry.lang.javascript.cache import SourceCache
+from sentry.lang.javascript.cache import ParsedArtifactCache, SourceCache
 
 
 class BasicCacheTest(TestCase):
@@ -37,3 +37,28 @@ class BasicCacheTest(TestCase):
         # fall back to utf-8
         cache.add(url, "foobar".encode("utf-32"), encoding="utf-32")
         assert cache.get(url)[0] == "foobar"
+
+
+class ParsedArtifactCacheTest(TestCase):
+    def test_evicts_by_size(self):
+        cache = ParsedArtifactCache(10)
+
+        cache.add(("source", 1, None, "a"), "a", 6)
+        cache.add(("source", 1, None, "b"), "b", 4)
+        assert cache.get(("source", 1, None, "a")) == "a"
+
+        # "b" is the least recently used artifact and has to make room.
+        cache.add(("source", 1, None, "c"), "c", 3)
+        assert cache.get(("source", 1, None, "b")) is None
+        assert cache.get(("source", 1, None, "a")) == "a"
+        assert cache.get(("source", 1, None, "c")) == "c"
+
+        # Artifacts larger than the whole cache are not kept at all.
+        cache.add(("source", 1, None, "d"), "d", 11)
+        assert cache.get(("source", 1, None, "d")) is None
+        assert cache.get(("source", 1, None, "a")) == "a"
+
+    def test_disabled(self):
+        cache = ParsedArtifactCache(0)
+        cache.add(("source", 1, None, "a"), "a", 1)
+        assert cache.get(("source", 1, None, "a")) is None
@@ -1,5 +1,6 @@
 import errno
 import re
+import tempfile
 import unittest
 from copy import deepcopy
 from io import BytesIO
@@ -20,11 +21,14 @@ from sentry.lang.javascript.processor import (
     discover_sourcemap,
     fetch_file,
     fetch_release_file,
+    fetch_release_files,
     fetch_sourcemap,
     generate_module,
     get_max_age,
+    get_parsed_artifact_key,
     get_release_file_cache_key,
     get_release_file_cache_key_meta,
+    parsed_artifacts,
     should_retry_fetch,
     trim_line,
 )
@@ -399,6 +403,88 @@ class FetchReleaseFileTest(TestCase):
         assert good_file.chunks.call_count == 1
 
 
+class FetchReleaseFilesTest(TestCase):
+    def create_artifact(self, release, name, body, dist=None):
+        file = File.objects.create(
+            name=name,
+            type="release.file",
+            headers={"Content-Type": "application/json; charset=utf-8"},
+        )
+        file.putfile(BytesIO(body))
+        ReleaseFile.objects.create(
+            name=name,
+            release=release,
+            dist=dist,
+            organization_id=release.organization_id,
+            file=file,
+        )
+
+    def test_simple(self):
+        release = Release.objects.create(organization_id=self.organization.id, version="abc")
+        release.add_project(self.project)
+        self.create_artifact(release, "~/file.min.js", b"foo")
+        self.create_artifact(release, "http://example.com/other.min.js", b"bar")
+
+        filenames = ["http://example.com/file.min.js", "other.min.js", "missing.min.js"]
+        results = fetch_release_files(filenames, release)
+
+        assert results == {
+            "http://example.com/file.min.js": http.UrlResult(
+                "http://example.com/file.min.js",
+                {"content-type": "application/json; charset=utf-8"},
+                b"foo",
+                200,
+                "utf-8",
+            ),
+            "other.min.js": None,
+            "missing.min.js": None,
+        }
+
+        # Found and missing artifacts are cached just like `fetch_release_file` does.
+        with self.assertNumQueries(0):
+            assert fetch_release_files(filenames, release) == results
+            for filename in filenames:
+                assert fetch_release_file(filename, release) == results[filename]
+
+    def test_distribution(self):
+        release = Release.objects.create(organization_id=self.organization.id, version="abc")
+        release.add_project(self.project)
+        foo_dist = release.add_dist("foo")
+        self.create_artifact(release, "file.min.js", b"foo", dist=foo_dist)
+        self.create_artifact(release, "file.min.js", b"bar")
+
+        assert fetch_release_files(["file.min.js"], release, foo_dist)["file.min.js"].body == b"foo"
+        assert fetch_release_files(["file.min.js"], release)["file.min.js"].body == b"bar"
+
+    def test_artifact_cache(self):
+        release = Release.objects.create(organization_id=self.organization.id, version="abc")
+        release.add_project(self.project)
+        self.create_artifact(release, "file.min.js", b"foo")
+        self.create_artifact(release, "other.min.js", b"bar")
+
+        # Both files are downloaded into the artifact cache on the pool. The
+        # workers cannot see the data of this test's transaction, so this only
+        # works with the blobs loaded by the calling thread.
+        with tempfile.TemporaryDirectory() as cache_path, self.options(
+            {"releasefile.cache-limit": 0, "releasefile.cache-path": cache_path}
+        ):
+            results = fetch_release_files(["file.min.js", "other.min.js"], release)
+
+        assert results["file.min.js"].body == b"foo"
+        assert results["other.min.js"].body == b"bar"
+
+    @patch("sentry.lang.javascript.processor.compress_file")
+    def test_read_failure(self, mock_compress_file):
+        mock_compress_file.side_effect = OSError(errno.ESTALE, "Stale NFS file handle")
+
+        release = Release.objects.create(organization_id=self.organization.id, version="abc")
+        release.add_project(self.project)
+        self.create_artifact(release, "file.min.js", b"foo")
+
+        # Left for `fetch_release_file` to try again.
+        assert fetch_release_files(["file.min.js"], release) == {}
+
+
 class FetchFileTest(TestCase):
     @responses.activate
     def test_simple(self):
@@ -793,6 +879,31 @@ class FetchSourcemapTest(TestCase):
         with pytest.raises(UnparseableSourcemap):
             fetch_sourcemap("http://example.com")
 
+    @patch("sentry.lang.javascript.processor.SourceMapView.from_json_bytes")
+    def test_parsed_artifact_cache(self, mock_from_json_bytes):
+        release = Release.objects.create(version="1", organization_id=self.project.organization_id)
+        parsed_artifacts.clear()
+
+        first = fetch_sourcemap(base64_sourcemap, release=release)
+        assert fetch_sourcemap(base64_sourcemap, release=release) is first
+        assert mock_from_json_bytes.call_count == 1
+
+        # Without a release the artifact is neither looked up nor kept.
+        fetch_sourcemap(base64_sourcemap)
+        assert mock_from_json_bytes.call_count == 2
+
+    def test_parsed_artifact_key(self):
+        release = Release.objects.create(version="1", organization_id=self.project.organization_id)
+        dist = release.add_dist("foo")
+
+        assert get_parsed_artifact_key("source", None, None, b"foo") is None
+        assert get_parsed_artifact_key("source", release, dist, b"foo") == (
+            "source",
+            release.id,
+            dist.id,
+            "0beec7b5ea3f0fdbc95d0dd47f3c5bc275da8a33",
+        )
+
 
 class TrimLineTest(unittest.TestCase):
     long_line = "The public is more familiar with bad design than good design. It is, in effect, conditioned to prefer bad design, because that is what it lives with. The new becomes threatening, the old reassuring."
@@ -1142,3 +1253,29 @@ class CacheSourceTest(TestCase):
         # now we have an error
         assert len(processor.cache.get_errors(abs_path)) == 1
         assert processor.cache.get_errors(abs_path)[0] == {"url": map_url, "type": "js_no_source"}
+
+    @patch("sentry.lang.javascript.processor.fetch_release_file")
+    def test_populate_source_cache_prefetches_release_files(self, mock_fetch_release_file):
+        project = self.create_project()
+        release = self.create_release(project=project, version="12.31.12")
+
+        abs_path = "app:///index.js"
+        for name, body in (
+            (abs_path, b"foo()\n//# sourceMappingURL=index.js.map"),
+            ("app:///index.js.map", b'{"version":3,"sources":[],"names":[],"mappings":""}'),
+        ):
+            file = File.objects.create(name=name, type="release.file", headers={})
+            file.putfile(BytesIO(body))
+            self.create_release_file(release=release, file=file, name=name)
+
+        processor = JavaScriptStacktraceProcessor(
+            data={"release": release.version}, stacktrace_infos=None, project=project
+        )
+        processor.release = release
+
+        processor.populate_source_cache([{"abs_path": abs_path, "lineno": 1}])
+
+        assert processor.cache.get(abs_path)
+        assert processor.sourcemaps.get_link(abs_path)[0] == "app:///index.js.map"
+        assert processor.sourcemaps.get_link(abs_path)[1] is not None
+        assert not mock_fetch_release_file.called
@@ -1,11 +1,25 @@
 import copy
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 
 from sentry.lang.native import symbolicator
-from sentry.lang.native.symbolicator import get_sources_for_project, redact_internal_sources
-from sentry.testutils.helpers import Feature
+from sentry.lang.native.symbolicator import (
+    Symbolicator,
+    SymbolicatorPool,
+    SymbolicatorSession,
+    get_sources_for_project,
+    redact_internal_sources,
+)
+from sentry.tasks.store import RetrySymbolication
+from sentry.testutils.helpers import Feature, override_options
+from sentry.utils import json
 from sentry.utils.compat import map
+from sentry.utils.compat.mock import patch
 
 CUSTOM_SOURCE_CONFIG = """
 [{
@@ -299,3 +313,134 @@ class TestAliasReversion:
         ]
         symbolicator.reverse_source_aliases(event, builtin_sources)
         assert event["modules"][0]["candidates"] == candidates
+
+
+class StandInSymbolicatorHandler(BaseHTTPRequestHandler):
+    """
+    Accepts symbolication tasks and completes them after `task_duration`
+    seconds, holding polls open for up to their `timeout` like symbolicator.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        task_id = uuid.uuid4().hex
+        self.server.tasks[task_id] = time.monotonic() + self.server.task_duration
+        self.respond(200, {"status": "pending", "request_id": task_id, "retry_after": 1})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        task_id = url.path.rsplit("/", 1)[-1]
+        timeout = int(parse_qs(url.query).get("timeout", ["0"])[0])
+
+        complete_at = self.server.tasks.get(task_id)
+        if complete_at is None:
+            return self.respond(404, {})
+
+        wait = complete_at - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return self.respond(200, {"status": "pending", "request_id": task_id, "retry_after": 1})
+
+        time.sleep(max(wait, 0))
+        del self.server.tasks[task_id]
+        self.respond(200, {"status": "completed", "stacktraces": [], "modules": []})
+
+    def respond(self, status, body):
+        self.server.connections.add(self.client_address)
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def symbolicator_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInSymbolicatorHandler)
+    server.daemon_threads = True
+    server.tasks = {}
+    server.connections = set()
+    server.task_duration = 0.5
+    server.url = "http://127.0.0.1:%s" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def symbolicator_pool():
+    pool = SymbolicatorPool(size=2)
+    with patch.object(symbolicator, "symbolicator_pool", pool):
+        yield pool
+    pool.close()
+
+
+def test_pool_reuses_connections(symbolicator_server, symbolicator_pool):
+    for event_id in range(4):
+        with SymbolicatorSession(
+            url=symbolicator_server.url, project_id="1", event_id=str(event_id), timeout=5
+        ) as sess:
+            task_id = sess.symbolicate_stacktraces(stacktraces=[], modules=[])["request_id"]
+            assert sess.query_task(task_id, timeout=5)["status"] == "completed"
+
+    # All sessions went over the same keep-alive connection.
+    assert len(symbolicator_server.connections) == 1
+
+
+def test_pool_waits_for_tasks_together(symbolicator_server, symbolicator_pool):
+    tasks = []
+    for event_id in range(4):
+        sess = SymbolicatorSession(
+            url=symbolicator_server.url, project_id="1", event_id=str(event_id)
+        )
+        sess.open()
+        response = sess.symbolicate_stacktraces(stacktraces=[], modules=[])
+        tasks.append((sess, response["request_id"]))
+
+    start = time.monotonic()
+    responses = symbolicator_pool.wait_for_tasks(tasks, timeout=5)
+
+    assert [responses[task_id]["status"] for _, task_id in tasks] == ["completed"] * 4
+    # Polled two at a time rather than one after the other.
+    assert time.monotonic() - start < 1.5
+    # Creating and polling all tasks went over the pool's connections.
+    assert len(symbolicator_server.connections) <= 2
+
+
+def test_pool_wait_for_tasks_timeout(symbolicator_server, symbolicator_pool):
+    symbolicator_server.task_duration = 60
+    sess = SymbolicatorSession(url=symbolicator_server.url, project_id="1", event_id="1")
+    sess.open()
+    task_id = sess.symbolicate_stacktraces(stacktraces=[], modules=[])["request_id"]
+
+    responses = symbolicator_pool.wait_for_tasks([(sess, task_id), (sess, "unknown")], timeout=1)
+    assert responses[task_id]["status"] == "pending"
+    assert responses["unknown"] is None
+
+
+@pytest.mark.django_db
+def test_process_polls_pending_task(default_project, symbolicator_server, symbolicator_pool):
+    with override_options({"symbolicator.options": {"url": symbolicator_server.url}}):
+        # The task is still pending after its creation, so symbolication is
+        # retried right away, which waits for the same task.
+        with pytest.raises(RetrySymbolication) as excinfo:
+            Symbolicator(project=default_project, event_id="a" * 32).process_payload(
+                stacktraces=[], modules=[]
+            )
+        assert excinfo.value.retry_after == 0
+        assert len(symbolicator_server.tasks) == 1
+
+        response = Symbolicator(project=default_project, event_id="a" * 32).process_payload(
+            stacktraces=[], modules=[]
+        )
+
+    assert response["status"] == "completed"
+    assert symbolicator_server.tasks == {}
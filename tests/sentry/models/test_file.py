@@ -1,12 +1,17 @@
 import os
+import shutil
+import tempfile
+import time
+import zlib
 from unittest.mock import patch
 
 from django.core.files.base import ContentFile
 from django.db import DatabaseError
 
-from sentry.models import File, FileBlob, FileBlobIndex
+from sentry.models import File, FileBlob, FileBlobIndex, MappedFile, artifact_cache
 from sentry.testutils import TestCase
 from sentry.utils.compat import map
+from sentry.utils.files import compress_file
 
 
 class FileBlobTest(TestCase):
@@ -135,3 +140,110 @@ class FileTest(TestCase):
 
         f = file.getfile(prefetch=True)
         assert f.read() == random_data
+
+
+class ArtifactCacheTest(TestCase):
+    def setUp(self):
+        self.releasefile_path = tempfile.mkdtemp()
+        self.dsym_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.releasefile_path)
+        self.addCleanup(shutil.rmtree, self.dsym_path)
+
+    def cache_options(self, max_size=0):
+        return self.options(
+            {
+                "releasefile.cache-path": self.releasefile_path,
+                "dsym.cache-path": self.dsym_path,
+                "artifacts.cache-max-size": max_size,
+            }
+        )
+
+    def write(self, path, size, age):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+    def test_fetch(self):
+        file = File.objects.create(name="test.bin", type="default", size=7)
+        file.putfile(ContentFile(b"foo bar"))
+        path = os.path.join(self.releasefile_path, "1", str(file.id))
+
+        with self.cache_options():
+            assert artifact_cache.fetch(path, file, "releasefile") == path
+
+            # Hits only touch the file.
+            self.write(path, 7, age=60)
+            with patch.object(File, "save_to") as save_to:
+                with artifact_cache.open(path, file, "releasefile") as f:
+                    assert f.read() == b"x" * 7
+            assert not save_to.called
+            assert os.path.getmtime(path) > time.time() - 60
+
+    def test_fetch_evicts_over_limit(self):
+        stale = os.path.join(self.dsym_path, "1", "stale")
+        self.write(stale, 40, age=30)
+        file = File.objects.create(name="test.bin", type="default", size=7)
+        file.putfile(ContentFile(b"foo bar"))
+        path = os.path.join(self.releasefile_path, "1", str(file.id))
+
+        with self.cache_options(max_size=45):
+            assert artifact_cache.evict() == 40
+            assert os.path.exists(stale)
+
+            # The miss takes the caches past their limit.
+            artifact_cache.fetch(path, file, "releasefile")
+        assert not os.path.exists(stale)
+        assert os.path.exists(path)
+
+    def test_mapped_file(self):
+        path = os.path.join(self.releasefile_path, "foo")
+        with open(path, "wb") as f:
+            f.write(b"foo bar")
+
+        with MappedFile(path) as f:
+            assert f.name == path
+            assert f.size == 7
+            assert f.buffer[4:] == b"bar"
+            assert b"".join(f.chunks(3)) == b"foo bar"
+
+        open(path, "wb").close()
+        with MappedFile(path) as f:
+            assert f.size == 0
+            assert f.read() == b""
+            assert f.buffer == b""
+
+    def test_compress_mapped_file(self):
+        path = os.path.join(self.releasefile_path, "foo")
+        with open(path, "wb") as f:
+            f.write(b"foo bar")
+
+        with MappedFile(path) as f:
+            z_body, body = compress_file(f)
+        assert body == b"foo bar"
+        assert zlib.decompress(z_body) == b"foo bar"
+
+        assert compress_file(ContentFile(b"foo bar")) == (z_body, body)
+
+    def test_evict(self):
+        oldest = os.path.join(self.releasefile_path, "1", "oldest")
+        older = os.path.join(self.dsym_path, "1", "older")
+        newer = os.path.join(self.releasefile_path, "1", "newer")
+        expired = os.path.join(self.dsym_path, "2", "expired")
+        self.write(oldest, 40, age=30)
+        self.write(older, 40, age=20)
+        self.write(newer, 40, age=10)
+        self.write(expired, 1, age=60 * 60 * 48)
+
+        with self.cache_options():
+            assert artifact_cache.evict() == 120
+        assert not os.path.exists(expired)
+
+        # The least recently used files go first, no matter which cache they
+        # are in, until the caches are below 90% of the limit.
+        with self.cache_options(max_size=70):
+            assert artifact_cache.evict() == 40
+        assert not os.path.exists(oldest)
+        assert not os.path.exists(older)
+        assert os.path.exists(newer)
@@ -1,12 +1,15 @@
+import base64
 import pickle
 from datetime import timedelta
 
 import pytest
 from django.utils import timezone
 
+from sentry.nodestore import encoding
 from sentry.nodestore.base import json_dumps
 from sentry.nodestore.django.backend import DjangoNodeStorage
 from sentry.nodestore.django.models import Node
+from sentry.testutils.helpers import override_options
 from sentry.utils.compat import mock
 from sentry.utils.strings import compress
 
@@ -51,6 +54,15 @@ class TestDjangoNodeStorage:
             b'{"foo":"bar"}'
         )
 
+    def test_set_encoded(self):
+        with override_options({"nodestore.encoding-version": encoding.VERSION}):
+            self.ns.set("d2502ebbd7df41ceba8d3275595cac33", {"foo": "bar"})
+
+        data = base64.b64decode(Node.objects.get(id="d2502ebbd7df41ceba8d3275595cac33").data)
+        # Encoded values are compressed already and stored without zlib.
+        assert encoding.is_encoded(data)
+        assert self.ns.get("d2502ebbd7df41ceba8d3275595cac33") == {"foo": "bar"}
+
     def test_delete(self):
         node = Node.objects.create(id="d2502ebbd7df41ceba8d3275595cac33", data=b'{"foo": "bar"}')
 
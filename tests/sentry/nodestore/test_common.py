@@ -7,6 +7,7 @@ from contextlib import contextmanager
 import pytest
 
 from sentry.nodestore.django.backend import DjangoNodeStorage
+from sentry.testutils.helpers import override_options
 from tests.sentry.nodestore.bigtable.backend.tests import (
     MockedBigtableNodeStorage,
     get_temporary_bigtable_nodestorage,
@@ -53,6 +54,28 @@ def test_set(ns):
     assert ns.get(node_id) == data
 
 
+def test_set_many(ns):
+    nodes = {"a" * 32: {"foo": "a"}, "b" * 32: {"foo": "b"}}
+    ns.set_subkeys("a" * 32, {None: {"foo": "old"}, "other": {"foo": "old"}})
+
+    ns.set_many(nodes)
+    assert ns.get_multi(list(nodes)) == nodes
+    assert ns.get("a" * 32, subkey="other") is None
+
+
+def test_set_subkeys_many(ns):
+    ns.set_subkeys_many(
+        {
+            "node_1": {None: {"foo": "a"}, "other": {"foo": "b"}},
+            "node_2": {None: {"foo": "c"}},
+        }
+    )
+    assert ns.get("node_1") == {"foo": "a"}
+    assert ns.get("node_1", subkey="other") == {"foo": "b"}
+    assert ns.get("node_2") == {"foo": "c"}
+    assert ns.get("node_2", subkey="other") is None
+
+
 def test_delete(ns):
     node_id = "d2502ebbd7df41ceba8d3275595cac33"
     data = {"foo": "bar"}
@@ -97,3 +120,15 @@ def test_set_subkeys(ns):
     ns.delete("node_1")
     assert ns.get("node_1") is None
     assert ns.get("node_1", subkey="other") is None
+
+
+def test_compressed_encoding(ns):
+    ns.set_subkeys("node_1", {None: {"foo": "a"}, "other": {"foo": "b"}})
+    with override_options({"nodestore.encoding-version": 1}):
+        ns.set_subkeys("node_2", {None: {"foo": "c"}, "other": {"foo": "d"}})
+        assert ns._encode({None: {"foo": "c"}}).startswith(b"\xfeNS")
+
+    # both encodings are read regardless of the option
+    for subkey, expected in ((None, {"foo": "c"}), ("other", {"foo": "d"}), ("x", None)):
+        assert ns.get("node_2", subkey=subkey) == expected
+    assert ns.get("node_1", subkey="other") == {"foo": "b"}
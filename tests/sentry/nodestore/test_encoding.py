@@ -0,0 +1,51 @@
+import pytest
+from django.test import override_settings
+
+from sentry.nodestore import encoding
+from sentry.utils import json
+
+
+def test_encode_decode():
+    payloads = {
+        None: json.dumps({"foo": "bar"}).encode("utf8"),
+        "unprocessed": json.dumps({"foo": "baz"}).encode("utf8"),
+    }
+    value = encoding.encode(dict(payloads))
+
+    assert encoding.is_encoded(value)
+    assert not encoding.is_encoded(payloads[None])
+    assert encoding.decode(value) == payloads[None]
+    assert encoding.decode(value, subkey="unprocessed") == payloads["unprocessed"]
+    assert encoding.decode(value, subkey="other") is None
+
+
+def test_unsupported_version():
+    value = bytearray(encoding.encode({None: b"{}"}))
+    value[len(encoding.MAGIC)] = encoding.VERSION + 1
+    with pytest.raises(ValueError):
+        encoding.decode(bytes(value))
+
+
+def test_dictionary(tmpdir):
+    samples = [
+        json.dumps({"platform": "python", "event_id": "%032x" % i, "tags": [["i", str(i)]]}).encode(
+            "utf8"
+        )
+        for i in range(1000)
+    ]
+    path = tmpdir.join("python.dict")
+    path.write_binary(encoding.train_dictionary(samples, size=4096))
+
+    with override_settings(
+        SENTRY_NODESTORE_DICTIONARIES={1: str(path)},
+        SENTRY_NODESTORE_PLATFORM_DICTIONARIES={"python": 1},
+    ):
+        assert encoding.select_dictionary_id({"platform": "python"}) == 1
+        assert encoding.select_dictionary_id({"platform": "go"}) == 0
+
+        value = encoding.encode({None: samples[0]}, dictionary_id=1)
+        assert len(value) < len(encoding.encode({None: samples[0]}))
+        assert encoding.decode(value) == samples[0]
+
+        with pytest.raises(encoding.UnknownDictionaryError):
+            encoding.encode({None: samples[0]}, dictionary_id=2)
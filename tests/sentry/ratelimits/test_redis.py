@@ -1,4 +1,9 @@
-from sentry.ratelimits.redis import RedisRateLimiter
+from datetime import timedelta
+from time import time
+
+from freezegun import freeze_time
+
+from sentry.ratelimits.redis import RedisGCRARateLimiter, RedisRateLimiter
 from sentry.testutils import TestCase
 
 
@@ -13,3 +18,52 @@ class RedisRateLimiterTest(TestCase):
     def test_simple_key(self):
         assert not self.backend.is_limited("foo", 1)
         assert self.backend.is_limited("foo", 1)
+
+    def test_is_limited_many(self):
+        with freeze_time("2000-01-01T00:00:30"):
+            now = time()
+            first, second = self.backend.is_limited_many([("foo", 1, None), ("bar", 2, 10)])
+            assert first == (False, 0, now + 30)
+            assert second == (False, 1, now + 10)
+
+            first, second = self.backend.is_limited_many([("foo", 1, None), ("bar", 2, 10)])
+            assert first.is_limited
+            assert not second.is_limited
+            assert second.remaining == 0
+
+
+class RedisGCRARateLimiterTest(TestCase):
+    def setUp(self):
+        self.backend = RedisGCRARateLimiter()
+
+    def test_project_key(self):
+        assert not self.backend.is_limited("foo", 1, self.project)
+        assert self.backend.is_limited("foo", 1, self.project)
+        assert not self.backend.is_limited("foo", 1)
+
+    def test_simple_key(self):
+        assert not self.backend.is_limited("foo", 2)
+        assert not self.backend.is_limited("foo", 2)
+        assert self.backend.is_limited("foo", 2)
+
+    def test_zero_limit(self):
+        assert self.backend.is_limited("foo", 0)
+
+    def test_sliding_window(self):
+        with freeze_time("2000-01-01T00:00:00") as frozen_time:
+            now = time()
+            first, second = self.backend.is_limited_many([("foo", 2, None), ("bar", 1, 10)])
+            assert first == (False, 1, now + 30)
+            assert second == (False, 0, now + 10)
+
+            first, second = self.backend.is_limited_many([("foo", 2, None), ("bar", 1, 10)])
+            assert first == (False, 0, now + 60)
+            assert second == (True, 0, now + 10)
+
+            # A fixed window limiter would reset here, this one only allows
+            # one more request after half of the window
+            frozen_time.tick(delta=timedelta(seconds=29))
+            assert self.backend.is_limited("foo", 2)
+            frozen_time.tick(delta=timedelta(seconds=1))
+            assert not self.backend.is_limited("foo", 2)
+            assert self.backend.is_limited("foo", 2)
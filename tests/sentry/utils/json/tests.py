@@ -48,3 +48,24 @@ class JSONTest(TestCase):
 
     def test_translation(self):
         self.assertEquals(json.dumps(_("word")), '"word"')
+
+    def test_iterload_object(self):
+        doc = json.dumps(
+            {
+                "meta": [{"name": "count"}],
+                "data": [{"count": i, "name": "é" * i} for i in range(20)],
+                "empty": [],
+                "timing": 12345,
+            }
+        )
+        for size in (1, 3, 64, len(doc)):
+            chunks = [doc[i : i + size] for i in range(0, len(doc), size)]
+            assert list(json.iterload_object(chunks, stream_keys=("data", "empty"))) == [
+                ("meta", [{"name": "count"}]),
+                *(("data", {"count": i, "name": "é" * i}) for i in range(20)),
+                ("timing", 12345),
+            ]
+
+        assert list(json.iterload_object(["{}"])) == []
+        with self.assertRaises(json.JSONDecodeError):
+            list(json.iterload_object(['{"data": [1,'], stream_keys=("data",)))
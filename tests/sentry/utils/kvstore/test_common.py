@@ -100,3 +100,18 @@ def test_multiple_key_operations(properties: Properties) -> None:
     store.delete_many(all_keys)
 
     assert dict(store.get_many(all_keys)) == {}
+
+
+def test_set_many(properties: Properties) -> None:
+    store = properties.store
+
+    items = dict(itertools.islice(properties.items, 10))
+    store.set_many(list(items.items()))
+
+    assert dict(store.get_many(list(items.keys()))) == items
+
+    # Test overwriting some of the keys.
+    updates = dict(zip(list(items.keys())[:5], (v for _, v in properties.items)))
+    store.set_many(list(updates.items()))
+
+    assert dict(store.get_many(list(items.keys()))) == {**items, **updates}
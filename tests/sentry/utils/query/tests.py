@@ -1,6 +1,12 @@
+import pytest
+
 from sentry.models import User
-from sentry.testutils import TestCase
-from sentry.utils.query import RangeQuerySetWrapper
+from sentry.testutils import TestCase, TransactionTestCase
+from sentry.utils.query import (
+    InvalidQuerySetError,
+    RangeQuerySetWrapper,
+    ShardedRangeQuerySetWrapper,
+)
 
 
 class RangeQuerySetWrapperTest(TestCase):
@@ -26,3 +32,66 @@ class RangeQuerySetWrapperTest(TestCase):
             user.delete()
 
         assert User.objects.all().count() == 0
+
+
+# The shards are fetched in other threads, which only see committed rows.
+class ShardedRangeQuerySetWrapperTest(TransactionTestCase):
+    def test_basic(self):
+        users = {self.create_user().id for _ in range(10)}
+        qs = User.objects.all()
+
+        assert {u.id for u in ShardedRangeQuerySetWrapper(qs, step=2, shards=3)} == users
+        assert {u.id for u in ShardedRangeQuerySetWrapper(qs, shards=3, workers=1)} == users
+        assert len(list(ShardedRangeQuerySetWrapper(qs, step=2, limit=5))) == 5
+        assert list(ShardedRangeQuerySetWrapper(User.objects.none())) == []
+
+        boundaries = [sorted(users)[4]]
+        wrapper = ShardedRangeQuerySetWrapper(qs, boundaries=boundaries)
+        assert {u.id for u in wrapper} == users
+        assert len(wrapper.checkpoint["ranges"]) == 2
+
+    def test_callbacks(self):
+        for _ in range(5):
+            self.create_user()
+
+        chunks = []
+        wrapper = ShardedRangeQuerySetWrapper(
+            User.objects.all(), step=2, shards=2, callbacks=[chunks.append]
+        )
+        assert len(list(wrapper)) == 5
+        assert sum(len(chunk) for chunk in chunks) == 5
+        assert all(len(chunk) <= 2 for chunk in chunks)
+
+    def test_checkpoint(self):
+        users = {self.create_user().id for _ in range(10)}
+        qs = User.objects.all()
+
+        wrapper = ShardedRangeQuerySetWrapper(qs, step=2, shards=3)
+        seen = set()
+        for user in wrapper:
+            seen.add(user.id)
+            if len(seen) == 4:
+                break
+        checkpoint = wrapper.checkpoint
+
+        # the result handled when the iteration stopped is in the checkpoint
+        resumed = {u.id for u in ShardedRangeQuerySetWrapper(qs, step=2, checkpoint=checkpoint)}
+        assert not resumed & seen
+        assert resumed | seen == users
+
+        wrapper = ShardedRangeQuerySetWrapper(qs, checkpoint=checkpoint)
+        list(wrapper)
+        assert list(ShardedRangeQuerySetWrapper(qs, checkpoint=wrapper.checkpoint)) == []
+
+    def test_loop_and_delete(self):
+        for _ in range(10):
+            self.create_user()
+
+        for user in ShardedRangeQuerySetWrapper(User.objects.all(), step=2, shards=3):
+            user.delete()
+
+        assert User.objects.all().count() == 0
+
+    def test_invalid_queryset(self):
+        with pytest.raises(InvalidQuerySetError):
+            ShardedRangeQuerySetWrapper(User.objects.order_by("id"))
@@ -1,6 +1,6 @@
 import pytest
 
-from sentry.utils.datastructures import BidirectionalMapping
+from sentry.utils.datastructures import BidirectionalMapping, LRUCache
 
 
 def test_bidirectional_mapping():
@@ -30,3 +30,50 @@ def test_bidirectional_mapping():
     del value["c"]
 
     assert len(value) == len(value.inverse()) == 2
+
+
+def test_lru_cache():
+    value = LRUCache(2)
+
+    value["a"] = 1
+    value["b"] = 2
+    assert value["a"] == 1
+
+    # "b" is the least recently used item now
+    value["c"] = 3
+    assert "b" not in value
+    assert list(value) == ["a", "c"]
+
+    value["a"] = 4
+    value["d"] = 5
+    assert dict(value) == {"a": 4, "d": 5}
+    assert value.get("c") is None
+
+    del value["a"]
+    assert len(value) == 1
+
+    with pytest.raises(ValueError):
+        LRUCache(0)
+
+
+def test_lru_cache_getsize():
+    value = LRUCache(10, getsize=len)
+
+    value["a"] = "aaaa"
+    value["b"] = "bbbb"
+    assert value.currsize == 8
+
+    # replacing a value accounts for the size of the new one
+    value["a"] = "aa"
+    assert value.currsize == 6
+
+    value["c"] = "cccccc"
+    assert list(value) == ["a", "c"]
+    assert value.currsize == 8
+
+    value["d"] = "d" * 11
+    assert "d" not in value
+    assert value.currsize == 8
+
+    del value["a"]
+    assert value.currsize == 6
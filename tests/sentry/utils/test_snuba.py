@@ -1,19 +1,34 @@
+import asyncio
+import threading
+import time
 import unittest
 from datetime import datetime, timedelta
+from io import BytesIO
 
 import pytest
 import pytz
+from django.conf import settings
+from django.test.utils import override_settings
 from django.utils import timezone
+from urllib3.response import HTTPResponse
 
 from sentry.models import GroupRelease, Project, Release
 from sentry.testutils import TestCase
+from sentry.utils import json, snuba
 from sentry.utils.compat import mock
 from sentry.utils.snuba import (
     Dataset,
     SnubaQueryParams,
+    SnubaQueryPool,
+    SnubaResultStream,
+    UnexpectedResponseError,
     UnqualifiedQueryError,
+    _apply_cache_and_build_results,
     _prepare_query_params,
+    clear_local_query_cache,
+    get_cache_key,
     get_json_type,
+    get_quantized_cache_key,
     get_query_params_to_update_for_projects,
     get_snuba_column_name,
     get_snuba_translators,
@@ -320,3 +335,234 @@ class QuantizeTimeTest(unittest.TestCase):
                 break
 
         assert i != j
+
+
+def identity(x):
+    return x
+
+
+class QueryCacheTest(TestCase):
+    def make_query(self, end, window=timedelta(hours=1), **kwargs):
+        query = {
+            "dataset": "events",
+            "aggregations": [["count()", "", "count"]],
+            "from_date": (end - window).isoformat(),
+            "to_date": end.isoformat(),
+            **kwargs,
+        }
+        return (query, identity, identity)
+
+    def test_quantized_cache_key(self):
+        now = datetime(2021, 5, 5, 17, 0, 0)
+        keys = {
+            get_quantized_cache_key(self.make_query(now + timedelta(seconds=i)), 60)
+            for i in range(61)
+        }
+        # A window moving with the current time changes its key once per duration.
+        assert len(keys) == 2
+
+        key = get_quantized_cache_key(self.make_query(now), 60)
+        assert key != get_quantized_cache_key(self.make_query(now, window=timedelta(days=1)), 60)
+        assert key != get_quantized_cache_key(self.make_query(now, groupby=["project_id"]), 60)
+
+        query = self.make_query(now)
+        del query[0]["to_date"]
+        assert get_quantized_cache_key(query, 60) == get_cache_key(query)
+
+    @mock.patch("sentry.utils.snuba._bulk_snuba_query")
+    def test_local_and_shared_tier(self, bulk_snuba_query):
+        bulk_snuba_query.side_effect = lambda params, headers, use_snql: [
+            {"data": [{"count": 1}]} for _ in params
+        ]
+        query = self.make_query(datetime.utcnow())
+
+        with mock.patch("sentry.utils.snuba.metrics") as metrics:
+            results = _apply_cache_and_build_results([query, query], "test", use_cache=True)
+            assert results == [{"data": [{"count": 1}]}] * 2
+            assert bulk_snuba_query.call_count == 1
+            assert len(bulk_snuba_query.call_args[0][0]) == 1
+
+            # Results handed out from the cache do not share state.
+            results[0]["data"].append(None)
+            assert _apply_cache_and_build_results([query], "test", use_cache=True) == [
+                {"data": [{"count": 1}]}
+            ]
+            assert bulk_snuba_query.call_count == 1
+            metrics.incr.assert_any_call(
+                "snuba.query_cache.hit", tags={"referrer": "test", "tier": "local"}
+            )
+
+            clear_local_query_cache()
+            _apply_cache_and_build_results([query], "test", use_cache=True)
+            assert bulk_snuba_query.call_count == 1
+            metrics.incr.assert_any_call(
+                "snuba.query_cache.hit", tags={"referrer": "test", "tier": "shared"}
+            )
+
+    @mock.patch("sentry.utils.snuba._bulk_snuba_query")
+    def test_coalesces_concurrent_queries(self, bulk_snuba_query):
+        started = threading.Event()
+        proceed = threading.Event()
+
+        def run_query(params, headers, use_snql):
+            started.set()
+            assert proceed.wait(5)
+            return [{"data": []} for _ in params]
+
+        bulk_snuba_query.side_effect = run_query
+        query = self.make_query(datetime.utcnow())
+        results = []
+
+        def target():
+            results.extend(_apply_cache_and_build_results([query], "test", use_cache=True))
+
+        leader = threading.Thread(target=target)
+        leader.start()
+        assert started.wait(5)
+
+        waiting = threading.Event()
+        wait_for_cached_results = snuba._wait_for_cached_results
+
+        def wait(*args, **kwargs):
+            waiting.set()
+            return wait_for_cached_results(*args, **kwargs)
+
+        follower = threading.Thread(target=target)
+        with mock.patch("sentry.utils.snuba.metrics") as metrics, mock.patch(
+            "sentry.utils.snuba._wait_for_cached_results", side_effect=wait
+        ):
+            follower.start()
+            assert waiting.wait(5)
+            proceed.set()
+            leader.join()
+            follower.join()
+
+        assert results == [{"data": []}, {"data": []}]
+        assert bulk_snuba_query.call_count == 1
+        metrics.incr.assert_any_call("snuba.query_cache.coalesced", tags={"referrer": "test"})
+
+    @mock.patch("sentry.utils.snuba._bulk_snuba_query")
+    def test_runs_query_when_lock_holder_does_not_finish(self, bulk_snuba_query):
+        from sentry.app import locks
+
+        bulk_snuba_query.side_effect = lambda params, headers, use_snql: [
+            {"data": []} for _ in params
+        ]
+        query = self.make_query(datetime.utcnow())
+        cache_key = get_quantized_cache_key(query, settings.SENTRY_SNUBA_CACHE_TTL_SECONDS)
+
+        with self.settings(SENTRY_SNUBA_CACHE_COALESCE_TIMEOUT=0.1):
+            lock = locks.get(f"{cache_key}:lock", duration=5, routing_key=cache_key)
+            with lock.acquire():
+                assert _apply_cache_and_build_results([query], "test", use_cache=True) == [
+                    {"data": []}
+                ]
+
+        assert bulk_snuba_query.call_count == 1
+
+
+class SnubaResultStreamTest(unittest.TestCase):
+    def make_stream(self, body, reverse=identity):
+        response = HTTPResponse(
+            body=BytesIO(json.dumps(body).encode("utf-8")), status=200, preload_content=False
+        )
+        return SnubaResultStream(response, reverse)
+
+    def test_stream(self):
+        body = {
+            "meta": [{"name": "count"}],
+            "data": [{"count": i} for i in range(10)],
+            "timing": {"duration_ms": 1},
+        }
+        stream = self.make_stream(body, reverse=lambda row: {"total": row["count"]})
+
+        assert stream.peek() == {"total": 0}
+        assert stream.body == {"meta": [{"name": "count"}]}
+        assert list(stream) == [{"total": i} for i in range(10)]
+        assert stream.body == {"meta": [{"name": "count"}], "timing": {"duration_ms": 1}}
+        assert stream.peek() is None
+
+    def test_empty(self):
+        stream = self.make_stream({"meta": [], "data": []})
+        assert stream.peek() is None
+        assert list(stream) == []
+        assert stream.body == {"meta": []}
+
+    def test_invalid_json(self):
+        response = HTTPResponse(
+            body=BytesIO(b'{"data": [{"count": 1}, {"cou'), status=200, preload_content=False
+        )
+        stream = SnubaResultStream(response, identity)
+        assert next(stream) == {"count": 1}
+        with pytest.raises(UnexpectedResponseError):
+            next(stream)
+
+
+class SnubaQueryPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = SnubaQueryPool(max_workers=4)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def query(self, value):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return value * 2
+
+    def test_map(self):
+        assert self.pool.map(self.query, range(8), referrer="test") == [i * 2 for i in range(8)]
+        assert self.max_running == 4
+        assert self.pool.map(self.query, [3], referrer="test") == [6]
+
+    def test_referrer_concurrency(self):
+        with override_settings(SENTRY_SNUBA_REFERRER_CONCURRENCY={"limited": 2}):
+            with mock.patch("sentry.utils.snuba.metrics") as metrics:
+                assert self.pool.map(self.query, range(6), referrer="limited") == [
+                    i * 2 for i in range(6)
+                ]
+        assert self.max_running == 2
+        metrics.timer.assert_any_call(
+            "snuba.query_pool.referrer_wait", tags={"referrer": "limited"}
+        )
+        metrics.timing.assert_any_call(
+            "snuba.query_pool.queue_wait", mock.ANY, tags={"referrer": "limited"}
+        )
+
+    def test_submit_async(self):
+        async def fan_out():
+            return await asyncio.gather(
+                *(self.pool.submit_async(self.query, i, referrer="limited") for i in range(6))
+            )
+
+        with override_settings(SENTRY_SNUBA_REFERRER_CONCURRENCY={"limited": 3}):
+            loop = asyncio.new_event_loop()
+            try:
+                assert loop.run_until_complete(fan_out()) == [i * 2 for i in range(6)]
+            finally:
+                loop.close()
+        assert self.max_running == 3
+
+    def test_submit_async_cancelled(self):
+        async def cancel_waiting():
+            first = asyncio.ensure_future(self.pool.submit_async(self.query, 1, referrer="limited"))
+            await asyncio.sleep(0.01)
+            waiting = asyncio.ensure_future(
+                self.pool.submit_async(self.query, 2, referrer="limited")
+            )
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            assert await first == 2
+            # The cancelled call does not keep the permit it acquired late.
+            return await self.pool.submit_async(self.query, 3, referrer="limited")
+
+        with override_settings(SENTRY_SNUBA_REFERRER_CONCURRENCY={"limited": 1}):
+            loop = asyncio.new_event_loop()
+            try:
+                assert loop.run_until_complete(cancel_waiting()) == 6
+            finally:
+                loop.close()
@@ -417,8 +417,8 @@ class StreamGroupSerializerTestCase(APITestCase, SnubaTestCase):
         environment = Environment.get_or_create(group.project, "production")
 
         with mock.patch(
-            "sentry.api.serializers.models.group.snuba_tsdb.get_range",
-            side_effect=snuba_tsdb.get_range,
+            "sentry.api.serializers.models.group.snuba_tsdb.get_range_query",
+            side_effect=snuba_tsdb.get_range_query,
         ) as get_range:
             serialize(
                 [group],
@@ -431,8 +431,8 @@ class StreamGroupSerializerTestCase(APITestCase, SnubaTestCase):
                 assert kwargs["environment_ids"] == [environment.id]
 
         with mock.patch(
-            "sentry.api.serializers.models.group.snuba_tsdb.get_range",
-            side_effect=snuba_tsdb.get_range,
+            "sentry.api.serializers.models.group.snuba_tsdb.get_range_query",
+            side_effect=snuba_tsdb.get_range_query,
         ) as get_range:
             serialize(
                 [group],
@@ -21,6 +21,7 @@ from sentry.models import (
 )
 from sentry.models.groupinbox import GroupInboxReason, add_group_to_inbox
 from sentry.search.snuba.backend import EventsDatasetSnubaSearchBackend
+from sentry.search.snuba.executors import PostgresSnubaQueryExecutor
 from sentry.testutils import SnubaTestCase, TestCase, xfail_if_not_postgres
 from sentry.testutils.helpers.datetime import before_now, iso_format
 from sentry.utils.compat import mock
@@ -552,6 +553,54 @@ class EventsSnubaSearchTest(TestCase, SnubaTestCase):
                 assert results.prev.has_results
                 assert not results.next.has_results
 
+    def test_pagination_with_candidate_cache(self):
+        def paginate():
+            pages = []
+            cursor = None
+            for _ in range(3):
+                results = self.backend.query([self.project], cursor=cursor, limit=1, sort_by="freq")
+                pages.append((list(results), results.prev.has_results, results.next.has_results))
+                cursor = results.next
+            return pages
+
+        expected = paginate()
+
+        with self.options({"snuba.search.candidate-cache-ttl": 60}), mock.patch.object(
+            PostgresSnubaQueryExecutor,
+            "snuba_search",
+            side_effect=PostgresSnubaQueryExecutor.snuba_search,
+            autospec=True,
+        ) as snuba_search:
+            assert paginate() == expected
+            # The candidates fit into one Snuba query, so later pages are
+            # served from the cached results of the first one.
+            assert snuba_search.call_count == 1
+            assert paginate() == expected
+            assert snuba_search.call_count == 1
+
+    def test_candidate_cache_key_is_stable(self):
+        executor = PostgresSnubaQueryExecutor()
+        date_from = datetime(2021, 1, 1, 12, 0, 10, tzinfo=pytz.utc)
+        search_filters = self.build_search_filter("is:unresolved")
+
+        def get_key(offset, limit=25):
+            return executor.get_candidate_cache_key(
+                [self.project],
+                None,
+                "date",
+                search_filters,
+                timedelta(days=90, seconds=offset),
+                date_from + timedelta(seconds=offset),
+                None,
+                500,
+                limit,
+                60,
+            )
+
+        # Requests a few seconds apart share the key, different limits do not.
+        assert get_key(0) == get_key(5)
+        assert get_key(0) != get_key(0, limit=50)
+
     def test_pagination_with_environment(self):
         for dt in [
             self.group1.first_seen + timedelta(days=1),